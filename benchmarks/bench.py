@@ -0,0 +1,300 @@
+"""
+Benchmarks for parsing, feed generation and database operations
+
+Usage:
+  python -m benchmarks.bench                      - Run every benchmark and print a table
+  python -m benchmarks.bench -k feed              - Only run benchmarks whose name matches a regex
+  python -m benchmarks.bench --quick              - Smaller databases and shorter timings, for a fast sanity check
+  python -m benchmarks.bench --check              - Exit non-zero if a benchmark is slower than its baseline allows
+  python -m benchmarks.bench --save-baseline      - Record the results as the new baseline
+
+Timings are the best per-call time over several repeats, the same approach as timeit, so they are comparable between
+runs on the same machine. Baselines are machine specific: record one on the machine the checks run on.
+"""
+
+import argparse
+import gc
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+
+# hoarderpod reads its configuration on import, keep it away from real services and data
+os.environ.setdefault("HOARDER_API_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+os.environ.setdefault("MP3_STORAGE_PATH", tempfile.mkdtemp(prefix="hoarderpod-bench-audio-"))
+
+from sqlalchemy import insert  # noqa: E402
+
+from hoarderpod.article_parse import clean_text_for_tts, get_episode_dict, html2text, transform_markdown  # noqa: E402
+from hoarderpod.episodes import Episode, EpisodeOps, init_db  # noqa: E402
+from hoarderpod.run import gen_feed  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(BENCH_DIR, "corpus")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+DB_SIZES = (1_000, 10_000, 100_000)
+QUICK_DB_SIZES = (1_000,)
+FEED_SIZES = (10, 100, 1_000)
+
+DOMAINS = ["example.com", "news.example.org", "blog.example.net", "longform.example.org", "archive.ph"]
+
+
+class Benchmark:
+    """A named callable to time, with optional setup run once before timing."""
+
+    def __init__(self, name: str, func: Callable[[], object], setup: Callable[[], None] | None = None):
+        self.name = name
+        self.func = func
+        self.setup = setup
+
+
+def load_corpus() -> dict[str, str]:
+    """Load the checked in HTML corpus.
+
+    Returns:
+        dict[str, str]: File name without extension to HTML
+    """
+    corpus = {}
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        if filename.endswith(".html"):
+            with open(os.path.join(CORPUS_DIR, filename), encoding="utf-8") as f:
+                corpus[filename[: -len(".html")]] = f.read()
+    return corpus
+
+
+def make_bookmark(name: str, html: str) -> dict:
+    """Wrap corpus HTML in a bookmark like the ones Hoarder returns."""
+    return {
+        "id": f"bench-{name}",
+        "createdAt": "2025-03-04T09:00:00.000Z",
+        "content": {
+            "url": f"https://example.com/{name}",
+            "title": name.replace("_", " "),
+            "description": None,
+            "htmlContent": html,
+            "crawledAt": "2025-03-04T09:00:01.000Z",
+        },
+    }
+
+
+def make_episode_rows(count: int, text_length: int = 500) -> list[dict]:
+    """Build synthetic episode rows, most with a TTS job and an mp3 like a long running library.
+
+    Args:
+        count: Number of rows
+        text_length: Characters of article text per row
+
+    Returns:
+        list[dict]: Column values for each row
+    """
+    start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    text = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * (text_length // 57 + 1))[:text_length]
+    rows = []
+    for i in range(count):
+        created_at = start + timedelta(minutes=37 * i)
+        rows.append(
+            {
+                "id": f"episode-{i:07d}",
+                "title": f"Synthetic article number {i}",
+                "description": "A synthetic article used for benchmarking",
+                "text": text,
+                "authors": ["Alex Writer"] if i % 3 else [],
+                "created_at": created_at,
+                "crawled_at": created_at + timedelta(minutes=1),
+                "url": f"https://{DOMAINS[i % len(DOMAINS)]}/articles/{i}",
+                "tts_job_id": f"job-{i:07d}" if i % 10 else None,
+                "mp3": f"job-{i:07d}.mp3" if i % 5 else None,
+            }
+        )
+    return rows
+
+
+def use_synthetic_db(path: str, count: int) -> None:
+    """Create a synthetic database with count episodes and point EpisodeOps at it.
+
+    Args:
+        path: The SQLite file to create
+        count: Number of episodes
+    """
+    engine = init_db(f"sqlite:///{path}")
+    rows = make_episode_rows(count)
+    with engine.begin() as connection:
+        for i in range(0, len(rows), 10_000):
+            connection.execute(insert(Episode), rows[i : i + 10_000])
+
+
+def parse_benchmarks(corpus: dict[str, str]) -> list[Benchmark]:
+    benchmarks = []
+    for name, html in corpus.items():
+        benchmarks.append(Benchmark(f"html2text[{name}]", lambda html=html: html2text(html)))
+        bookmark = make_bookmark(name, html)
+        benchmarks.append(Benchmark(f"get_episode_dict[{name}]", lambda bookmark=bookmark: get_episode_dict(bookmark)))
+
+    long_text = html2text(corpus["singlefile_archive"])
+    benchmarks.append(Benchmark("clean_text_for_tts[singlefile_archive]", lambda: clean_text_for_tts(long_text)))
+    markdown = "\n".join(
+        ["# Headline", "## Section", "* list item", "Some *italic* text and more words here."] * 500
+    )
+    benchmarks.append(Benchmark("transform_markdown[2000 lines]", lambda: transform_markdown(markdown)))
+    return benchmarks
+
+
+def feed_benchmarks() -> list[Benchmark]:
+    benchmarks = []
+    for size in FEED_SIZES:
+        feed_episodes = [Episode(**row) for row in make_episode_rows(size, text_length=100)]
+        for episode in feed_episodes:
+            episode.mp3 = episode.mp3 or f"{episode.id}.mp3"
+        benchmarks.append(
+            Benchmark(
+                f"gen_feed[{size} episodes]",
+                lambda feed_episodes=feed_episodes: gen_feed(feed_episodes, "http://localhost:5002/"),
+            )
+        )
+    return benchmarks
+
+
+def db_benchmarks(sizes: tuple[int, ...], workdir: str) -> list[Benchmark]:
+    ops = EpisodeOps()
+    benchmarks = []
+    for size in sizes:
+        path = os.path.join(workdir, f"episodes-{size}.db")
+
+        def setup(path=path, size=size):
+            if not os.path.exists(path):
+                use_synthetic_db(path, size)
+            else:
+                init_db(f"sqlite:///{path}")
+
+        queries = {
+            "get_episode_ids": ops.get_episode_ids,
+            "get_episodes_with_mp3": ops.get_episodes_with_mp3,
+            "get_episodes_to_tts(limit=10)": lambda: ops.get_episodes_to_tts(limit=10),
+            "get_job_ids": ops.get_job_ids,
+            "get_latest_episode_date": ops.get_latest_episode_date,
+            "count_episodes_to_tts": ops.count_episodes_to_tts,
+            "get_all_episodes(sorted)": lambda: ops.get_all_episodes(sort_by_created_at=True),
+            "search_episodes(selective)": lambda: ops.search_episodes("article 4242"),
+            "search_episodes(every row)": lambda: ops.search_episodes("ipsum"),
+        }
+        for query_name, func in queries.items():
+            benchmarks.append(Benchmark(f"EpisodeOps.{query_name}[{size} rows]", func, setup))
+    return benchmarks
+
+
+def time_benchmark(benchmark: Benchmark, min_time: float, repeat: int) -> dict:
+    """Time a benchmark, calibrating the number of calls per repeat like timeit.
+
+    Args:
+        benchmark: The benchmark to time
+        min_time: Minimum seconds per repeat
+        repeat: Number of repeats
+
+    Returns:
+        dict: Best and median seconds per call and the number of calls per repeat
+    """
+    benchmark.func()  # warm up caches and lazy imports
+
+    number = 1
+    while True:
+        elapsed = _time_calls(benchmark.func, number)
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    per_call = [elapsed / number] + [_time_calls(benchmark.func, number) / number for _ in range(repeat - 1)]
+    return {"best": min(per_call), "median": statistics.median(per_call), "number": number}
+
+
+def _time_calls(func: Callable[[], object], number: int) -> float:
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def format_seconds(seconds: float) -> str:
+    """Format a duration with a unit that keeps it readable."""
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="HoarderToPod benchmarks")
+    parser.add_argument("-k", "--filter", help="Only run benchmarks whose name matches this regex")
+    parser.add_argument("--quick", action="store_true", help="Small databases and short timings")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repeats per benchmark")
+    parser.add_argument("--check", action="store_true", help="Fail if a result exceeds its baseline")
+    parser.add_argument("--tolerance", type=float, default=2.0, help="Allowed slowdown factor over the baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="Save the results as the baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    min_time = 0.05 if args.quick else 0.2
+    workdir = tempfile.mkdtemp(prefix="hoarderpod-bench-")
+    corpus = load_corpus()
+    benchmarks = (
+        parse_benchmarks(corpus) + feed_benchmarks() + db_benchmarks(QUICK_DB_SIZES if args.quick else DB_SIZES, workdir)
+    )
+    if args.filter:
+        benchmarks = [benchmark for benchmark in benchmarks if re.search(args.filter, benchmark.name)]
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    failures = []
+    print(f"{'benchmark':<60} {'best':>10} {'median':>10} {'baseline':>10}")
+    for benchmark in benchmarks:
+        if benchmark.setup:
+            benchmark.setup()
+        result = time_benchmark(benchmark, min_time, args.repeat)
+        results[benchmark.name] = result
+
+        expected = baseline.get(benchmark.name)
+        line = f"{benchmark.name:<60} {format_seconds(result['best']):>10} {format_seconds(result['median']):>10}"
+        line += f" {format_seconds(expected):>10}" if expected else f" {'-':>10}"
+        if expected and result["best"] > expected * args.tolerance:
+            failures.append(benchmark.name)
+            line += f"  SLOWER x{result['best'] / expected:.1f}"
+        print(line, flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        baseline.update({name: result["best"] for name, result in results.items()})
+        with open(args.baseline, "w") as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline for {len(results)} benchmarks to {args.baseline}")
+
+    if args.check and failures:
+        print(f"{len(failures)} benchmarks exceeded their baseline by more than x{args.tolerance}:", file=sys.stderr)
+        for name in failures:
+            print(f"  {name}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
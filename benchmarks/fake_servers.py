@@ -0,0 +1,310 @@
+"""
+Local stand-ins for Hoarder and FlaskTTS
+
+They implement the parts of each API that HoarderService, article_parse and TTSService use, with configurable
+latency, failure rates and job durations, so the whole poll -> parse -> TTS -> download -> feed path can be exercised
+without a real Hoarder or a GPU box. Both are plain Flask apps served from a background thread:
+
+    hoarder = FakeHoarder(corpus_size=200, latency=0.05)
+    with serve(hoarder.app) as hoarder_url:
+        ...
+
+This module deliberately doesn't import hoarderpod, so it can be started before hoarderpod reads its configuration.
+"""
+
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from flask import Flask, Response, abort, jsonify, request
+from werkzeug.serving import make_server
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def _hoarder_timestamp(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def _load_corpus() -> list[tuple[str, str]]:
+    corpus = []
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        if filename.endswith(".html"):
+            with open(os.path.join(CORPUS_DIR, filename), encoding="utf-8") as f:
+                corpus.append((filename[: -len(".html")], f.read()))
+    return corpus
+
+
+class FaultInjector:
+    """Adds latency and random 500s to every request of a fake app, and counts requests per endpoint."""
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, seed: int | None = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.failures = 0
+        self.endpoint_requests = Counter()
+        self._lock = threading.Lock()
+
+    def install(self, app: Flask) -> None:
+        @app.before_request
+        def inject():
+            with self._lock:
+                self.requests += 1
+                self.endpoint_requests[request.endpoint] += 1
+                fail = self.random.random() < self.failure_rate
+                if fail:
+                    self.failures += 1
+            if self.latency:
+                time.sleep(self.latency)
+            if fail:
+                abort(500)
+
+
+class FakeHoarder:
+    """A Hoarder API serving bookmarks built from the benchmark corpus.
+
+    SingleFile-style pages (names starting with "singlefile") are served as assets, like Hoarder does for SingleFile
+    uploads, everything else is returned inline as htmlContent. Listing with ?includeContent=false leaves htmlContent
+    out.
+    """
+
+    def __init__(
+        self,
+        corpus_size: int = 100,
+        page_size: int = 20,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        api_key: str = "fake-key",
+        seed: int | None = 0,
+    ):
+        self.page_size = page_size
+        self.api_key = api_key
+        self.faults = FaultInjector(latency, failure_rate, seed)
+        self.corpus = _load_corpus()
+        self._corpus_cycle = itertools.cycle(self.corpus)
+        self._lock = threading.Lock()
+        self.bookmarks: list[dict] = []  # newest first, like the real API
+        self.assets: dict[str, str] = {}
+        # Bookmark id -> wall clock time it became visible, for time-to-feed measurements
+        self.added_at: dict[str, float] = {}
+
+        start = datetime.now(timezone.utc) - timedelta(minutes=corpus_size)
+        for i in range(corpus_size):
+            self.add_bookmark(created_at=start + timedelta(minutes=i))
+
+        self.app = self._build_app()
+
+    def add_bookmark(self, created_at: datetime | None = None) -> dict:
+        """Add a new bookmark, as if the user had just saved an article.
+
+        Args:
+            created_at: Optional creation time, defaults to now
+
+        Returns:
+            dict: The bookmark
+        """
+        created_at = created_at or datetime.now(timezone.utc)
+        name, html = next(self._corpus_cycle)
+        bookmark_id = str(uuid.uuid4())
+        content = {
+            "type": "link",
+            "url": f"https://example.com/{name}/{bookmark_id}",
+            "title": name.replace("_", " "),
+            "description": None,
+            "crawledAt": _hoarder_timestamp(created_at + timedelta(seconds=5)),
+            "htmlContent": html,
+        }
+        if name.startswith("singlefile"):
+            asset_id = str(uuid.uuid4())
+            content["htmlContent"] = None
+            content["precrawledArchiveAssetId"] = asset_id
+            self.assets[asset_id] = html
+
+        bookmark = {"id": bookmark_id, "createdAt": _hoarder_timestamp(created_at), "content": content}
+        with self._lock:
+            self.bookmarks.append(bookmark)
+            self.bookmarks.sort(key=lambda b: b["createdAt"], reverse=True)
+            self.added_at[bookmark_id] = time.time()
+        return bookmark
+
+    def _build_app(self) -> Flask:
+        app = Flask("fake_hoarder")
+        self.faults.install(app)
+
+        @app.before_request
+        def check_auth():
+            if request.headers.get("Authorization") != f"Bearer {self.api_key}":
+                abort(401)
+
+        @app.get("/api/v1/bookmarks")
+        def list_bookmarks():
+            cursor = int(request.args.get("cursor") or 0)
+            limit = int(request.args.get("limit") or self.page_size)
+            with self._lock:
+                page = self.bookmarks[cursor : cursor + limit]
+                next_cursor = str(cursor + limit) if cursor + limit < len(self.bookmarks) else None
+            if request.args.get("includeContent") == "false":
+                page = [{**b, "content": {k: v for k, v in b["content"].items() if k != "htmlContent"}} for b in page]
+            return jsonify({"bookmarks": page, "nextCursor": next_cursor})
+
+        @app.get("/api/v1/bookmarks/<bookmark_id>")
+        def get_bookmark(bookmark_id):
+            with self._lock:
+                for bookmark in self.bookmarks:
+                    if bookmark["id"] == bookmark_id:
+                        return jsonify(bookmark)
+            abort(404)
+
+        @app.get("/api/v1/assets/<asset_id>")
+        def get_asset(asset_id):
+            if asset_id not in self.assets:
+                abort(404)
+            return Response(self.assets[asset_id], mimetype="text/html")
+
+        return app
+
+
+class FakeTTS:
+    """A FlaskTTS API that "synthesizes" in simulated time.
+
+    Jobs are worked through by `workers` simulated GPUs, each job taking base_seconds + seconds_per_char per character
+    of text, and finish with a small fake mp3. The jobs list can be filtered with ?ids=a,b unless support_ids_filter
+    is False, in which case the filter is ignored like older FlaskTTS versions do.
+    """
+
+    def __init__(
+        self,
+        seconds_per_char: float = 0.0,
+        base_seconds: float = 0.0,
+        workers: int = 1,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        job_failure_rate: float = 0.0,
+        support_ids_filter: bool = True,
+        seed: int | None = 0,
+    ):
+        self.support_ids_filter = support_ids_filter
+        self.seconds_per_char = seconds_per_char
+        self.base_seconds = base_seconds
+        self.job_failure_rate = job_failure_rate
+        self.faults = FaultInjector(latency, failure_rate, seed)
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.jobs: dict[str, dict] = {}
+        self._worker_free_at = [0.0] * workers
+        self.app = self._build_app()
+
+    def _status(self, job: dict) -> str:
+        now = time.time()
+        if now < job["starts_at"]:
+            return "queued"
+        if now < job["finishes_at"]:
+            return "processing"
+        return "failed" if job["fails"] else "completed"
+
+    def _job_json(self, job_id: str, job: dict) -> dict:
+        status = self._status(job)
+        job_json = {"job_id": job_id, "status": status, "created_at": job["created_at"]}
+        if status == "completed":
+            job_json["completed_at"] = job["finishes_at"]
+        return job_json
+
+    def _build_app(self) -> Flask:
+        app = Flask("fake_tts")
+        self.faults.install(app)
+
+        @app.get("/health/check")
+        def health():
+            return jsonify({"status": "ok"})
+
+        @app.post("/tts/synthesize")
+        def synthesize():
+            body = request.get_json()
+            if not body or not body.get("text"):
+                abort(400)
+            duration = self.base_seconds + self.seconds_per_char * len(body["text"])
+            job_id = str(uuid.uuid4())
+            with self._lock:
+                now = time.time()
+                worker = min(range(len(self._worker_free_at)), key=self._worker_free_at.__getitem__)
+                starts_at = max(now, self._worker_free_at[worker])
+                self._worker_free_at[worker] = starts_at + duration
+                self.jobs[job_id] = {
+                    "text": body["text"],
+                    "model": body.get("model"),
+                    "voice": body.get("voice"),
+                    "created_at": now,
+                    "starts_at": starts_at,
+                    "finishes_at": starts_at + duration,
+                    "fails": self.random.random() < self.job_failure_rate,
+                }
+            return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+        @app.get("/tts/jobs")
+        def list_jobs():
+            ids = request.args.get("ids") if self.support_ids_filter else None
+            with self._lock:
+                if ids is not None:
+                    wanted = [job_id for job_id in ids.split(",") if job_id in self.jobs]
+                    jobs = [self._job_json(job_id, self.jobs[job_id]) for job_id in wanted]
+                else:
+                    jobs = [self._job_json(job_id, job) for job_id, job in self.jobs.items()]
+            return jsonify({"jobs": jobs})
+
+        @app.get("/tts/jobs/<job_id>")
+        def get_job(job_id):
+            with self._lock:
+                job = self.jobs.get(job_id)
+                if job is None:
+                    abort(404)
+                return jsonify(self._job_json(job_id, job))
+
+        @app.get("/tts/jobs/<job_id>/download")
+        def download(job_id):
+            with self._lock:
+                job = self.jobs.get(job_id)
+            if job is None or self._status(job) != "completed":
+                abort(404)
+            # An ID3 header and roughly 1 byte of "audio" per character of text
+            return Response(b"ID3" + b"\0" * len(job["text"]), mimetype="audio/mpeg")
+
+        @app.delete("/tts/jobs/<job_id>")
+        def delete_job(job_id):
+            with self._lock:
+                if self.jobs.pop(job_id, None) is None:
+                    abort(404)
+            return jsonify({"status": "deleted"})
+
+        return app
+
+
+@contextmanager
+def serve(app: Flask, host: str = "127.0.0.1", port: int = 0):
+    """Serve a Flask app on a background thread for the duration of a with block.
+
+    Args:
+        app: The app to serve
+        host: The interface to listen on
+        port: The port, 0 picks a free one
+
+    Yields:
+        str: The root url of the running server
+    """
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server(host, port, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name=f"{app.name}-server", daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{server.server_port}"
+    finally:
+        server.shutdown()
+        thread.join(timeout=5)
@@ -0,0 +1,226 @@
+"""
+Load test of the web app served by one or more web worker processes
+
+Seeds a throwaway database with synthetic episodes, then for each worker count starts hoarderpod.serve on a free port
+and has client processes request the feed and the episodes page as fast as they're answered. Reports requests per
+second and latency for each worker count, and the speedup over the first. Polling is off, so only serving is measured.
+
+Usage:
+  python -m benchmarks.load
+  python -m benchmarks.load --workers 1,2,4,8 --episodes 2000 --clients 16 --duration 20
+  python -m benchmarks.load --path /episodes/feed
+
+Workers only add throughput while there are idle CPUs for them, so on a machine with fewer CPUs than the largest worker
+count plus the clients the numbers flatten out.
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import requests
+
+from benchmarks.throughput import percentile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATHS = ["/episodes/feed", "/"]
+
+
+def configure_environment(workdir: str) -> dict:
+    """Point hoarderpod at a throwaway database with polling off. Must run before hoarderpod is imported.
+
+    Args:
+        workdir: Directory for the database, audio and locks
+
+    Returns:
+        dict: The environment to start the servers with
+    """
+    os.environ.update(
+        {
+            "HOARDER_API_KEY": "load-test",
+            # Nothing listens on the discard port, nothing should be calling out anyway
+            "HOARDER_ROOT_URL": "http://127.0.0.1:9",
+            "TTS_ROOT_URL": "http://127.0.0.1:9",
+            "API_POLLING_ENABLED": "false",
+            "DATABASE_URI": f"sqlite:///{os.path.join(workdir, 'episodes.db')}",
+            "MP3_STORAGE_PATH": os.path.join(workdir, "audio"),
+            "ASSET_SPOOL_PATH": os.path.join(workdir, "spool"),
+            "ORIGIN_CACHE_PATH": os.path.join(workdir, "origin"),
+            "LOCK_PATH": os.path.join(workdir, "locks"),
+        }
+    )
+    return {**os.environ, "PYTHONPATH": REPO_ROOT}
+
+
+def free_port() -> int:
+    """Get a port nothing is listening on."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int, port: int, env: dict, timeout: float = 60) -> subprocess.Popen:
+    """Start hoarderpod.serve and wait until every request it's sent is answered.
+
+    Args:
+        workers: Web worker processes
+        port: Port to listen on
+        env: The environment from configure_environment
+        timeout: Seconds to wait for it to come up
+
+    Returns:
+        subprocess.Popen: The server process
+
+    Raises:
+        RuntimeError: If it doesn't come up in time
+    """
+    command = [sys.executable, "-m", "hoarderpod.serve", "--workers", str(workers), "--host", "127.0.0.1"]
+    server = subprocess.Popen(
+        command + ["--port", str(port)], cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + timeout
+    pids = set()
+    # Connections go to whichever worker accepts first, wait until every worker has answered one
+    while time.monotonic() < deadline and len(pids) < workers:
+        if server.poll() is not None:
+            raise RuntimeError(f"The server exited with status {server.returncode}")
+        try:
+            pids.add(requests.get(f"http://127.0.0.1:{port}/health", timeout=5).json()["pid"])
+        except requests.RequestException:
+            time.sleep(0.2)
+    if len(pids) < workers:
+        stop_server(server)
+        raise RuntimeError(f"Only {len(pids)} of {workers} web workers answered within {timeout} seconds")
+    return server
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    """Stop the server and its web workers."""
+    server.terminate()
+    try:
+        server.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def hammer(base_url: str, paths: list[str], offset: int, deadline: float) -> tuple[list[float], Counter, int]:
+    """Request the paths in turn until the deadline, in a client process.
+
+    Args:
+        base_url: The server's root url
+        paths: Paths to request
+        offset: Which path this client starts with, so clients don't move in lockstep
+        deadline: time.time() to stop at
+
+    Returns:
+        tuple[list[float], Counter, int]: Latencies of the successful requests, successes per path, failed requests
+    """
+    session = requests.Session()
+    latencies = []
+    completed = Counter()
+    errors = 0
+    i = offset
+    while time.time() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = session.get(base_url + path, timeout=30)
+            response.raise_for_status()
+        except requests.RequestException:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+        completed[path] += 1
+    return latencies, completed, errors
+
+
+def run_load(base_url: str, paths: list[str], clients: int, duration: float, executor: ProcessPoolExecutor) -> dict:
+    """Have clients request the paths for duration seconds.
+
+    Returns:
+        dict: Requests per second overall and per path, latency percentiles and the number of failed requests
+    """
+    deadline = time.time() + duration
+    futures = [executor.submit(hammer, base_url, paths, i, deadline) for i in range(clients)]
+    latencies = []
+    completed = Counter()
+    errors = 0
+    for future in futures:
+        client_latencies, client_completed, client_errors = future.result()
+        latencies += client_latencies
+        completed += client_completed
+        errors += client_errors
+    return {
+        "requests_per_second": len(latencies) / duration,
+        "per_path": {path: completed[path] / duration for path in paths},
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "errors": errors,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Throughput of the web app by number of web worker processes")
+    parser.add_argument("--workers", default="1,2,4", help="Comma separated web worker counts to compare")
+    parser.add_argument("--episodes", type=int, default=1000, help="Synthetic episodes in the database")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent client processes")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load per worker count")
+    parser.add_argument("--path", action="append", help="Path to request, defaults to the feed and episodes page")
+    args = parser.parse_args(argv)
+    worker_counts = [int(count) for count in args.workers.split(",")]
+    paths = args.path or DEFAULT_PATHS
+    cpus = os.cpu_count() or 1
+    if cpus < 2:
+        # Every worker count would share the one CPU, and the run would show parity instead of scaling
+        print("Only 1 CPU, web workers can't run in parallel here. Run this on a multi-core machine.", file=sys.stderr)
+        return 2
+    if max(worker_counts) > cpus:
+        print(f"warning: only {cpus} CPUs, worker counts above that won't scale any further", file=sys.stderr)
+
+    workdir = tempfile.mkdtemp(prefix="hoarderpod-load-")
+    try:
+        env = configure_environment(workdir)
+        from benchmarks.bench import use_synthetic_db
+
+        use_synthetic_db(os.path.join(workdir, "episodes.db"), args.episodes)
+        print(f"{args.episodes} episodes, {args.clients} clients, {os.cpu_count()} CPUs, {args.duration:g}s each")
+
+        results = {}
+        with ProcessPoolExecutor(max_workers=args.clients) as executor:
+            for workers in worker_counts:
+                port = free_port()
+                server = start_server(workers, port, env)
+                try:
+                    base_url = f"http://127.0.0.1:{port}"
+                    # A short warm up so the first measured requests don't pay for template compilation and imports
+                    run_load(base_url, paths, args.clients, min(2, args.duration), executor)
+                    results[workers] = run_load(base_url, paths, args.clients, args.duration, executor)
+                finally:
+                    stop_server(server)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    first = results[worker_counts[0]]["requests_per_second"]
+    per_path = "".join(f" {path:>16}" for path in paths)
+    print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>6}{per_path}")
+    for workers, result in results.items():
+        speedup = result["requests_per_second"] / first if first else float("nan")
+        per_path = "".join(f" {result['per_path'][path]:>16.1f}" for path in paths)
+        print(
+            f"{workers:>7} {result['requests_per_second']:>9.1f} {speedup:>7.2f}x {result['latency_p50'] * 1000:>8.1f} "
+            f"{result['latency_p95'] * 1000:>8.1f} {result['errors']:>6}{per_path}"
+        )
+    return 0 if all(result["requests_per_second"] for result in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+End-to-end throughput test against the fake Hoarder and FlaskTTS servers
+
+Runs the real poll -> parse -> TTS -> download -> feed path against benchmarks.fake_servers and reports bookmarks per
+hour and time-to-feed (from a bookmark appearing in Hoarder to its episode being in the feed).
+
+Usage:
+  python -m benchmarks.throughput --corpus-size 200 --duration 120
+  python -m benchmarks.throughput --mode pipeline --arrivals-per-minute 30 --hoarder-latency 0.2
+  python -m benchmarks.throughput --tts-failure-rate 0.05 --tts-seconds-per-char 0.0005
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.fake_servers import FakeHoarder, FakeTTS, serve
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Get the pct percentile of values using the nearest rank."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def configure_environment(hoarder_url: str, tts_url: str, api_key: str, poll_interval: float) -> None:
+    """Point hoarderpod's configuration at the fakes and a throwaway database. Must run before hoarderpod is imported."""
+    workdir = tempfile.mkdtemp(prefix="hoarderpod-throughput-")
+    os.environ.update(
+        {
+            "HOARDER_ROOT_URL": hoarder_url,
+            "HOARDER_API_KEY": api_key,
+            "TTS_ROOT_URL": tts_url,
+            "DATABASE_URI": f"sqlite:///{os.path.join(workdir, 'episodes.db')}",
+            "MP3_STORAGE_PATH": os.path.join(workdir, "audio"),
+            "ASSET_SPOOL_PATH": os.path.join(workdir, "spool"),
+            "ORIGIN_CACHE_PATH": os.path.join(workdir, "origin"),
+            "PIPELINE_SYNC_INTERVAL_SECONDS": str(max(1, int(poll_interval))),
+            "PIPELINE_SUBMIT_INTERVAL_SECONDS": "1",
+            "PIPELINE_DOWNLOAD_INTERVAL_SECONDS": "1",
+        }
+    )
+
+
+def run_throughput(args) -> dict:
+    hoarder = FakeHoarder(
+        corpus_size=args.corpus_size,
+        page_size=args.page_size,
+        latency=args.hoarder_latency,
+        failure_rate=args.hoarder_failure_rate,
+    )
+    tts = FakeTTS(
+        seconds_per_char=args.tts_seconds_per_char,
+        base_seconds=args.tts_base_seconds,
+        workers=args.tts_workers,
+        latency=args.tts_latency,
+        failure_rate=args.tts_failure_rate,
+        job_failure_rate=args.tts_job_failure_rate,
+    )
+
+    with serve(hoarder.app) as hoarder_url, serve(tts.app) as tts_url:
+        configure_environment(hoarder_url, tts_url, hoarder.api_key, args.poll_interval)
+
+        from hoarderpod import run
+        from hoarderpod.episodes import EpisodeOps, init_db
+
+        init_db()
+        episode_ops = EpisodeOps()
+        in_feed_at: dict[str, float] = {}
+        stop = threading.Event()
+
+        def arrivals():
+            if not args.arrivals_per_minute:
+                return
+            while not stop.wait(60 / args.arrivals_per_minute):
+                hoarder.add_bookmark()
+
+        arrival_thread = threading.Thread(target=arrivals, daemon=True)
+        arrival_thread.start()
+
+        pipeline = None
+        if args.mode == "pipeline":
+            from hoarderpod.pipeline import Pipeline
+
+            pipeline = Pipeline()
+            pipeline.start()
+
+        start = time.time()
+        next_poll = start
+        while time.time() - start < args.duration:
+            if pipeline is None and time.time() >= next_poll:
+                try:
+                    run.main_poll_loop()
+                except Exception as e:
+                    print(f"Poll failed: {e}", file=sys.stderr)
+                next_poll = time.time() + args.poll_interval
+
+            # The feed is built from these rows, so this is when an episode becomes available to podcast clients
+            now = time.time()
+            for episode in episode_ops.get_episodes_with_mp3():
+                in_feed_at.setdefault(episode.id, now)
+
+            if len(in_feed_at) >= len(hoarder.added_at) and not args.arrivals_per_minute:
+                break
+            time.sleep(0.2)
+
+        elapsed = time.time() - start
+        stop.set()
+        if pipeline is not None:
+            pipeline.stop()
+
+        feed_start = time.perf_counter()
+        run.gen_feed(episode_ops.get_episodes_with_mp3(), "http://localhost:5002/")
+        feed_seconds = time.perf_counter() - feed_start
+
+    time_to_feed = [in_feed_at[bookmark_id] - added for bookmark_id, added in hoarder.added_at.items() if bookmark_id in in_feed_at]
+    return {
+        "mode": args.mode,
+        "elapsed_seconds": elapsed,
+        "bookmarks": len(hoarder.added_at),
+        "in_feed": len(in_feed_at),
+        "bookmarks_per_hour": len(in_feed_at) / elapsed * 3600 if elapsed else 0,
+        "time_to_feed_p50": percentile(time_to_feed, 50),
+        "time_to_feed_p95": percentile(time_to_feed, 95),
+        "time_to_feed_mean": statistics.mean(time_to_feed) if time_to_feed else float("nan"),
+        "gen_feed_seconds": feed_seconds,
+        "hoarder_requests": hoarder.faults.requests,
+        "hoarder_failures": hoarder.faults.failures,
+        "tts_requests": tts.faults.requests,
+        "tts_failures": tts.faults.failures,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="End-to-end throughput against fake Hoarder and FlaskTTS servers")
+    parser.add_argument("--mode", choices=["poll", "pipeline"], default="poll", help="main_poll_loop or the worker")
+    parser.add_argument("--duration", type=float, default=60, help="Maximum seconds to run")
+    parser.add_argument("--poll-interval", type=float, default=1, help="Seconds between polls")
+    parser.add_argument("--corpus-size", type=int, default=100, help="Bookmarks already in Hoarder at the start")
+    parser.add_argument("--arrivals-per-minute", type=float, default=0, help="New bookmarks added while running")
+    parser.add_argument("--page-size", type=int, default=20, help="Hoarder bookmarks per page")
+    parser.add_argument("--hoarder-latency", type=float, default=0.0, help="Seconds added to each Hoarder request")
+    parser.add_argument("--hoarder-failure-rate", type=float, default=0.0, help="Fraction of Hoarder requests that 500")
+    parser.add_argument("--tts-latency", type=float, default=0.0, help="Seconds added to each TTS request")
+    parser.add_argument("--tts-failure-rate", type=float, default=0.0, help="Fraction of TTS requests that 500")
+    parser.add_argument("--tts-job-failure-rate", type=float, default=0.0, help="Fraction of TTS jobs that fail")
+    parser.add_argument("--tts-seconds-per-char", type=float, default=0.0, help="Simulated synthesis speed")
+    parser.add_argument("--tts-base-seconds", type=float, default=0.5, help="Simulated per-job overhead")
+    parser.add_argument("--tts-workers", type=int, default=1, help="Simulated GPUs")
+    args = parser.parse_args(argv)
+
+    result = run_throughput(args)
+    for key, value in result.items():
+        print(f"{key:<22} {value:.2f}" if isinstance(value, float) else f"{key:<22} {value}")
+    return 0 if result["in_feed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
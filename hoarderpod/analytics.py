@@ -0,0 +1,212 @@
+"""
+Throughput and latency report built from the episode_events timeline
+
+Every episode records when it was seen in hoarder, parsed, submitted to TTS, reported completed and downloaded. For a
+window of time the report gives how many episodes went through each step, throughput, and the distribution of
+
+    queue_wait   parsed to submitted, time spent waiting for a TTS slot
+    synthesis    submitted to completed, time the TTS service took
+    end_to_end   first seen to downloaded, time from the bookmark being picked up to its audio being in the feed
+
+Each duration is counted in the window its later event falls in. Run as a module for a report on the command line:
+
+    python -m hoarderpod.analytics --window 24h --window 7d
+"""
+
+import math
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from hoarderpod.episodes import EpisodeOps
+
+WINDOW_UNITS = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+# Duration, the event that starts it and the event that ends it
+DURATIONS = (("queue_wait", "parsed", "submitted"), ("synthesis", "submitted", "completed"))
+
+
+def parse_window(window: str) -> timedelta:
+    """Parse a window like 90m, 24h, 7d or 2w, a bare number is hours.
+
+    Args:
+        window: The window
+
+    Returns:
+        timedelta: Its length
+
+    Raises:
+        ValueError: If the window can't be parsed or isn't positive
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([mhdw]?)\s*", window.lower())
+    if match is None or float(match.group(1)) <= 0:
+        raise ValueError(f"Invalid window {window}, expected e.g. 90m, 24h or 7d")
+    return timedelta(**{WINDOW_UNITS[match.group(2) or "h"]: float(match.group(1))})
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """Get a percentile by the nearest-rank method.
+
+    Args:
+        values: The values, in any order
+        pct: The percentile, 0 to 100
+
+    Returns:
+        float | None: The percentile, None if there are no values
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(seconds: list[float]) -> dict:
+    """Summarize durations in seconds.
+
+    Args:
+        seconds: The durations
+
+    Returns:
+        dict: count, mean, p50 and p95, None when there are no durations
+    """
+    return {
+        "count": len(seconds),
+        "mean": sum(seconds) / len(seconds) if seconds else None,
+        "p50": percentile(seconds, 50),
+        "p95": percentile(seconds, 95),
+    }
+
+
+def build_report(events: list[tuple[str, str, datetime, int | None]], since: datetime, until: datetime) -> dict:
+    """Build the report for a window from episode events.
+
+    Args:
+        events: Episode id, event, time and size, oldest first, as returned by EpisodeOps.get_events
+        since: Start of the window, naive UTC
+        until: End of the window, naive UTC
+
+    Returns:
+        dict: Event counts, throughput, text and audio volume and duration summaries for the window
+    """
+    timelines = defaultdict(list)
+    for episode_id, event, at, size in events:
+        timelines[episode_id].append((event, at, size))
+
+    counts = defaultdict(int)
+    text_chars = 0
+    audio_bytes = 0
+    durations = {name: [] for name, _, _ in DURATIONS}
+    durations["end_to_end"] = []
+
+    for timeline in timelines.values():
+        last = {}
+        first_seen = None
+        for event, at, size in timeline:
+            in_window = since <= at <= until
+            if in_window:
+                counts[event] += 1
+                if event == "parsed":
+                    text_chars += size or 0
+                elif event == "downloaded":
+                    audio_bytes += size or 0
+                for name, start, end in DURATIONS:
+                    if event == end and start in last:
+                        durations[name].append((at - last[start]).total_seconds())
+                if event == "downloaded" and first_seen is not None:
+                    durations["end_to_end"].append((at - first_seen).total_seconds())
+
+            if event == "downloaded":
+                # Durations of a regenerated episode start again from its next events
+                last.clear()
+                first_seen = None
+                continue
+            last[event] = at
+            if event in ("seen", "parsed") and first_seen is None:
+                first_seen = at
+
+    hours = (until - since).total_seconds() / 3600
+    return {
+        "since": since,
+        "until": until,
+        "counts": {event: counts[event] for event in ("seen", "parsed", "submitted", "completed", "downloaded")},
+        "throughput_per_hour": counts["downloaded"] / hours if hours else None,
+        "text_chars": text_chars,
+        "audio_bytes": audio_bytes,
+        **{name: summarize(seconds) for name, seconds in durations.items()},
+    }
+
+
+def analytics_report(window: str, now: datetime | None = None, episode_ops: EpisodeOps | None = None) -> dict:
+    """Build the report for the window of time up to now.
+
+    Args:
+        window: The window, e.g. 24h, see parse_window
+        now: End of the window, naive UTC, defaults to now
+        episode_ops: Optional EpisodeOps to read events with
+
+    Returns:
+        dict: The report, see build_report, with the window it covers
+    """
+    until = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    since = until - parse_window(window)
+    events = (episode_ops or EpisodeOps()).get_events(since, until)
+    return {"window": window, **build_report(events, since, until)}
+
+
+def _format_seconds(seconds: float | None) -> str:
+    if seconds is None:
+        return "-"
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.1f}m"
+    return f"{seconds / 3600:.1f}h"
+
+
+def format_report(report: dict) -> str:
+    """Format a report for the command line.
+
+    Args:
+        report: The report from analytics_report
+
+    Returns:
+        str: The report as text
+    """
+    counts = ", ".join(f"{count} {event}" for event, count in report["counts"].items())
+    throughput = report["throughput_per_hour"]
+    lines = [
+        f"Last {report['window']} ({report['since']:%Y-%m-%d %H:%M} to {report['until']:%Y-%m-%d %H:%M} UTC)",
+        f"  {counts}",
+        f"  throughput {throughput:.2f} episodes/hour" if throughput is not None else "  throughput -",
+        f"  {report['text_chars']} characters parsed, {report['audio_bytes'] / 1024 / 1024:.1f} MB of audio",
+    ]
+    for name in ("queue_wait", "synthesis", "end_to_end"):
+        summary = report[name]
+        lines.append(
+            f"  {name:<11} p50 {_format_seconds(summary['p50']):>6}  p95 {_format_seconds(summary['p95']):>6}  "
+            f"mean {_format_seconds(summary['mean']):>6}  n={summary['count']}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from hoarderpod.config import Config
+    from hoarderpod.episodes import init_db
+
+    parser = argparse.ArgumentParser(description="Report episode throughput and latency")
+    parser.add_argument(
+        "-w", "--window", action="append", help="Window to report on, e.g. 90m, 24h or 7d, can be given more than once"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    init_db()
+    reports = [analytics_report(window) for window in args.window or Config.ANALYTICS_WINDOWS]
+    if args.json:
+        print(json.dumps(reports, default=str, indent=2))
+    else:
+        print("\n\n".join(format_report(report) for report in reports))
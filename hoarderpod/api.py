@@ -1,44 +1,155 @@
 """
 API for polling hoarder and generating podcast feed
+
+Importing this module has no side effects, create_app() connects the database and starts the poll scheduler.
 """
 
+import hmac
 import os
 
-from apscheduler.schedulers.background import BackgroundScheduler
-from flask import Flask, Response, render_template, request, send_file, send_from_directory
-from flask_restx import Api, Resource, fields
+from flask import (
+    Blueprint,
+    Flask,
+    Response,
+    abort,
+    current_app,
+    render_template,
+    request,
+    send_file,
+    send_from_directory,
+)
+from flask_restx import Api, Namespace, Resource, fields
+from werkzeug.security import safe_join
 
+from hoarderpod.analytics import analytics_report
+from hoarderpod.bulk import BULK_ACTIONS, run_bulk
+from hoarderpod.circuit_breaker import breakers
 from hoarderpod.config import Config
-from hoarderpod.episodes import EpisodeOps
-from hoarderpod.run import gen_feed, poll_hoarder_and_tts
-from hoarderpod.tts_service import TTSService
+from hoarderpod.episodes import EPISODE_STATUSES, EpisodeFilter, EpisodeOps, init_db
+from hoarderpod.jobs import JobRunner
+from hoarderpod.locks import Leader
+from hoarderpod.metrics import CONTENT_TYPE, instrument_requests, registry, render_seconds
+from hoarderpod.profiling import profiled
+from hoarderpod.renditions import (
+    RenditionError,
+    ensure_rendition,
+    get_rendition,
+    parse_rendition_filename,
+    rendition_filename,
+)
+from hoarderpod.run import (
+    archive_mirrors,
+    audio_storage,
+    cleanup_unknown_tts_jobs,
+    complete_tts_job,
+    gen_feed,
+    poll_hoarder_and_tts,
+    register_metrics,
+    submit_tts_for_waiting_episodes,
+)
 
-# Initialize TTS service to get MP3_STORAGE_PATH
-tts_service = TTSService()
+# Every poll, scheduled or requested through the API, goes through the same single-flight runner. The lock makes the
+# runners of several web workers take turns too, see serve, and the job records let any of them answer /jobs/<id>
+job_runner = JobRunner(
+    lock_path=os.path.join(Config.LOCK_PATH, "jobs.lock"), records_path=os.path.join(Config.LOCK_PATH, "jobs")
+)
+episode_ops = EpisodeOps()
 
-sched = BackgroundScheduler(daemon=True)
-sched.add_job(poll_hoarder_and_tts, "interval", minutes=Config.POLL_INTERVAL_MINUTES)
-sched.start()
+web = Blueprint("web", __name__)
 
-app = Flask(__name__)
-episode_ops = EpisodeOps()
 
+def submit_poll():
+    """Queue a poll of hoarder and TTS, coalescing with one that is already queued."""
+    return job_runner.submit("poll", poll_hoarder_and_tts)
 
-@app.route("/")
-def show_episodes():
-    """Show episodes list in HTML format"""
-    episodes = episode_ops.get_all_episodes(sort_by_created_at=True)
-    return render_template("episodes.html", episodes=episodes)
 
+def submit_tts():
+    """Queue a submission of waiting episodes to TTS, without a hoarder sync."""
+    return job_runner.submit("tts_submit", submit_tts_for_waiting_episodes)
 
-api = Api(
-    app, version="1.0", title="Hoarder Episodes API", description="API for accessing Hoarder episodes", doc="/docs"
-)
 
-ns = api.namespace("episodes", path="/episodes", description="Episode operations")
+def submit_tts_cleanup():
+    """Queue a cleanup of jobs on the TTS service that no episode is waiting on."""
+    return job_runner.submit("tts_cleanup", cleanup_unknown_tts_jobs)
+
+
+def submit_audio_storage():
+    """Queue a run of the audio storage manager."""
+    return job_runner.submit("audio_storage", audio_storage.run)
+
+
+def _job_accepted(job):
+    """Respond 202 with the job and where to check on it."""
+    return job.to_dict(), 202, {"Location": f"{request.script_root}/jobs/{job.id}"}
+
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+
+def _page_arg(name: str, default: int, maximum: int | None = None) -> int:
+    """Read a positive integer query parameter, falling back to default when it's missing or invalid."""
+    value = request.args.get(name, type=int) or default
+    value = max(value, 1)
+    return min(value, maximum) if maximum else value
+
+
+@web.route("/")
+def show_episodes():
+    """Show episodes list in HTML format, or the matching episodes when there's a search query"""
+    query = request.args.get("q", "").strip()
+    with render_seconds.time(view="search" if query else "index"):
+        if not query:
+            episodes = episode_ops.get_all_episodes(sort_by_created_at=True)
+            return render_template(
+                "episodes.html",
+                episodes=episodes,
+                estimates=episode_ops.get_tts_estimates(),
+                dead_letters=episode_ops.get_failures(dead_only=True),
+            )
+
+        page = _page_arg("page", 1)
+        total, results = episode_ops.search_episodes(query, page, SEARCH_PAGE_SIZE)
+        return render_template(
+            "episodes.html",
+            episodes=[episode for episode, _ in results],
+            snippets={episode.id: snippet for episode, snippet in results},
+            estimates=episode_ops.get_tts_estimates(),
+            query=query,
+            page=page,
+            pages=max(1, -(-total // SEARCH_PAGE_SIZE)),
+            total=total,
+        )
+
+
+@web.route("/health")
+def health():
+    """State of the circuit breakers for Hoarder, TTS and archive.ph, and of the web worker that answered.
+
+    The status is degraded while any of the breakers isn't closed.
+    """
+    services = {name: breaker.to_dict() for name, breaker in breakers.items()}
+    degraded = any(service["state"] != "closed" for service in services.values())
+    scheduler = current_app.extensions.get("hoarderpod_scheduler")
+    return {
+        "status": "degraded" if degraded else "ok",
+        "services": services,
+        "archive_ph_mirrors": archive_mirrors.to_dict(),
+        "pid": os.getpid(),
+        "runs_scheduler": scheduler is not None and scheduler.is_leader,
+    }
+
+
+@web.route("/metrics")
+def metrics():
+    """Metrics in the Prometheus text format"""
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+ns = Namespace("episodes", path="/episodes", description="Episode operations")
 
 # Define the episode model for swagger documentation
-episode_model = api.model(
+episode_model = ns.model(
     "Episode",
     {
         "id": fields.String(required=True, description="Episode ID"),
@@ -54,6 +165,23 @@ episode_model = api.model(
 )
 
 
+search_result_model = ns.clone(
+    "SearchResult",
+    episode_model,
+    {"snippet": fields.String(description="HTML excerpt with the matching words in <mark> tags")},
+)
+search_model = ns.model(
+    "SearchResults",
+    {
+        "query": fields.String(description="The search query"),
+        "page": fields.Integer(description="Page of results, starting at 1"),
+        "per_page": fields.Integer(description="Results per page"),
+        "total": fields.Integer(description="Total number of matching episodes"),
+        "results": fields.List(fields.Nested(search_result_model), description="Best matches first"),
+    },
+)
+
+
 @ns.route("/")
 class EpisodeList(Resource):
     @ns.doc("list_episodes")
@@ -63,14 +191,19 @@ class EpisodeList(Resource):
         return episode_ops.get_all_episodes()
 
 
+def _run_bulk_on_episode(action: str, episode_id: str) -> bool:
+    """Apply a bulk action to a single episode, returning whether the episode exists."""
+    result = run_bulk(action, EpisodeFilter(ids=[episode_id]), episode_ops=episode_ops, audio_storage=audio_storage)
+    return result["count"] > 0
+
+
 @ns.route("/<episode_id>")
 class Episode(Resource):
     @ns.doc("delete_episode")
     def delete(self, episode_id):
         """Delete an episode"""
         print("Deleting episode", episode_id)
-        num_deleted = episode_ops.delete_episode(episode_id)
-        if num_deleted == 0:
+        if not _run_bulk_on_episode("delete", episode_id):
             return "Episode not found", 404
         return "OK"
 
@@ -82,26 +215,173 @@ class Episode(Resource):
         """Request new TTS run for an episode"""
 
         print("Requesting new TTS run for episode", episode_id)
-
-        if episode_id not in episode_ops.get_episode_ids():
+        if not _run_bulk_on_episode("regenerate", episode_id):
             return "Episode not found", 404
+        return _job_accepted(submit_tts())
 
-        mp3_path = episode_ops.get_episode_mp3(episode_id)
-        if mp3_path and os.path.exists(mp3_path):
-            os.remove(mp3_path)
 
-        episode_ops.clear_tts(episode_id)
-        poll_hoarder_and_tts()
-        return "OK"
+bulk_model = ns.model(
+    "BulkRequest",
+    {
+        "ids": fields.List(fields.String, description="Episode IDs"),
+        "since": fields.String(description="Earliest creation date, ISO 8601, UTC if it has no timezone"),
+        "until": fields.String(description="Creation date the episodes have to be older than, ISO 8601"),
+        "domain": fields.String(description="Domain of the article URL, subdomains included"),
+        "author": fields.String(description="Part of an author's name, case insensitive"),
+        "status": fields.String(description="TTS status", enum=list(EPISODE_STATUSES)),
+        "dry_run": fields.Boolean(description="Only list the episodes the action would apply to", default=False),
+    },
+)
+
+
+@ns.route("/bulk/<action>")
+@ns.doc(params={"action": f"One of {', '.join(BULK_ACTIONS)}"})
+class Bulk(Resource):
+    @ns.doc("bulk_action")
+    @ns.expect(bulk_model)
+    def post(self, action):
+        """Delete, regenerate or purge the audio of every episode matching a filter, each filter given has to match"""
+        if action not in BULK_ACTIONS:
+            return "Unknown action", 404
+        body = request.get_json(silent=True) or {}
+        try:
+            episode_filter = EpisodeFilter(
+                ids=body.get("ids"),
+                since=body.get("since"),
+                until=body.get("until"),
+                domain=body.get("domain"),
+                author=body.get("author"),
+                status=body.get("status"),
+            )
+            result = run_bulk(
+                action,
+                episode_filter,
+                dry_run=bool(body.get("dry_run")),
+                episode_ops=episode_ops,
+                audio_storage=audio_storage,
+            )
+        except (TypeError, ValueError) as e:
+            return str(e), 400
+
+        if action == "regenerate" and result["count"] and not result["dry_run"]:
+            job = submit_tts()
+            return {**result, "job": job.to_dict()}, 202, {"Location": f"{request.script_root}/jobs/{job.id}"}
+        return result
+
+
+@ns.route("/search")
+class EpisodeSearch(Resource):
+    @ns.doc(
+        "search_episodes",
+        params={
+            "q": "Words to search titles, authors, descriptions and article text for",
+            "page": "Page of results, starting at 1",
+            "per_page": f"Results per page, at most {SEARCH_MAX_PAGE_SIZE}",
+        },
+    )
+    @ns.marshal_with(search_model)
+    def get(self):
+        """Search episodes"""
+        query = request.args.get("q", "").strip()
+        page = _page_arg("page", 1)
+        per_page = _page_arg("per_page", SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE)
+        with render_seconds.time(view="search"):
+            total, results = episode_ops.search_episodes(query, page, per_page)
+        return {
+            "query": query,
+            "page": page,
+            "per_page": per_page,
+            "total": total,
+            "results": [{**_episode_fields(episode), "snippet": snippet} for episode, snippet in results],
+        }
+
+
+def _episode_fields(episode) -> dict:
+    """Get an episode's columns as a dict for marshalling."""
+    return {column.name: getattr(episode, column.name) for column in episode.__table__.columns}
+
+
+tts_waiting_model = ns.clone(
+    "TTSWaitingEpisode",
+    episode_model,
+    {
+        "estimated_seconds": fields.Float(description="Estimated synthesis time"),
+        "predicted_ready_at": fields.DateTime(description="When the audio is expected to be ready, UTC"),
+    },
+)
 
 
 @ns.route("/tts_waiting")
 class TTSWaiting(Resource):
     @ns.doc("list_episodes_waiting_for_tts")
-    @ns.marshal_list_with(episode_model)
+    @ns.marshal_list_with(tts_waiting_model)
     def get(self):
-        """Get the list of episodes that are waiting for TTS"""
-        return episode_ops.get_episodes_to_tts()
+        """Get the list of episodes that are waiting for TTS, in the order they will be submitted"""
+        estimates = episode_ops.get_tts_estimates()
+        waiting = []
+        for episode in episode_ops.get_episodes_to_tts():
+            estimated_seconds, predicted_ready_at = estimates.get(episode.id, (None, None))
+            waiting.append(
+                {
+                    **_episode_fields(episode),
+                    "estimated_seconds": estimated_seconds,
+                    "predicted_ready_at": predicted_ready_at,
+                }
+            )
+        return waiting
+
+
+failure_model = ns.model(
+    "Failure",
+    {
+        "item_id": fields.String(description="Episode ID, or the bookmark ID before it has been extracted"),
+        "stage": fields.String(description="extract or tts"),
+        "title": fields.String(description="Episode title, or the bookmark URL before it has been extracted"),
+        "attempts": fields.Integer(description="Failed attempts so far"),
+        "last_error": fields.String(description="What went wrong the last time"),
+        "last_failed_at": fields.DateTime(description="When it last failed, UTC"),
+        "next_retry_at": fields.DateTime(description="When it will be retried, UTC"),
+        "dead_at": fields.DateTime(description="When it was given up on, UTC, until it's retried by hand"),
+    },
+)
+
+
+@ns.route("/failures")
+class FailureList(Resource):
+    @ns.doc("list_failures", params={"dead": "Only list dead-lettered failures, true or false"})
+    @ns.marshal_list_with(failure_model)
+    def get(self):
+        """List failed extractions and TTS jobs, most recent first"""
+        return episode_ops.get_failures(dead_only=request.args.get("dead", "false").lower() == "true")
+
+
+@ns.route("/failures/<item_id>/retry")
+class FailureRetry(Resource):
+    @ns.doc("retry_failure")
+    def post(self, item_id):
+        """Clear an episode's failures and retry it on a new poll"""
+        print("Retrying failed episode", item_id)
+        if not episode_ops.retry_failures(item_id):
+            return "Failure not found", 404
+        return _job_accepted(submit_poll())
+
+
+@ns.route("/analytics")
+class Analytics(Resource):
+    @ns.doc(
+        "get_analytics",
+        params={"window": "Window to report on, e.g. 90m, 24h or 7d, can be given more than once"},
+    )
+    def get(self):
+        """Get throughput, queue wait, synthesis time and end to end latency over windows of time"""
+        reports = []
+        for window in request.args.getlist("window") or Config.ANALYTICS_WINDOWS:
+            try:
+                report = analytics_report(window, episode_ops=episode_ops)
+            except ValueError as e:
+                return str(e), 400
+            reports.append({**report, "since": report["since"].isoformat(), "until": report["until"].isoformat()})
+        return reports
 
 
 @ns.route("/force_update")
@@ -109,56 +389,197 @@ class ForceUpdate(Resource):
     @ns.doc("force_update")
     def get(self):
         """Force update the episodes"""
-        poll_hoarder_and_tts()
-        return "OK"
+        return _job_accepted(submit_poll())
 
 
 @ns.route("/feed")
 class Feed(Resource):
-    @ns.doc("get_feed")
+    @ns.doc("get_feed", params={"rendition": "Audio rendition to link to, one of AUDIO_RENDITIONS"})
     def get(self):
         """Get the feed"""
-        episodes = episode_ops.get_episodes_with_mp3()
-        # Limit to most recent episodes (reverse order since episodes are sorted oldest first)
-        episodes = episodes[-Config.FEED_MAX_EPISODES:] if len(episodes) > Config.FEED_MAX_EPISODES else episodes
-        feed_str = gen_feed(episodes, request.url_root)
+        try:
+            rendition = get_rendition(request.args.get("rendition", Config.FEED_DEFAULT_RENDITION))
+        except KeyError:
+            return "Unknown rendition", 404
+
+        with render_seconds.time(view="feed"):
+            episodes = episode_ops.get_episodes_with_mp3()
+            # Limit to most recent episodes (reverse order since episodes are sorted oldest first)
+            episodes = episodes[-Config.FEED_MAX_EPISODES:] if len(episodes) > Config.FEED_MAX_EPISODES else episodes
+            with profiled("gen_feed"):
+                feed_str = gen_feed(episodes, request.url_root, rendition)
         return Response(feed_str, mimetype="application/rss+xml")
 
 
-@app.route("/feed")
-@app.route("/feed.xml")
-@app.route("/feed.rss")
-@app.route("/rss")
-@app.route("/atom")
+jobs_ns = Namespace("jobs", path="/jobs", description="Background job status")
+
+
+@jobs_ns.route("/<job_id>")
+class JobStatusResource(Resource):
+    @jobs_ns.doc("get_job_status")
+    def get(self, job_id):
+        """Get the status and progress of a background job"""
+        job = job_runner.get_status(job_id)
+        if job is None:
+            return "Job not found", 404
+        return job
+
+
+tts_ns = Namespace("tts", path="/tts", description="TTS service callbacks")
+
+
+def _callback_token() -> str:
+    """Get the token a callback was sent with in its bearer header.
+
+    Only the header is read, a token in the query string would end up in access and proxy logs.
+    """
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        return auth_header[len("Bearer ") :]
+    return ""
+
+
+@tts_ns.route("/callback/<job_id>")
+class TTSCallback(Resource):
+    @tts_ns.doc("tts_callback")
+    def post(self, job_id):
+        """Notify that a TTS job has finished so its mp3 is downloaded right away"""
+        if not Config.TTS_CALLBACK_TOKEN:
+            return "TTS callbacks are disabled", 404
+
+        if not hmac.compare_digest(_callback_token(), Config.TTS_CALLBACK_TOKEN):
+            return "Unauthorized", 401
+
+        if not episode_ops.is_tts_job_pending(job_id):
+            return "Job not found", 404
+
+        if not complete_tts_job(job_id):
+            return "Job not completed", 409
+        return "OK"
+
+
+@web.route("/feed")
+@web.route("/feed.xml")
+@web.route("/feed.rss")
+@web.route("/rss")
+@web.route("/atom")
 def feed():
     """Hidden alternate routes to get the feed"""
     return Feed().get()
 
 
-@app.route("/cover.jpg")
+@web.route("/cover.jpg")
 def cover():
     """Get the cover image"""
-    return send_file(os.path.join(app.root_path, "../cover.jpg"), mimetype="image/jpeg")
+    return send_file(os.path.join(current_app.root_path, "../cover.jpg"), mimetype="image/jpeg")
 
 
-@app.route("/feed.svg")
+@web.route("/feed.svg")
 def feed_img():
     """Get the feed image"""
-    return send_file(os.path.join(app.root_path, "../feed.svg"), mimetype="image/svg+xml")
+    return send_file(os.path.join(current_app.root_path, "../feed.svg"), mimetype="image/svg+xml")
 
 
-@app.route("/audio/<path:filename>")
+@web.route("/audio/<path:filename>")
 def serve_audio(filename):
-    """Serve audio files"""
-    return send_from_directory(tts_service.mp3_storage_path, filename)
+    """Serve audio files, encoding a rendition the first time it's requested"""
+    if request.args.get("rendition"):
+        try:
+            filename = rendition_filename(filename, get_rendition(request.args["rendition"]))
+        except KeyError:
+            abort(404)
+
+    parsed = parse_rendition_filename(filename)
+    if parsed is None:
+        path = safe_join(Config.MP3_STORAGE_PATH, filename)
+        if path is None or not os.path.exists(path):
+            return _audio_missing(filename)
+        audio_storage.record_access(filename)
+        return send_from_directory(Config.MP3_STORAGE_PATH, filename)
+
+    mp3_filename, rendition = parsed
+    try:
+        ensure_rendition(mp3_filename, rendition)
+    except FileNotFoundError:
+        return _audio_missing(mp3_filename)
+    except RenditionError as e:
+        # Better to spend the bandwidth than to fail the download
+        print(f"Serving the original audio for {filename}: {e}")
+        filename, rendition = mp3_filename, None
+    audio_storage.record_access(filename)
+    return send_from_directory(Config.MP3_STORAGE_PATH, filename, mimetype=rendition.mimetype if rendition else None)
+
+
+def _audio_missing(filename):
+    """Respond to a request for audio that isn't on disk, requeueing TTS if it was evicted to save space."""
+    if not audio_storage.requeue_evicted(filename):
+        abort(404)
+    if Config.API_POLLING_ENABLED:
+        submit_poll()
+    retry_after = str(Config.POLL_INTERVAL_MINUTES * 60)
+    return Response("This episode's audio is being regenerated", 503, {"Retry-After": retry_after})
+
+
+def start_poll_scheduler():
+    """Start polling hoarder and TTS every POLL_INTERVAL_MINUTES, and the TTS and audio cleanups, in the background.
+
+    Returns:
+        BackgroundScheduler: The running scheduler
+    """
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    sched = BackgroundScheduler(daemon=True)
+    sched.add_job(submit_poll, "interval", minutes=Config.POLL_INTERVAL_MINUTES)
+    if Config.TTS_RECONCILE_MODE != "full" and Config.TTS_CLEANUP_INTERVAL_MINUTES:
+        sched.add_job(submit_tts_cleanup, "interval", minutes=Config.TTS_CLEANUP_INTERVAL_MINUTES)
+    if Config.AUDIO_STORAGE_INTERVAL_MINUTES:
+        sched.add_job(submit_audio_storage, "interval", minutes=Config.AUDIO_STORAGE_INTERVAL_MINUTES)
+    sched.start()
+    return sched
+
+
+def create_app(start_scheduler: bool | None = None) -> Flask:
+    """Create the web app.
+
+    The scheduler only starts in the one process holding the scheduler lock, the web workers of other processes take
+    over if it exits.
+
+    Args:
+        start_scheduler: Whether to poll in the background, defaults to API_POLLING_ENABLED
+
+    Returns:
+        Flask: The app
+    """
+    init_db()
+    register_metrics()
+    instrument_requests()
+
+    app = Flask(__name__)
+    # Registered before the Api so "/" is the episodes page rather than the Api's root
+    app.register_blueprint(web)
+
+    api = Api(
+        app, version="1.0", title="Hoarder Episodes API", description="API for accessing Hoarder episodes", doc="/docs"
+    )
+    for namespace in (ns, jobs_ns, tts_ns):
+        api.add_namespace(namespace)
+
+    if start_scheduler is None:
+        start_scheduler = Config.API_POLLING_ENABLED
+    if start_scheduler:
+        app.extensions["hoarderpod_scheduler"] = Leader(
+            os.path.join(Config.LOCK_PATH, "scheduler.lock"), start_poll_scheduler, Config.SCHEDULER_LOCK_RETRY_SECONDS
+        ).run()
+
+    return app
 
 
 if __name__ == "__main__":
     env = Config.FLASK_ENV
     port = Config.PORT
     if env and env.lower().startswith("dev"):
-        app.run(debug=True, host="0.0.0.0", port=port)
+        create_app().run(debug=True, host="0.0.0.0", port=port)
     else:
-        import waitress
+        from hoarderpod.serve import serve
 
-        waitress.serve(app, host="0.0.0.0", port=port)
+        serve(port=port)
@@ -20,7 +20,9 @@ import random
 import re
 import requests
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from urllib.parse import urlparse, urlunparse
 
@@ -33,20 +35,202 @@ USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/121.0",
 ]
 
+# Seconds to wait on archive.ph before giving up on a request
+REQUEST_TIMEOUT = 30
+
+# Mirrors of archive.ph, all serving the same archive
+DEFAULT_MIRRORS = ("https://archive.ph", "https://archive.today", "https://archive.is", "https://archive.md")
+
+# Weight of the newest request in a mirror's rolling latency
+LATENCY_SMOOTHING = 0.3
+# A mirror that errors or rate limits is benched for this long, doubling with every error in a row up to the maximum
+BENCH_SECONDS = 30
+BENCH_MAX_SECONDS = 600
+
 def get_random_user_agent():
     """Get a random user agent from the list."""
     return random.choice(USER_AGENTS)
 
-def snapshot(url, domain="https://archive.ph", user_agent=None, renew=False, complete=True):
+def normalize_mirror(mirror):
+    """Turn archive.is or https://archive.is/ into https://archive.is."""
+    mirror = mirror.strip().rstrip("/")
+    return mirror if "://" in mirror else f"https://{mirror}"
+
+class MirrorPool:
+    """
+    Picks the archive.ph mirror each request goes to.
+
+    Keeps a rolling latency and a count of errors in a row for every mirror. Errors, 5xx and 429 responses bench a
+    mirror for a while. Requests go to the fastest healthy mirror and fall back down the list when it fails. While
+    no mirror has proven itself, at first and after the fastest one failed, GET requests are raced across the best
+    two mirrors and the first good response wins.
+    """
+
+    def __init__(self, mirrors=None):
+        self.mirrors = [normalize_mirror(mirror) for mirror in (mirrors or DEFAULT_MIRRORS)]
+        self._lock = threading.Lock()
+        self._stats = {
+            mirror: {"latency": None, "errors": 0, "benched_until": 0.0, "last_error": None} for mirror in self.mirrors
+        }
+        self._proven = None
+
+    def ranked(self):
+        """
+        Get the mirrors in the order to try them.
+
+        Returns:
+            list: Healthy mirrors fastest first, then ones not tried yet, then benched ones
+        """
+        now = time.monotonic()
+        with self._lock:
+            def key(item):
+                index, mirror = item
+                stats = self._stats[mirror]
+                if stats["benched_until"] > now:
+                    return (2, stats["benched_until"], index)
+                if stats["latency"] is None:
+                    return (1, 0, index)
+                return (0, stats["latency"], index)
+
+            return [mirror for _, mirror in sorted(enumerate(self.mirrors), key=key)]
+
+    def record(self, mirror, latency=None, error=None):
+        """
+        Record how a request to a mirror went.
+
+        Args:
+            mirror: The mirror
+            latency: Seconds the request took, when it succeeded
+            error: What went wrong, when it failed
+        """
+        with self._lock:
+            stats = self._stats[mirror]
+            if error is None:
+                if stats["latency"] is None:
+                    stats["latency"] = latency
+                else:
+                    stats["latency"] += LATENCY_SMOOTHING * (latency - stats["latency"])
+                stats["errors"] = 0
+                stats["benched_until"] = 0.0
+                return
+
+            stats["errors"] += 1
+            stats["last_error"] = str(error)
+            stats["benched_until"] = time.monotonic() + min(BENCH_MAX_SECONDS, BENCH_SECONDS * 2 ** (stats["errors"] - 1))
+            if self._proven == mirror:
+                self._proven = None
+
+    def _attempt(self, mirror, method, path, kwargs):
+        session = requests.Session()
+        start = time.monotonic()
+        try:
+            response = session.request(method, mirror + path, timeout=REQUEST_TIMEOUT, **kwargs)
+            if response.status_code == 429 or response.status_code >= 500:
+                raise requests.HTTPError(f"{response.status_code} from {mirror}", response=response)
+        except requests.RequestException as e:
+            session.close()
+            self.record(mirror, error=e)
+            raise
+        self.record(mirror, latency=time.monotonic() - start)
+        return mirror, session, response
+
+    def _race(self, mirrors, method, path, kwargs):
+        executor = ThreadPoolExecutor(max_workers=len(mirrors), thread_name_prefix="archive-mirror")
+        futures = [executor.submit(self._attempt, mirror, method, path, kwargs) for mirror in mirrors]
+        executor.shutdown(wait=False)
+
+        won = None
+        error = None
+        for future in as_completed(futures):
+            if future.exception() is None:
+                won = future
+                break
+            error = future.exception()
+
+        for future in futures:
+            # The slower mirror still finishes in the background, for its latency, then its session is closed
+            if future is not won:
+                future.add_done_callback(lambda f: f.exception() is None and f.result()[1].close())
+        if won is None:
+            raise error
+        return won.result()
+
+    def request(self, method, path="", **kwargs):
+        """
+        Send a request to the best mirror, racing or falling back to others as needed.
+
+        Args:
+            method: The HTTP method
+            path: The path on the mirror, e.g. /search/?q=...
+            **kwargs: Passed on to requests
+
+        Returns:
+            tuple: The mirror that answered, the session it answered on and its response
+        """
+        ranked = self.ranked()
+        error = None
+        with self._lock:
+            race = self._proven is None and method.upper() == "GET" and len(ranked) > 1
+        if race:
+            try:
+                result = self._race(ranked[:2], method, path, kwargs)
+                with self._lock:
+                    self._proven = result[0]
+                return result
+            except requests.RequestException as e:
+                error = e
+            ranked = ranked[2:]
+
+        for mirror in ranked:
+            try:
+                result = self._attempt(mirror, method, path, kwargs)
+                with self._lock:
+                    self._proven = self._proven or mirror
+                return result
+            except requests.RequestException as e:
+                print(f"archive mirror {mirror} failed: {e}", file=sys.stderr)
+                error = e
+        raise error or requests.ConnectionError("No archive.ph mirrors configured")
+
+    def reset(self):
+        """Forget every mirror's stats."""
+        with self._lock:
+            for stats in self._stats.values():
+                stats.update(latency=None, errors=0, benched_until=0.0, last_error=None)
+            self._proven = None
+
+    def to_dict(self):
+        """
+        Get each mirror's stats for the API.
+
+        Returns:
+            dict: Mirror to its rolling latency, errors in a row, last error and whether it's benched
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                mirror: {
+                    "latency_seconds": stats["latency"],
+                    "errors": stats["errors"],
+                    "last_error": stats["last_error"],
+                    "benched": stats["benched_until"] > now,
+                }
+                for mirror, stats in self._stats.items()
+            }
+
+mirror_pool = MirrorPool()
+
+def snapshot(url, domain=None, user_agent=None, renew=False, complete=True, pool=None):
     """
     Submit a URL to archive.ph and get the archive URL.
 
     Args:
         url: The URL to archive
-        domain: The archive.ph domain mirror to use
+        domain: The archive.ph domain mirror to use (picked from the pool if None)
         user_agent: User agent to use (random if None)
         renew: Whether to request a fresh snapshot even if recently archived
         complete: Whether to wait for archiving to complete
+        pool: MirrorPool to pick the mirror from (the module's mirror_pool if None)
 
     Returns:
         dict: Contains the archive URL, WIP URL (if applicable), and cache date (if applicable)
@@ -59,9 +243,12 @@ def snapshot(url, domain="https://archive.ph", user_agent=None, renew=False, com
         "Content-Type": "application/x-www-form-urlencoded",
     }
 
-    # Step 1: Initial request to get the submission token
-    session = requests.Session()
-    r = session.get(domain, headers=headers)
+    # Step 1: Initial request to get the submission token, the rest of the steps use the same mirror and session
+    if domain:
+        session = requests.Session()
+        r = session.get(domain, headers=headers, timeout=REQUEST_TIMEOUT)
+    else:
+        domain, session, r = (pool or mirror_pool).request("GET", headers=headers)
     r.raise_for_status()
 
     # Extract the submission token
@@ -80,7 +267,7 @@ def snapshot(url, domain="https://archive.ph", user_agent=None, renew=False, com
     if renew:
         data["anyway"] = 1
 
-    r = session.post(domain + "/submit/", data=data, headers=headers, allow_redirects=False)
+    r = session.post(domain + "/submit/", data=data, headers=headers, allow_redirects=False, timeout=REQUEST_TIMEOUT)
 
     result = {}
 
@@ -93,7 +280,7 @@ def snapshot(url, domain="https://archive.ph", user_agent=None, renew=False, com
         result["url"] = archive_url
 
         # Get the cache date
-        r = session.get(archive_url, headers=headers)
+        r = session.get(archive_url, headers=headers, timeout=REQUEST_TIMEOUT)
         r.raise_for_status()
 
         date_match = re.search(r'Saved from.+?(\d{1,2} [a-zA-Z]+ \d{4} \d{2}:\d{2}:\d{2})', r.text)
@@ -129,7 +316,7 @@ def snapshot(url, domain="https://archive.ph", user_agent=None, renew=False, com
     retry_count = 0
 
     while retry_count < max_retries:
-        r = session.get(wip_url, headers=headers)
+        r = session.get(wip_url, headers=headers, timeout=REQUEST_TIMEOUT)
         r.raise_for_status()
 
         # Check if archiving is complete
@@ -158,23 +345,27 @@ def snapshot(url, domain="https://archive.ph", user_agent=None, renew=False, com
     result["url"] = archive_url
     return result
 
-def _search(url, domain, headers):
+def _search(url, domain, headers, pool=None):
     # URL encode for the query parameter
-    search_url = f"{domain}/search/?q={url}"
-    r = requests.get(search_url, headers=headers)
+    if domain:
+        r = requests.get(f"{domain}/search/?q={url}", headers=headers, timeout=REQUEST_TIMEOUT)
+    else:
+        _, session, r = (pool or mirror_pool).request("GET", f"/search/?q={url}", headers=headers)
+        session.close()
     r.raise_for_status()
 
     pattern = r'<div[^>]*>((?:\d{1,2}\s+[A-Za-z]{3}\s+\d{4}\s+\d{1,2}:\d{2})|(?:\d{1,2}/\d{1,2}/\d{4}\s+\d{1,2}:\d{2}))</div></a></div></div><div[^>]*><a[^>]*href="([^"]+)"'
     return re.findall(pattern, r.text, re.DOTALL)
 
-def timemap(url, domain="https://archive.ph", user_agent=None):
+def timemap(url, domain=None, user_agent=None, pool=None):
     """
     Get a list of previous snapshots for a URL.
 
     Args:
         url: The URL to get snapshots for
-        domain: The archive.ph domain mirror to use
+        domain: The archive.ph domain mirror to use (picked from the pool if None)
         user_agent: User agent to use (random if None)
+        pool: MirrorPool to pick the mirror from (the module's mirror_pool if None)
 
     Returns:
         list: List of dicts containing snapshot date and URL
@@ -186,7 +377,7 @@ def timemap(url, domain="https://archive.ph", user_agent=None):
         "User-Agent": user_agent,
     }
 
-    matches = _search(url, domain, headers)
+    matches = _search(url, domain, headers, pool)
     print(matches)
     if not matches:
         parsed_url = urlparse(url)
@@ -198,7 +389,7 @@ def timemap(url, domain="https://archive.ph", user_agent=None):
             None,  # No query parameters
             parsed_url.fragment
         ))
-        matches = _search(no_qp_url, domain, headers)
+        matches = _search(no_qp_url, domain, headers, pool)
 
     print(f"Found {len(matches)} snapshots for {url}", file=sys.stderr)
 
@@ -214,19 +405,20 @@ def timemap(url, domain="https://archive.ph", user_agent=None):
 
     return results
 
-def get_latest_snapshot(url, domain="https://archive.ph", user_agent=None):
+def get_latest_snapshot(url, domain=None, user_agent=None, pool=None):
     """
     Get a latest snapshot URL for a given URL.
 
     Args:
         url: The URL to get snapshots for
-        domain: The archive.ph domain mirror to use
+        domain: The archive.ph domain mirror to use (picked from the pool if None)
         user_agent: User agent to use (random if None)
+        pool: MirrorPool to pick the mirror from (the module's mirror_pool if None)
 
     Returns:
         str: The latest snapshot URL or None if not found
     """
-    results = timemap(url, domain=domain, user_agent=user_agent)
+    results = timemap(url, domain=domain, user_agent=user_agent, pool=pool)
 
     if not results:
         return None
@@ -239,8 +431,8 @@ def main():
     parser.add_argument("command", nargs="?", default="snapshot",
                       help="Command to run: 'snapshot' (default) or 'timemap'")
     parser.add_argument("url", nargs="?", help="The URL to archive or get snapshots for")
-    parser.add_argument("-d", "--domain", default="https://archive.ph",
-                      help="Domain mirror to use (default: https://archive.ph)")
+    parser.add_argument("-d", "--domain", default=None,
+                      help="Domain mirror to use (default: the fastest of archive.ph, .today, .is and .md)")
     parser.add_argument("-q", "--quiet", action="store_true",
                       help="Only output the archive URL")
     parser.add_argument("-r", "--renew", action="store_true",
@@ -1,4 +1,5 @@
 import re
+import time
 import unicodedata
 
 import ftfy
@@ -8,6 +9,11 @@ from markdownify import MarkdownConverter
 
 from hoarderpod.utils import horder_dt_to_py
 from hoarderpod.config import Config
+from hoarderpod.origin_fetcher import origin_fetcher
+from hoarderpod.profiling import log_slow_parse
+
+# Bump when a change here changes the text extracted from the same page, so reextract updates older episodes
+EXTRACTOR_VERSION = 1
 
 markdownify_options = {
     "strip": ["script", "style", "meta", "a", "img", "strong", "template", "svg", "noscript"],  # Remove unwanted elements
@@ -77,19 +83,19 @@ def parse_with_newspaper(url: str, html: str | None = None) -> dict:
 
     Args:
         url: The URL to parse
-        html: Optional HTML content to parse instead of downloading from URL
+        html: Optional HTML content to parse instead of downloading from URL with the origin fetcher
 
     Returns:
         dict: Dictionary containing parsed authors, title, text and description
     """
     try:
         article = newspaper.Article(url)
-        if html:
-            # If HTML is provided, set it directly and parse
-            article.html = html
-            article.is_downloaded = True
-        else:
-            article.download()
+        if not html:
+            html = origin_fetcher.fetch(url)
+            if not html:
+                raise ValueError("the page couldn't be downloaded")
+        article.html = html
+        article.is_downloaded = True
         article.parse()
         return {
             "authors": article.authors,
@@ -214,20 +220,25 @@ def fetch_asset_content(asset_id: str) -> str | None:
         return None
 
 
-def get_episode_dict(bookmark: dict) -> dict:
+def get_episode_dict(bookmark: dict, html_path: str | None = None) -> dict:
     """Get the episode dict including text, title, description, and authors of a bookmark.
 
     Args:
         bookmark: The bookmark dict from Hoarder
+        html_path: Optional path of the bookmark's asset, already downloaded by the AssetPrefetcher
 
     Returns:
         dict: The episode dict including text, title, description, and authors of the bookmark
     """
+    start = time.perf_counter()
     content = bookmark["content"]
     url = content["url"]
 
     # Get HTML content - either from inline htmlContent or from asset
     html_content = content.get("htmlContent")
+    if not html_content and html_path:
+        with open(html_path, encoding="utf-8", errors="replace") as f:
+            html_content = f.read()
     if not html_content:
         # For SingleFile articles, content is stored as an asset
         # Try precrawledArchiveAssetId first (full page), then contentAssetId
@@ -246,9 +257,20 @@ def get_episode_dict(bookmark: dict) -> dict:
 
     if newspaper_data["text"] is None or len(html2text_text.split()) > len(newspaper_data["text"].split()):
         text = html2text_text
+        extractor = "html2text"
     else:
         # Clean newspaper text for TTS (handles curly quotes, Unicode spaces, etc.)
         text = clean_text_for_tts(newspaper_data["text"])
+        extractor = "newspaper"
+
+    log_slow_parse(
+        bookmark["id"],
+        url,
+        len(html_content.encode()) if html_content else 0,
+        extractor,
+        time.perf_counter() - start,
+        len(text) if text else 0,
+    )
 
     if newspaper_data["title"] is None or len(content["title"]) > len(newspaper_data["title"]):
         title = content["title"]
@@ -0,0 +1,183 @@
+"""
+Prefetching of Hoarder assets ahead of parsing
+
+SingleFile bookmarks have no inline htmlContent, their page is a Hoarder asset that can be several MB. Instead of each
+one being downloaded right before it's parsed, the prefetcher streams them ASSET_PREFETCH_CONCURRENCY at a time to a
+spool directory while earlier bookmarks are parsed, and the parser reads the file when it gets there. New downloads
+wait while the spool holds more than ASSET_PREFETCH_BUDGET_MB, unless the parser is already waiting for them.
+
+Bookmarks with no html at all are handed to the OriginFetcher instead, so their page downloads from the origin site
+ahead of the parser too.
+"""
+
+import os
+import threading
+from collections import deque
+from collections.abc import Generator, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from hoarderpod.config import Config
+from hoarderpod.hoarder_service import HoarderService
+from hoarderpod.metrics import stage_seconds
+from hoarderpod.origin_fetcher import OriginFetcher
+
+
+def bookmark_asset_id(bookmark: dict) -> str | None:
+    """Get the asset holding a bookmark's page, for bookmarks without inline html.
+
+    Args:
+        bookmark: The bookmark from hoarder
+
+    Returns:
+        str | None: The precrawledArchiveAssetId (full page) or contentAssetId, None if the html is inline
+    """
+    content = bookmark["content"]
+    if content.get("htmlContent"):
+        return None
+    return content.get("precrawledArchiveAssetId") or content.get("contentAssetId")
+
+
+class AssetPrefetcher:
+    """Downloads bookmark assets to a spool directory ahead of the parser."""
+
+    def __init__(
+        self,
+        spool_path: str | None = None,
+        concurrency: int | None = None,
+        budget_bytes: int | None = None,
+        hoarder_service: HoarderService | None = None,
+        origin_fetcher: OriginFetcher | None = None,
+    ):
+        self.spool_path = spool_path or Config.ASSET_SPOOL_PATH
+        self.concurrency = Config.ASSET_PREFETCH_CONCURRENCY if concurrency is None else concurrency
+        self.budget_bytes = Config.ASSET_PREFETCH_BUDGET_MB * 1024 * 1024 if budget_bytes is None else budget_bytes
+        self.hoarder_service = hoarder_service or HoarderService()
+        self.origin_fetcher = origin_fetcher
+        self._lock = threading.Lock()
+        self._executor = None
+        self._in_flight = 0
+        self._spooled_bytes = 0
+        self._downloads: dict[str, Future] = {}  # bookmark id -> future of the spooled file's path
+        self._sizes: dict[str, int] = {}
+        self._waiting: dict[str, str] = {}  # bookmark id -> asset id, in the order they were asked for
+        self._origin_urls: dict[str, str] = {}  # bookmark id -> url prefetched by the origin fetcher
+
+    def _spool_file(self, bookmark_id: str) -> str:
+        return os.path.join(self.spool_path, f"{bookmark_id}.html")
+
+    def _start(self, bookmark_id: str, asset_id: str) -> None:
+        if self._executor is None:
+            os.makedirs(self.spool_path, exist_ok=True)
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, self.concurrency), thread_name_prefix="asset-prefetch"
+            )
+        self._in_flight += 1
+        self._downloads[bookmark_id] = self._executor.submit(self._download, bookmark_id, asset_id)
+
+    def _start_waiting(self) -> None:
+        while self._waiting and self._in_flight < self.concurrency and self._spooled_bytes < self.budget_bytes:
+            bookmark_id = next(iter(self._waiting))
+            self._start(bookmark_id, self._waiting.pop(bookmark_id))
+
+    def _download(self, bookmark_id: str, asset_id: str) -> str | None:
+        path = self._spool_file(bookmark_id)
+        size = None
+        try:
+            with stage_seconds.time(stage="asset_prefetch"):
+                size = self.hoarder_service.download_asset(asset_id, path)
+            return path
+        except Exception as e:
+            print(f"Error prefetching asset {asset_id} for bookmark {bookmark_id}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                if size is not None:
+                    if bookmark_id in self._downloads:
+                        self._sizes[bookmark_id] = size
+                        self._spooled_bytes += size
+                    else:
+                        # Released while it was downloading
+                        os.remove(path)
+                self._start_waiting()
+
+    def prefetch(self, bookmark: dict) -> None:
+        """Start downloading a bookmark's asset, if it has one, as soon as there's room, or its origin page.
+
+        Args:
+            bookmark: The bookmark from hoarder
+        """
+        content = bookmark["content"]
+        asset_id = bookmark_asset_id(bookmark)
+        if asset_id is None and not content.get("htmlContent") and self.origin_fetcher is not None:
+            with self._lock:
+                self._origin_urls[bookmark["id"]] = content["url"]
+            self.origin_fetcher.prefetch(content["url"])
+            return
+        if asset_id is None or self.concurrency <= 0:
+            return
+        with self._lock:
+            if bookmark["id"] in self._downloads or bookmark["id"] in self._waiting:
+                return
+            self._waiting[bookmark["id"]] = asset_id
+            self._start_waiting()
+
+    def prefetched(self, bookmarks: Iterable[dict]) -> Generator[dict, None, None]:
+        """Yield bookmarks in order, prefetching assets for the next ASSET_PREFETCH_LOOKAHEAD of them.
+
+        Args:
+            bookmarks: The bookmarks to parse
+        """
+        window = deque()
+        for bookmark in bookmarks:
+            self.prefetch(bookmark)
+            window.append(bookmark)
+            if len(window) > Config.ASSET_PREFETCH_LOOKAHEAD:
+                yield window.popleft()
+        while window:
+            yield window.popleft()
+
+    def take(self, bookmark_id: str) -> str | None:
+        """Wait for a bookmark's asset to be spooled.
+
+        Args:
+            bookmark_id: The id of the bookmark
+
+        Returns:
+            str | None: The path of the spooled asset, None if it wasn't prefetched or the download failed
+        """
+        with self._lock:
+            asset_id = self._waiting.pop(bookmark_id, None)
+            if asset_id is None:
+                future = self._downloads.get(bookmark_id)
+            else:
+                # The parser is waiting for it, so it goes ahead of the budget. It's downloaded in this thread, the
+                # pool may be busy with prefetches for later bookmarks
+                future = Future()
+                self._in_flight += 1
+                self._downloads[bookmark_id] = future
+        if asset_id is not None:
+            os.makedirs(self.spool_path, exist_ok=True)
+            future.set_result(self._download(bookmark_id, asset_id))
+        return future.result() if future is not None else None
+
+    def release(self, bookmark_id: str) -> None:
+        """Delete a bookmark's spooled asset once it has been parsed or skipped.
+
+        Args:
+            bookmark_id: The id of the bookmark
+        """
+        with self._lock:
+            origin_url = self._origin_urls.pop(bookmark_id, None)
+            if origin_url is not None:
+                self.origin_fetcher.discard(origin_url)
+            self._waiting.pop(bookmark_id, None)
+            self._downloads.pop(bookmark_id, None)
+            size = self._sizes.pop(bookmark_id, None)
+            if size is not None:
+                self._spooled_bytes -= size
+                try:
+                    os.remove(self._spool_file(bookmark_id))
+                except FileNotFoundError:
+                    pass
+            self._start_waiting()
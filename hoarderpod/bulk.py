@@ -0,0 +1,60 @@
+"""
+Bulk actions on the episodes matching an EpisodeFilter
+
+    delete       delete the episodes and their audio
+    regenerate   delete the audio and send the episodes back to TTS
+    purge_audio  delete the audio but keep the episodes, their audio is regenerated if it's requested again
+
+Each action is one set-based statement over the matching episodes, then one pass over the audio directory to delete
+the files it freed. A dry run only lists the episodes the action would apply to.
+"""
+
+from hoarderpod.episodes import EpisodeFilter, EpisodeOps
+from hoarderpod.storage import AudioStorage
+
+BULK_ACTIONS = ("delete", "regenerate", "purge_audio")
+
+
+def run_bulk(
+    action: str,
+    episode_filter: EpisodeFilter,
+    dry_run: bool = False,
+    episode_ops: EpisodeOps | None = None,
+    audio_storage: AudioStorage | None = None,
+) -> dict:
+    """Apply a bulk action to the episodes a filter matches.
+
+    Args:
+        action: One of BULK_ACTIONS
+        episode_filter: The filter, it needs at least one criterion
+        dry_run: Whether to only list the episodes the action would apply to
+        episode_ops: Optional EpisodeOps to use
+        audio_storage: Optional AudioStorage to delete audio with
+
+    Returns:
+        dict: The action, whether it was a dry run, and the number and ids of the episodes it applied to
+
+    Raises:
+        ValueError: If the action is unknown or the filter is empty
+    """
+    if action not in BULK_ACTIONS:
+        raise ValueError(f"Unknown action {action}, expected one of {', '.join(BULK_ACTIONS)}")
+    if episode_filter.is_empty():
+        raise ValueError("Give at least one filter, bulk actions don't apply to every episode")
+    episode_ops = episode_ops or EpisodeOps()
+    audio_storage = audio_storage or AudioStorage()
+
+    if dry_run:
+        episode_ids = episode_ops.get_matching_ids(episode_filter, with_audio=action == "purge_audio")
+    elif action == "purge_audio":
+        episode_ids = audio_storage.purge_audio(episode_filter)
+    else:
+        if action == "delete":
+            matched = episode_ops.delete_matching(episode_filter)
+        else:
+            matched = episode_ops.clear_tts_matching(episode_filter)
+        audio_storage.delete_audio_files(mp3 for _, mp3 in matched)
+        episode_ids = [episode_id for episode_id, _ in matched]
+
+    print(f"{action}{' (dry run)' if dry_run else ''}: {len(episode_ids)} episodes")
+    return {"action": action, "dry_run": dry_run, "count": len(episode_ids), "ids": episode_ids}
@@ -0,0 +1,181 @@
+"""
+Circuit breakers for the external services, Hoarder, TTS and archive.ph
+
+A breaker counts consecutive outages, connection errors, timeouts, 5xx and 429 responses, of calls made through it.
+After CIRCUIT_FAILURE_THRESHOLD of them it opens and calls fail straight away with CircuitOpenError instead of waiting
+on a service that's down or rate limiting us. After CIRCUIT_RESET_SECONDS it half-opens and lets a single call through as a probe: if that
+succeeds the breaker closes, otherwise it opens for another CIRCUIT_RESET_SECONDS. An outage costs one probe per
+interval instead of a hung request for every call.
+
+Errors that say nothing about the service's health, like a 404 or a parsing bug, pass through without counting.
+"""
+
+import threading
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+
+import requests
+
+from hoarderpod.config import Config
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Gauge value for each state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose breaker is open."""
+
+
+def is_outage(error: Exception) -> bool:
+    """Check if an error means the service is unavailable, rather than the request being wrong.
+
+    Args:
+        error: The error a call raised
+
+    Returns:
+        bool: True for connection errors, timeouts, 5xx responses and 429 Too Many Requests
+    """
+    if isinstance(error, requests.HTTPError):
+        return error.response is None or error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, requests.RequestException)
+
+
+class CircuitBreaker:
+    """Stops calling a service after repeated outages and probes it until it's back."""
+
+    def __init__(self, name: str, failure_threshold: int | None = None, reset_seconds: float | None = None):
+        self.name = name
+        self.failure_threshold = Config.CIRCUIT_FAILURE_THRESHOLD if failure_threshold is None else failure_threshold
+        self.reset_seconds = Config.CIRCUIT_RESET_SECONDS if reset_seconds is None else reset_seconds
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.last_error = None
+
+    @property
+    def state(self) -> str:
+        """The breaker's state, open turns half-open once the cool-down is over."""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._state = HALF_OPEN
+        return self._state
+
+    def available(self) -> bool:
+        """Check if a call would be let through, without taking the half-open probe.
+
+        Returns:
+            bool: False while the breaker is open or a probe is already in flight
+        """
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (state == HALF_OPEN and not self._probing)
+
+    def _before_call(self) -> None:
+        with self._lock:
+            state = self._current_state()
+            if state == OPEN or (state == HALF_OPEN and self._probing):
+                raise CircuitOpenError(f"{self.name} is unavailable: {self.last_error}")
+            if state == HALF_OPEN:
+                self._probing = True
+
+    def record_success(self) -> None:
+        """Close the breaker after a call succeeded."""
+        with self._lock:
+            if self._state != CLOSED:
+                print(f"{self.name} is available again")
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self, error: Exception | str) -> None:
+        """Count an outage, opening the breaker at the threshold or when a probe failed.
+
+        Args:
+            error: What went wrong
+        """
+        with self._lock:
+            self.last_error = str(error)
+            self._failures += 1
+            self._probing = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    print(f"{self.name} is unavailable after {self._failures} failures, last: {error}")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    @contextmanager
+    def guard(self, counts: Callable[[Exception], bool] = is_outage):
+        """Run the body of a with block as a call to the service.
+
+        Args:
+            counts: Decides which errors count as outages
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+        """
+        self._before_call()
+        try:
+            yield
+        except Exception as e:
+            if counts(e):
+                self.record_failure(e)
+            else:
+                # The service answered, so it's up
+                self.record_success()
+            raise
+        self.record_success()
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Call a function through the breaker.
+
+        Args:
+            func: The function calling the service
+            *args: Its positional arguments
+            **kwargs: Its keyword arguments
+
+        Returns:
+            Whatever func returns
+        """
+        with self.guard():
+            return func(*args, **kwargs)
+
+    def reset(self) -> None:
+        """Close the breaker and forget its failures."""
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+            self.last_error = None
+
+    def to_dict(self) -> dict:
+        """Get the breaker's state for the API.
+
+        Returns:
+            dict: name, state, consecutive failures, last error and seconds until the next probe when open
+        """
+        with self._lock:
+            state = self._current_state()
+            retry_in = self.reset_seconds - (time.monotonic() - self._opened_at) if state == OPEN else None
+            return {
+                "name": self.name,
+                "state": state,
+                "failures": self._failures,
+                "last_error": self.last_error,
+                "retry_in_seconds": retry_in,
+            }
+
+
+hoarder_breaker = CircuitBreaker("hoarder")
+tts_breaker = CircuitBreaker("tts")
+archive_ph_breaker = CircuitBreaker("archive_ph")
+breakers = {breaker.name: breaker for breaker in (hoarder_breaker, tts_breaker, archive_ph_breaker)}
@@ -0,0 +1,143 @@
+"""
+The hoarderpod command
+
+    hoarderpod delete --domain example.com --until 2025-01-01 --dry-run
+    hoarderpod regenerate --status failed
+    hoarderpod purge-audio --author "Jane Doe"
+    hoarderpod poll
+    hoarderpod reextract
+    hoarderpod analytics --window 24h
+    hoarderpod serve --workers 4
+
+delete, regenerate and purge-audio apply to every episode matching all of the filters given, see bulk.
+"""
+
+import argparse
+import json
+import sys
+
+from hoarderpod.episodes import EPISODE_STATUSES
+
+
+def add_filter_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the episode filter and dry run options to a bulk command.
+
+    Args:
+        parser: The command's parser
+    """
+    parser.add_argument("--id", dest="ids", action="append", help="Episode id, can be given more than once")
+    parser.add_argument("--since", help="Episodes created at or after this date, ISO 8601, UTC if no timezone")
+    parser.add_argument("--until", help="Episodes created before this date")
+    parser.add_argument("--domain", help="Domain of the article url, subdomains included")
+    parser.add_argument("--author", help="Part of an author's name, case insensitive")
+    parser.add_argument("--status", choices=EPISODE_STATUSES, help="TTS status")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="Only list the episodes that would be affected")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+
+
+def run_bulk_command(args: argparse.Namespace) -> int:
+    """Run delete, regenerate or purge-audio.
+
+    Args:
+        args: The parsed arguments
+
+    Returns:
+        int: The exit status
+    """
+    from hoarderpod.bulk import run_bulk
+    from hoarderpod.episodes import EpisodeFilter, init_db
+
+    init_db()
+    try:
+        episode_filter = EpisodeFilter(
+            ids=args.ids,
+            since=args.since,
+            until=args.until,
+            domain=args.domain,
+            author=args.author,
+            status=args.status,
+        )
+        result = run_bulk(args.command.replace("-", "_"), episode_filter, dry_run=args.dry_run)
+    except ValueError as e:
+        print(f"hoarderpod {args.command}: {e}", file=sys.stderr)
+        return 2
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    elif result["ids"]:
+        print("\n".join(result["ids"]))
+    if args.command == "regenerate" and result["count"] and not args.dry_run:
+        print("The episodes are submitted to TTS on the next poll")
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the hoarderpod command.
+
+    Args:
+        argv: Optional arguments, defaults to the command line
+
+    Returns:
+        int: The exit status
+    """
+    parser = argparse.ArgumentParser(prog="hoarderpod", description="Manage the Hoarder podcast")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for command, help in (
+        ("delete", "Delete episodes and their audio"),
+        ("regenerate", "Delete episodes' audio and send them back to TTS"),
+        ("purge-audio", "Delete episodes' audio, it's regenerated if it's requested again"),
+    ):
+        add_filter_arguments(commands.add_parser(command, help=help, description=help))
+
+    poll = commands.add_parser("poll", help="Poll hoarder and TTS once")
+    poll.add_argument("-w", "--worker", action="store_true", help="Run every stage continuously until stopped")
+
+    reextract = commands.add_parser("reextract", help="Extract episodes from older extractor versions again")
+    reextract.add_argument("-w", "--workers", type=int, help="Parsing processes, 0 parses in the main process")
+    reextract.add_argument("--restart", action="store_true", help="Ignore the checkpoint and retry earlier failures")
+
+    analytics = commands.add_parser("analytics", help="Report episode throughput and latency")
+    analytics.add_argument("-w", "--window", action="append", help="Window to report on, e.g. 90m, 24h or 7d")
+
+    serve = commands.add_parser("serve", help="Serve the web app")
+    serve.add_argument("-w", "--workers", type=int, help="Web worker processes, defaults to WEB_WORKERS")
+    serve.add_argument("-p", "--port", type=int, help="Port to listen on, defaults to PORT")
+
+    args = parser.parse_args(argv)
+    if args.command in ("delete", "regenerate", "purge-audio"):
+        return run_bulk_command(args)
+
+    from hoarderpod.config import Config
+    from hoarderpod.episodes import init_db
+
+    if args.command == "poll" and args.worker:
+        from hoarderpod.pipeline import run_worker
+
+        run_worker()
+        return 0
+    if args.command == "serve":
+        from hoarderpod.serve import serve as run_serve
+
+        run_serve(workers=args.workers, port=args.port)
+        return 0
+
+    init_db()
+    if args.command == "poll":
+        from hoarderpod.run import poll_hoarder_and_tts
+
+        poll_hoarder_and_tts()
+    elif args.command == "reextract":
+        from hoarderpod.reextract import reextract as run_reextract
+
+        run_reextract(workers=args.workers, restart=args.restart)
+    elif args.command == "analytics":
+        from hoarderpod.analytics import analytics_report, format_report
+
+        reports = [analytics_report(window) for window in args.window or Config.ANALYTICS_WINDOWS]
+        print("\n\n".join(format_report(report) for report in reports))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
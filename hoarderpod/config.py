@@ -15,8 +15,16 @@ class Config:
     TTS_VOICE = os.getenv("TTS_VOICE", "af_heart")
     MP3_STORAGE_PATH = os.path.join(os.path.dirname(__file__), os.getenv("MP3_STORAGE_PATH", "../audio"))
     POLL_INTERVAL_MINUTES = int(os.getenv("POLL_INTERVAL_MINUTES", "10"))
+    # Turn off when polling is done by a standalone worker (python hoarderpod/run.py --worker)
+    API_POLLING_ENABLED = os.getenv("API_POLLING_ENABLED", "true").lower() == "true"
     FLASK_ENV = os.getenv("FLASK_ENV")
     PORT = int(os.getenv("PORT", 5002))
+    # Web server processes, see serve. Only one of them runs the poll scheduler
+    WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+    # Lock files that keep background jobs and the scheduler to one process at a time, and the background job records
+    LOCK_PATH = os.path.join(os.path.dirname(__file__), os.getenv("LOCK_PATH", "../cache/locks"))
+    # How often a web worker without the scheduler checks whether the one running it has exited
+    SCHEDULER_LOCK_RETRY_SECONDS = float(os.getenv("SCHEDULER_LOCK_RETRY_SECONDS", "30"))
 
     HOARDER_API_KEY = os.getenv("HOARDER_API_KEY")
     HOARDER_ROOT_URL = os.getenv("HOARDER_ROOT_URL", "http://localhost:3000")
@@ -24,8 +32,40 @@ class Config:
 
     if HOARDER_ROOT_URL.endswith("/"):
         HOARDER_ROOT_URL = HOARDER_ROOT_URL[:-1]
+    # "light" lists bookmarks without their content and fetches only new ones in full, "full" pages full bookmarks
+    HOARDER_SYNC_MODE = os.getenv("HOARDER_SYNC_MODE", "light").lower()
+    # New bookmarks fetched at a time in light mode
+    HOARDER_FETCH_CONCURRENCY = int(os.getenv("HOARDER_FETCH_CONCURRENCY", "4"))
+    # SingleFile assets downloaded at a time ahead of parsing, 0 fetches them inline while parsing instead
+    ASSET_PREFETCH_CONCURRENCY = int(os.getenv("ASSET_PREFETCH_CONCURRENCY", "4"))
+    # No new asset downloads start while the spool holds more than this
+    ASSET_PREFETCH_BUDGET_MB = int(os.getenv("ASSET_PREFETCH_BUDGET_MB", "64"))
+    # How many bookmarks ahead of the parser a poll looks for assets to prefetch
+    ASSET_PREFETCH_LOOKAHEAD = int(os.getenv("ASSET_PREFETCH_LOOKAHEAD", "16"))
+    ASSET_SPOOL_PATH = os.path.join(os.path.dirname(__file__), os.getenv("ASSET_SPOOL_PATH", "../spool"))
+    # Downloads of articles Hoarder has no html for, from the article's own site
+    ORIGIN_FETCH_CONCURRENCY = int(os.getenv("ORIGIN_FETCH_CONCURRENCY", "8"))
+    ORIGIN_MAX_PER_HOST = int(os.getenv("ORIGIN_MAX_PER_HOST", "2"))
+    ORIGIN_MIN_INTERVAL_SECONDS = float(os.getenv("ORIGIN_MIN_INTERVAL_SECONDS", "1"))
+    # Hard limits for a single page, including the time to read the whole body
+    ORIGIN_TIMEOUT_SECONDS = float(os.getenv("ORIGIN_TIMEOUT_SECONDS", "30"))
+    ORIGIN_MAX_MB = int(os.getenv("ORIGIN_MAX_MB", "10"))
+    ORIGIN_USER_AGENT = os.getenv(
+        "ORIGIN_USER_AGENT",
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    )
+    # Fetched pages are cached with their ETag/Last-Modified so fetching them again is a conditional request
+    ORIGIN_CACHE_PATH = os.path.join(os.path.dirname(__file__), os.getenv("ORIGIN_CACHE_PATH", "../cache/origin"))
+    ORIGIN_CACHE_MAX_MB = int(os.getenv("ORIGIN_CACHE_MAX_MB", "256"))
 
     DATABASE_URI = os.getenv("DATABASE_URI", "sqlite:///hoarder_episodes.db")
+    # SQLite connection settings, WAL lets the web process read while the poll writes
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "5"))
+    # Searches matching more episodes than this are listed newest first instead of by relevance, to stay fast
+    SEARCH_RANK_MAX_MATCHES = int(os.getenv("SEARCH_RANK_MAX_MATCHES", "5000"))
 
     EPISODES_CUTOFF_DATE = os.getenv("EPISODES_CUTOFF_DATE")
     EPISODES_PULL_MAX = os.getenv("EPISODES_PULL_MAX")
@@ -36,10 +76,84 @@ class Config:
     if EPISODES_PULL_MAX:
         EPISODES_PULL_MAX = int(EPISODES_PULL_MAX)
 
-    TTS_BATCH_SIZE = int(os.getenv("TTS_BATCH_SIZE", "10"))
+    # Target number of jobs queued on the TTS backend, topped up every poll (TTS_BATCH_SIZE is the legacy name)
+    TTS_MAX_IN_FLIGHT = int(os.getenv("TTS_MAX_IN_FLIGHT", os.getenv("TTS_BATCH_SIZE", "10")))
+    # Order waiting episodes are submitted in, one of fifo, newest, sjf (shortest first) or weighted, see tts_queue.py
+    TTS_QUEUE_POLICY = os.getenv("TTS_QUEUE_POLICY", "fifo").lower()
+    # For the weighted policy, seconds of estimated synthesis time taken off an episode's place for each second waited
+    TTS_QUEUE_AGING = float(os.getenv("TTS_QUEUE_AGING", "0.1"))
+    # Synthesis speed assumed until one is learned from completed jobs
+    TTS_SECONDS_PER_CHAR = float(os.getenv("TTS_SECONDS_PER_CHAR", "0.01"))
+    # Failed extractions and TTS jobs are retried after FAILURE_BACKOFF_SECONDS, doubling every attempt up to
+    # FAILURE_BACKOFF_MAX_SECONDS, and dead-lettered after FAILURE_MAX_ATTEMPTS
+    FAILURE_MAX_ATTEMPTS = int(os.getenv("FAILURE_MAX_ATTEMPTS", "5"))
+    FAILURE_BACKOFF_SECONDS = float(os.getenv("FAILURE_BACKOFF_SECONDS", "300"))
+    FAILURE_BACKOFF_MAX_SECONDS = float(os.getenv("FAILURE_BACKOFF_MAX_SECONDS", "86400"))
+    # Timeout for requests to Hoarder, TTS and archive.ph
+    HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+    # A service is skipped for CIRCUIT_RESET_SECONDS after CIRCUIT_FAILURE_THRESHOLD outages in a row, see
+    # circuit_breaker.py
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "60"))
+    # TTS health checks time out sooner than other requests and their result is reused for HEALTH_CACHE_SECONDS
+    HEALTH_TIMEOUT_SECONDS = float(os.getenv("HEALTH_TIMEOUT_SECONDS", "5"))
+    HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "30"))
+    # Shared secret for POST /tts/callback/<job_id>, callbacks are disabled when unset
+    TTS_CALLBACK_TOKEN = os.getenv("TTS_CALLBACK_TOKEN")
+    # "targeted" asks TTS about our outstanding jobs only, "full" lists every job on the TTS service each poll
+    TTS_RECONCILE_MODE = os.getenv("TTS_RECONCILE_MODE", "targeted").lower()
+    TTS_STATUS_BATCH_SIZE = int(os.getenv("TTS_STATUS_BATCH_SIZE", "50"))
+    # How often jobs the TTS service has but we don't know about are deleted in targeted mode, 0 turns it off
+    TTS_CLEANUP_INTERVAL_MINUTES = int(os.getenv("TTS_CLEANUP_INTERVAL_MINUTES", "60"))
     FEED_MAX_EPISODES = int(os.getenv("FEED_MAX_EPISODES", "1000"))
+    # Lower bitrate encodings made after download with ffmpeg, comma separated names from renditions.RENDITIONS
+    AUDIO_RENDITIONS = [name.strip() for name in os.getenv("AUDIO_RENDITIONS", "").split(",") if name.strip()]
+    # Rendition used by feeds that don't ask for one with ?rendition=, the original mp3 when unset
+    FEED_DEFAULT_RENDITION = os.getenv("FEED_DEFAULT_RENDITION")
+    AUDIO_RENDITION_WORKERS = int(os.getenv("AUDIO_RENDITION_WORKERS", "2"))
+    AUDIO_RENDITION_TIMEOUT_SECONDS = int(os.getenv("AUDIO_RENDITION_TIMEOUT_SECONDS", "600"))
+    FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")
+    # Disk budget for MP3_STORAGE_PATH, least recently played audio outside the feed is evicted past it, 0 is no limit
+    AUDIO_STORAGE_BUDGET_MB = int(os.getenv("AUDIO_STORAGE_BUDGET_MB", "0"))
+    # How often the budget is enforced and files no episode uses are deleted, 0 turns it off
+    AUDIO_STORAGE_INTERVAL_MINUTES = int(os.getenv("AUDIO_STORAGE_INTERVAL_MINUTES", "60"))
+    # Files no episode uses are kept this long, so a download isn't deleted before its episode is updated
+    AUDIO_ORPHAN_GRACE_MINUTES = int(os.getenv("AUDIO_ORPHAN_GRACE_MINUTES", "60"))
     ARCHIVE_PH_DOMAINS = os.getenv("ARCHIVE_PH_DOMAINS") # Comma separated list of domains to scrape from archive.ph
     if ARCHIVE_PH_DOMAINS:
         ARCHIVE_PH_DOMAINS = set(remove_www(domain.strip()) for domain in ARCHIVE_PH_DOMAINS.split(","))
     else:
         ARCHIVE_PH_DOMAINS = set()
+    # Comma separated archive.ph mirrors to pick the fastest healthy one from, defaults to .ph, .today, .is and .md
+    ARCHIVE_PH_MIRRORS = [mirror for mirror in os.getenv("ARCHIVE_PH_MIRRORS", "").split(",") if mirror.strip()]
+
+    # Standalone worker pipeline stages
+    PIPELINE_SYNC_INTERVAL_SECONDS = int(os.getenv("PIPELINE_SYNC_INTERVAL_SECONDS", str(POLL_INTERVAL_MINUTES * 60)))
+    PIPELINE_DOWNLOAD_INTERVAL_SECONDS = int(os.getenv("PIPELINE_DOWNLOAD_INTERVAL_SECONDS", "30"))
+    PIPELINE_SUBMIT_INTERVAL_SECONDS = int(os.getenv("PIPELINE_SUBMIT_INTERVAL_SECONDS", "60"))
+    PIPELINE_ARCHIVE_CONCURRENCY = int(os.getenv("PIPELINE_ARCHIVE_CONCURRENCY", "2"))
+    PIPELINE_EXTRACT_CONCURRENCY = int(os.getenv("PIPELINE_EXTRACT_CONCURRENCY", "2"))
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "20"))
+    # Profiling, see profiling.py
+    PROFILE_POLL = os.getenv("PROFILE_POLL", "false").lower() == "true"
+    PROFILE_CALLS = {name.strip() for name in os.getenv("PROFILE_CALLS", "").split(",") if name.strip()}
+    PROFILE_DIR = os.path.join(os.path.dirname(__file__), os.getenv("PROFILE_DIR", "../profiles"))
+    PROFILE_RETENTION = int(os.getenv("PROFILE_RETENTION", "20"))
+    SLOW_PARSE_LOG = os.getenv("SLOW_PARSE_LOG")  # JSON lines file, off when unset
+    SLOW_PARSE_SECONDS = float(os.getenv("SLOW_PARSE_SECONDS", "5"))
+
+    # Port the standalone worker serves /metrics on, off when unset
+    WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+    # Re-extraction of older episodes, see reextract. Parsing runs in this many processes, 0 parses in the main one
+    REEXTRACT_WORKERS = int(os.getenv("REEXTRACT_WORKERS", str(os.cpu_count() or 1)))
+    # Episodes fetched from hoarder and parsed between checkpoints
+    REEXTRACT_BATCH_SIZE = int(os.getenv("REEXTRACT_BATCH_SIZE", "50"))
+    REEXTRACT_CHECKPOINT_PATH = os.path.join(
+        os.path.dirname(__file__), os.getenv("REEXTRACT_CHECKPOINT_PATH", "../cache/reextract.json")
+    )
+
+    # Comma separated windows the analytics report covers by default, e.g. 90m, 24h, 7d
+    ANALYTICS_WINDOWS = [
+        window.strip() for window in os.getenv("ANALYTICS_WINDOWS", "24h,7d").split(",") if window.strip()
+    ]
@@ -2,18 +2,51 @@
 Database operations for episodes
 """
 
-from datetime import datetime
+import hashlib
+import html
+import re
+from datetime import datetime, timedelta, timezone
 
-from sqlalchemy import JSON, Column, DateTime, String, Text, create_engine
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    Integer,
+    String,
+    Text,
+    and_,
+    create_engine,
+    delete,
+    event,
+    func,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from hoarderpod.config import Config
-from hoarderpod.utils import to_utc
+from hoarderpod.tts_queue import QueuedEpisode, order_queue, predict_ready_times, update_seconds_per_char
+from hoarderpod.utils import chunked, to_utc
 
-# Database setup
+# Database setup, sessions are bound to engines by init_db(). Session writes through a single connection, ReadSession
+# reads from a pool of read-only connections.
 Base = declarative_base()
-engine = create_engine(Config.DATABASE_URI)
-Session = sessionmaker(bind=engine)
+Session = sessionmaker()
+ReadSession = sessionmaker()
+engine = None
+read_engine = None
+# Set by init_db when the database has the FTS5 search index, search falls back to LIKE otherwise
+search_enabled = False
+
+# Snippet highlight markers, control characters that can't appear in article text so the snippet can be escaped safely
+_MARK_START = "\x02"
+_MARK_END = "\x03"
 
 
 class Episode(Base):
@@ -34,8 +67,359 @@ class Episode(Base):
     mp3 = Column(String)
 
 
-# Create tables if they don't exist
-Base.metadata.create_all(engine)
+class AudioFile(Base):
+    """A file in MP3_STORAGE_PATH, tracked by storage.AudioStorage."""
+
+    __tablename__ = "audio_files"
+
+    filename = Column(String, primary_key=True)
+    # The original mp3 this file is, or is a rendition of
+    mp3 = Column(String, nullable=False, index=True)
+    episode_id = Column(String)
+    size_bytes = Column(BigInteger, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False)
+    last_accessed_at = Column(DateTime)
+    # Set when the file was deleted to stay under AUDIO_STORAGE_BUDGET_MB, the row stays so a request can requeue TTS
+    evicted_at = Column(DateTime)
+
+
+class TTSJob(Base):
+    """A job submitted to the TTS service, kept to learn how fast it synthesizes."""
+
+    __tablename__ = "tts_jobs"
+
+    job_id = Column(String, primary_key=True)
+    episode_id = Column(String, index=True)
+    model = Column(String)
+    voice = Column(String)
+    chars = Column(Integer, nullable=False, default=0)
+    submitted_at = Column(DateTime, nullable=False)
+    completed_at = Column(DateTime)
+
+
+class EpisodeEvent(Base):
+    """A step in an episode's life, see analytics for the report built from them."""
+
+    __tablename__ = "episode_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    episode_id = Column(String, nullable=False, index=True)
+    # seen, parsed, submitted, completed or downloaded
+    event = Column(String, nullable=False)
+    at = Column(DateTime, nullable=False, index=True)
+    # Characters of text for parsed and submitted, bytes of audio for downloaded
+    size = Column(BigInteger)
+
+
+class Failure(Base):
+    """Failed attempts at a stage of an episode, retried with exponential backoff until it's dead-lettered."""
+
+    __tablename__ = "failures"
+
+    # The episode id, which is the bookmark id before the episode has been extracted
+    item_id = Column(String, primary_key=True)
+    # extract or tts
+    stage = Column(String, primary_key=True)
+    # The episode's title, or the bookmark's url before it has been extracted
+    title = Column(String)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    last_failed_at = Column(DateTime, nullable=False)
+    next_retry_at = Column(DateTime)
+    # Set after FAILURE_MAX_ATTEMPTS failures, the stage isn't retried again until the failure is cleared
+    dead_at = Column(DateTime)
+
+
+class Extraction(Base):
+    """The extractor version an episode's text was extracted with, see reextract."""
+
+    __tablename__ = "extractions"
+
+    episode_id = Column(String, primary_key=True)
+    # article_parse.EXTRACTOR_VERSION, episodes without a row were extracted before versions were recorded
+    extractor_version = Column(Integer, nullable=False)
+    # sha256 of the text, a new extraction only requeues TTS when this changes
+    text_hash = Column(String, nullable=False)
+    extracted_at = Column(DateTime, nullable=False)
+
+
+class TTSSpeed(Base):
+    """Learned synthesis speed of a TTS model and voice, see tts_queue."""
+
+    __tablename__ = "tts_speeds"
+
+    model = Column(String, primary_key=True)
+    voice = Column(String, primary_key=True)
+    seconds_per_char = Column(Float, nullable=False)
+    samples = Column(Integer, nullable=False, default=0)
+
+
+# Statuses EpisodeFilter can select on: no TTS job yet, TTS job running, audio ready, or TTS failed
+EPISODE_STATUSES = ("waiting", "processing", "ready", "failed")
+
+
+def _naive_utc(value: datetime | str | None) -> datetime | None:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class EpisodeFilter:
+    """Which episodes a bulk operation applies to, an episode has to match every criterion given."""
+
+    def __init__(
+        self,
+        ids: list[str] | None = None,
+        since: datetime | str | None = None,
+        until: datetime | str | None = None,
+        domain: str | None = None,
+        author: str | None = None,
+        status: str | None = None,
+    ):
+        """
+        Args:
+            ids: Optional episode ids
+            since: Optional earliest creation date, a datetime or ISO 8601 string, UTC if it has no timezone
+            until: Optional creation date the episodes have to be older than
+            domain: Optional domain of the article url, subdomains included
+            author: Optional author, matched case-insensitively against part of any of the episode's authors
+            status: Optional status, one of EPISODE_STATUSES
+
+        Raises:
+            ValueError: If a date or the status is invalid
+        """
+        if status is not None and status not in EPISODE_STATUSES:
+            raise ValueError(f"Unknown status {status}, expected one of {', '.join(EPISODE_STATUSES)}")
+        self.ids = list(ids) if ids is not None else None
+        self.since = _naive_utc(since)
+        self.until = _naive_utc(until)
+        self.domain = domain.strip().lower().removeprefix("www.") if domain else None
+        self.author = author.strip().lower() if author else None
+        self.status = status
+
+    def is_empty(self) -> bool:
+        """Check if no criteria were given, so the filter would match every episode.
+
+        Returns:
+            bool: True if there are no criteria
+        """
+        criteria = (self.since, self.until, self.domain, self.author, self.status)
+        return self.ids is None and all(criterion is None for criterion in criteria)
+
+    def clause(self):
+        """Build the WHERE clause selecting the matching episodes."""
+        conditions = []
+        if self.ids is not None:
+            conditions.append(Episode.id.in_(self.ids))
+        if self.since is not None:
+            conditions.append(Episode.created_at >= self.since)
+        if self.until is not None:
+            conditions.append(Episode.created_at < self.until)
+        if self.domain is not None:
+            url = func.lower(Episode.url)
+            conditions.append(
+                or_(
+                    *(
+                        url.like(f"%://{prefix}{self.domain}{end}")
+                        for prefix in ("", "%.")
+                        for end in ("", "/%", ":%", "?%")
+                    )
+                )
+            )
+        if self.author is not None:
+            conditions.append(
+                text(
+                    "EXISTS (SELECT 1 FROM json_each(episodes.authors) WHERE lower(json_each.value) LIKE :author)"
+                ).bindparams(author=f"%{self.author}%")
+            )
+        if self.status == "waiting":
+            conditions.append(Episode.tts_job_id == None)
+        elif self.status == "processing":
+            conditions.append(and_(Episode.tts_job_id != None, Episode.mp3 == None))
+        elif self.status == "ready":
+            conditions.append(Episode.mp3 != None)
+        elif self.status == "failed":
+            conditions.append(Episode.id.in_(select(Failure.item_id).where(Failure.stage == "tts")))
+        return and_(*conditions)
+
+
+def failure_backoff_seconds(attempts: int) -> float:
+    """Get how long to wait before retrying after a number of failed attempts.
+
+    Args:
+        attempts: Failed attempts so far, at least 1
+
+    Returns:
+        float: FAILURE_BACKOFF_SECONDS doubled for every attempt after the first, at most FAILURE_BACKOFF_MAX_SECONDS
+    """
+    return min(Config.FAILURE_BACKOFF_MAX_SECONDS, Config.FAILURE_BACKOFF_SECONDS * 2 ** (attempts - 1))
+
+
+def text_hash(text: str | None) -> str:
+    """Hash an episode's text.
+
+    Args:
+        text: The text
+
+    Returns:
+        str: The text's sha256 in hex
+    """
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def _blocked(stage: str, now: datetime):
+    """Select the ids whose stage is dead-lettered or waiting out its backoff."""
+    return select(Failure.item_id).where(
+        Failure.stage == stage, or_(Failure.dead_at != None, Failure.next_retry_at > now)
+    )
+
+
+def _configure_sqlite(sqlite_engine: Engine, read_only: bool) -> None:
+    """Set the pragmas on every new connection and take control of when transactions start.
+
+    pysqlite starts transactions lazily and as readers, so a transaction that reads and then writes can fail with
+    "database is locked" straight away instead of waiting. Writers begin with BEGIN IMMEDIATE so they queue on
+    busy_timeout instead.
+
+    Args:
+        sqlite_engine: The engine to configure
+        read_only: Whether connections should refuse writes
+    """
+
+    @event.listens_for(sqlite_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {Config.SQLITE_BUSY_TIMEOUT_MS}")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+        else:
+            cursor.execute(f"PRAGMA journal_mode = {Config.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {Config.SQLITE_SYNCHRONOUS}")
+        cursor.close()
+
+    @event.listens_for(sqlite_engine, "begin")
+    def on_begin(connection):
+        connection.exec_driver_sql("BEGIN" if read_only else "BEGIN IMMEDIATE")
+
+
+# An external content FTS5 table over the episodes table, kept up to date by triggers. The index is keyed by the
+# episodes rowid, so run rebuild_search_index() after a VACUUM.
+SEARCH_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS episodes_fts USING fts5(
+        title, authors, description, text,
+        content='episodes', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS episodes_fts_insert AFTER INSERT ON episodes BEGIN
+        INSERT INTO episodes_fts(rowid, title, authors, description, text)
+        VALUES (new.rowid, new.title, new.authors, new.description, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS episodes_fts_delete AFTER DELETE ON episodes BEGIN
+        INSERT INTO episodes_fts(episodes_fts, rowid, title, authors, description, text)
+        VALUES ('delete', old.rowid, old.title, old.authors, old.description, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS episodes_fts_update AFTER UPDATE OF title, authors, description, text ON episodes
+    BEGIN
+        INSERT INTO episodes_fts(episodes_fts, rowid, title, authors, description, text)
+        VALUES ('delete', old.rowid, old.title, old.authors, old.description, old.text);
+        INSERT INTO episodes_fts(rowid, title, authors, description, text)
+        VALUES (new.rowid, new.title, new.authors, new.description, new.text);
+    END""",
+]
+
+
+def _init_search_index(db_engine: Engine) -> bool:
+    """Create the search index and its triggers, backfilling it from existing episodes the first time.
+
+    Args:
+        db_engine: The writer engine
+
+    Returns:
+        bool: True if the index is available, False if SQLite was built without FTS5
+    """
+    with db_engine.begin() as connection:
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'episodes_fts'"
+        ).first()
+        try:
+            for statement in SEARCH_INDEX_DDL:
+                connection.exec_driver_sql(statement)
+        except OperationalError as e:
+            print(f"Full text search is unavailable, falling back to substring search: {e}")
+            return False
+        if not exists:
+            connection.exec_driver_sql("INSERT INTO episodes_fts(episodes_fts) VALUES ('rebuild')")
+    return True
+
+
+def rebuild_search_index() -> None:
+    """Rebuild the search index from the episodes table."""
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO episodes_fts(episodes_fts) VALUES ('rebuild')")
+
+
+def to_fts_query(query: str) -> str | None:
+    """Turn what someone typed into the search box into an FTS5 query.
+
+    Every word has to match and the last one matches as a prefix, so results show up while typing. Words are quoted, so
+    FTS5 syntax in the input is searched for rather than interpreted.
+
+    Args:
+        query: The search box text
+
+    Returns:
+        str | None: The FTS5 query, None if there are no words to search for
+    """
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms) + "*"
+
+
+def highlight_snippet(snippet: str) -> str:
+    """Escape a snippet for HTML and turn the match markers into <mark> tags.
+
+    Args:
+        snippet: A snippet with _MARK_START/_MARK_END around matches
+
+    Returns:
+        str: HTML
+    """
+    return html.escape(snippet).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+def init_db(database_uri: str | None = None):
+    """Connect to the database and create any tables that don't exist yet.
+
+    SQLite files get a single connection writer engine and a pooled read-only engine. In-memory SQLite is private to
+    its connection, so it and other databases use one engine for both.
+
+    Args:
+        database_uri: Optional database URI, defaults to Config.DATABASE_URI
+
+    Returns:
+        Engine: The engine Session writes with
+    """
+    global engine, read_engine, search_enabled
+    for old_engine in {engine, read_engine} - {None}:
+        old_engine.dispose()
+
+    url = make_url(database_uri or Config.DATABASE_URI)
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        engine = create_engine(url, pool_size=1, max_overflow=0)
+        _configure_sqlite(engine, read_only=False)
+        read_engine = create_engine(url, pool_size=Config.DB_READ_POOL_SIZE, max_overflow=Config.DB_READ_POOL_SIZE)
+        _configure_sqlite(read_engine, read_only=True)
+    else:
+        engine = read_engine = create_engine(url)
+
+    Base.metadata.create_all(engine)
+    search_enabled = url.get_backend_name() == "sqlite" and _init_search_index(engine)
+    Session.configure(bind=engine)
+    ReadSession.configure(bind=read_engine)
+    return engine
 
 
 class EpisodeOps:
@@ -47,7 +431,7 @@ class EpisodeOps:
         Returns:
             list[Episode]: The list of episodes with mp3
         """
-        with Session() as session:
+        with ReadSession() as session:
             return session.query(Episode).filter(Episode.mp3 != None).order_by(Episode.created_at.asc()).all()
 
     def get_episode_ids(self) -> set[str]:
@@ -56,17 +440,186 @@ class EpisodeOps:
         Returns:
             set[str]: The list of episode ids
         """
+        with ReadSession() as session:
+            return {episode_id for (episode_id,) in session.query(Episode.id)}
+
+    def get_matching_ids(self, episode_filter: EpisodeFilter, with_audio: bool = False) -> list[str]:
+        """Get the ids of the episodes a filter matches.
+
+        Args:
+            episode_filter: The filter
+            with_audio: Whether to only include episodes that have audio
+
+        Returns:
+            list[str]: The episode ids, oldest first
+        """
+        query = select(Episode.id).where(episode_filter.clause()).order_by(Episode.created_at)
+        if with_audio:
+            query = query.where(Episode.mp3 != None)
+        with ReadSession() as session:
+            return list(session.scalars(query))
+
+    def delete_matching(self, episode_filter: EpisodeFilter) -> list[tuple[str, str | None]]:
+        """Delete the episodes a filter matches, with their failures and extraction records.
+
+        Args:
+            episode_filter: The filter
+
+        Returns:
+            list[tuple[str, str | None]]: The deleted episode ids and mp3s, for the caller to delete the audio
+        """
         with Session() as session:
-            return {episode.id for episode in session.query(Episode).all()}
+            deleted = session.execute(
+                delete(Episode)
+                .where(episode_filter.clause())
+                .returning(Episode.id, Episode.mp3)
+                .execution_options(synchronize_session=False)
+            ).all()
+            for chunk in chunked([episode_id for episode_id, _ in deleted]):
+                session.execute(delete(Failure).where(Failure.item_id.in_(chunk)))
+                session.execute(delete(Extraction).where(Extraction.episode_id.in_(chunk)))
+            session.commit()
+        return [(episode_id, mp3) for episode_id, mp3 in deleted]
 
-    def get_episodes_to_tts(self) -> list[Episode]:
-        """Get the episodes that haven't been processed by TTS yet.
+    def clear_tts_matching(self, episode_filter: EpisodeFilter) -> list[tuple[str, str | None]]:
+        """Send the episodes a filter matches back to TTS, clearing their TTS failures.
+
+        Args:
+            episode_filter: The filter
 
         Returns:
-            list[Episode]: The list of episodes that haven't been processed by TTS yet
+            list[tuple[str, str | None]]: The episode ids and their old mp3s, for the caller to delete the audio
         """
         with Session() as session:
-            return session.query(Episode).filter(Episode.tts_job_id == None).order_by(Episode.created_at.asc()).all()
+            # RETURNING gives the cleared values, so the old mp3s are read first. The writer's transaction began
+            # IMMEDIATE, so nothing can change in between.
+            with_audio = select(Episode.id, Episode.mp3).where(episode_filter.clause(), Episode.mp3 != None)
+            old_mp3s = dict(session.execute(with_audio).all())
+            cleared = session.scalars(
+                update(Episode)
+                .where(episode_filter.clause())
+                .values(tts_job_id=None, mp3=None)
+                .returning(Episode.id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            for chunk in chunked(cleared):
+                session.execute(delete(Failure).where(Failure.stage == "tts", Failure.item_id.in_(chunk)))
+            session.commit()
+        return [(episode_id, old_mp3s.get(episode_id)) for episode_id in cleared]
+
+    def get_episodes_to_tts(self, limit: int | None = None, policy: str | None = None) -> list[Episode]:
+        """Get the episodes that haven't been processed by TTS yet, in the order they should be submitted.
+
+        Args:
+            limit: Optional maximum number of episodes to return
+            policy: Optional queue ordering from tts_queue.POLICIES, defaults to TTS_QUEUE_POLICY
+
+        Returns:
+            list[Episode]: The list of episodes that haven't been processed by TTS yet
+        """
+        policy = policy or Config.TTS_QUEUE_POLICY
+        with ReadSession() as session:
+            if policy == "fifo":
+                query = session.query(Episode).filter(*self._waiting_for_tts()).order_by(Episode.created_at.asc())
+                if limit is not None:
+                    query = query.limit(limit)
+                return query.all()
+
+            # Order on lengths only, then load the episodes that made the cut
+            ids = [episode.id for episode in self._tts_queue(session, policy)][:limit]
+            query = session.query(Episode).filter(*self._waiting_for_tts())
+            if limit is not None:
+                query = query.filter(Episode.id.in_(ids))
+            episodes = {episode.id: episode for episode in query}
+            return [episodes[episode_id] for episode_id in ids if episode_id in episodes]
+
+    def is_waiting_for_tts(self, episode_id: str) -> bool:
+        """Check if an episode is still waiting to be submitted to TTS.
+
+        Args:
+            episode_id: The episode id
+
+        Returns:
+            bool: True if it has no job and its TTS failures aren't backing off or dead-lettered
+        """
+        with ReadSession() as session:
+            query = session.query(Episode.id).filter(Episode.id == episode_id, *self._waiting_for_tts())
+            return query.first() is not None
+
+    def _waiting_for_tts(self) -> tuple:
+        # Episodes without a job, except ones whose TTS failures are backing off or dead-lettered
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return Episode.tts_job_id == None, ~Episode.id.in_(_blocked("tts", now))
+
+    def _tts_queue(self, session, policy: str) -> list[QueuedEpisode]:
+        rows = session.query(Episode.id, Episode.created_at, func.coalesce(func.length(Episode.text), 0)).filter(
+            *self._waiting_for_tts()
+        )
+        queue = [QueuedEpisode(episode_id, created_at, chars) for episode_id, created_at, chars in rows]
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return order_queue(queue, policy, self.get_seconds_per_char(), now, Config.TTS_QUEUE_AGING)
+
+    def get_seconds_per_char(self, model: str | None = None, voice: str | None = None) -> float:
+        """Get the learned synthesis speed of a TTS model and voice.
+
+        Args:
+            model: Optional model, defaults to TTS_MODEL
+            voice: Optional voice, defaults to TTS_VOICE
+
+        Returns:
+            float: Seconds per character, TTS_SECONDS_PER_CHAR until a job has completed
+        """
+        with ReadSession() as session:
+            speed = session.get(TTSSpeed, (model or Config.TTS_MODEL, voice or Config.TTS_VOICE))
+            return speed.seconds_per_char if speed is not None else Config.TTS_SECONDS_PER_CHAR
+
+    def get_tts_estimates(self) -> dict[str, tuple[float, datetime]]:
+        """Estimate how long each episode without audio takes to synthesize and when it will be ready.
+
+        Returns:
+            dict[str, tuple[float, datetime]]: Episode id to estimated seconds and predicted ready time (naive UTC)
+        """
+        seconds_per_char = self.get_seconds_per_char()
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        with ReadSession() as session:
+            rows = (
+                session.query(
+                    Episode.id, TTSJob.submitted_at, func.coalesce(TTSJob.chars, func.length(Episode.text), 0)
+                )
+                .outerjoin(TTSJob, TTSJob.job_id == Episode.tts_job_id)
+                .filter(Episode.tts_job_id != None, Episode.mp3 == None)
+            )
+            # Jobs submitted before they were recorded count as just submitted
+            in_flight = sorted(
+                ((episode_id, submitted_at or now, chars) for episode_id, submitted_at, chars in rows),
+                key=lambda job: job[1],
+            )
+            waiting = self._tts_queue(session, Config.TTS_QUEUE_POLICY)
+
+        ready_at = predict_ready_times(in_flight, waiting, seconds_per_char, now)
+        chars = {episode_id: job_chars for episode_id, _, job_chars in in_flight}
+        chars.update((episode.id, episode.chars) for episode in waiting)
+        return {
+            episode_id: (chars[episode_id] * seconds_per_char, ready_at[episode_id]) for episode_id in ready_at
+        }
+
+    def count_episodes_to_tts(self) -> int:
+        """Count the episodes that haven't been submitted to TTS yet.
+
+        Returns:
+            int: The number of episodes waiting for TTS
+        """
+        with ReadSession() as session:
+            return session.query(Episode).filter(*self._waiting_for_tts()).count()
+
+    def count_tts_in_flight(self) -> int:
+        """Count the episodes submitted to TTS that don't have an mp3 yet.
+
+        Returns:
+            int: The number of episodes with an outstanding TTS job
+        """
+        with ReadSession() as session:
+            return session.query(Episode).filter(Episode.tts_job_id != None, Episode.mp3 == None).count()
 
     def get_job_ids(self) -> set[str]:
         """Get the episode with a TTS job id.
@@ -74,9 +627,34 @@ class EpisodeOps:
         Returns:
                 set[str]: The list of episode ids
         """
-        with Session() as session:
+        with ReadSession() as session:
             return {episode.tts_job_id for episode in session.query(Episode).all() if episode.tts_job_id}
 
+    def get_outstanding_job_ids(self) -> list[str]:
+        """Get the TTS job ids of episodes that are still waiting for their mp3.
+
+        Returns:
+            list[str]: The outstanding job ids
+        """
+        with ReadSession() as session:
+            rows = session.query(Episode.tts_job_id).filter(Episode.tts_job_id != None, Episode.mp3 == None)
+            return [job_id for (job_id,) in rows]
+
+    def is_tts_job_pending(self, job_id: str) -> bool:
+        """Check if a TTS job belongs to an episode that is still waiting for its mp3.
+
+        Args:
+            job_id: The job id
+
+        Returns:
+            bool: True if an episode is waiting on this job
+        """
+        with ReadSession() as session:
+            return (
+                session.query(Episode.id).filter(Episode.tts_job_id == job_id, Episode.mp3 == None).first()
+                is not None
+            )
+
     def null_episodes_that_tts_doesnt_know_about(self, ongoing_jobs: set[str]) -> list[tuple[str, str]]:
         """As a failsafe, make sure the TTS service still knows about episodes that have a job id but no mp3.
 
@@ -91,22 +669,84 @@ class EpisodeOps:
             waiting_episodes = session.query(Episode).filter(Episode.tts_job_id != None, Episode.mp3 == None)
             for episode in waiting_episodes:
                 if episode.tts_job_id not in ongoing_jobs:
-                    episode.tts_job_id = None
                     result.append((episode.id, episode.tts_job_id))
+                    episode.tts_job_id = None
             session.commit()
         return result
 
-    def mark_tts_completed(self, job_id: str, mp3_path: str):
+    def null_tts_jobs(self, job_ids: list[str]) -> list[tuple[str, str]]:
+        """Clear the job id of episodes whose TTS job was lost, so they are submitted again.
+
+        Args:
+            job_ids: The lost job ids
+
+        Returns:
+            list[tuple[str, str]]: The episode ids and job ids that were cleared
+        """
+        if not job_ids:
+            return []
+
+        result = []
+        with Session() as session:
+            waiting_episodes = session.query(Episode).filter(Episode.tts_job_id.in_(job_ids), Episode.mp3 == None)
+            for episode in waiting_episodes:
+                result.append((episode.id, episode.tts_job_id))
+                episode.tts_job_id = None
+            session.commit()
+        return result
+
+    def mark_tts_completed(self, job_id: str, mp3_path: str, completed_at: datetime | None = None) -> str:
         """Mark an episode as crawled.
 
         Args:
             job_id: The job id
             mp3_path: The mp3 path
+            completed_at: When synthesis finished, naive UTC. The TTS speed is only learned from jobs where it's known,
+                a poll downloads jobs some time after they finish
+
+        Returns:
+            str: The id of the episode
         """
         with Session() as session:
             episode = session.query(Episode).filter_by(tts_job_id=job_id).first()
             episode.mp3 = mp3_path
+            if completed_at is not None:
+                self._learn_tts_speed(session, job_id, completed_at)
+            session.query(Failure).filter_by(item_id=episode.id, stage="tts").delete()
             session.commit()
+            return episode.id
+
+    def _learn_tts_speed(self, session, job_id: str, completed_at: datetime) -> None:
+        job = session.get(TTSJob, job_id)
+        if job is None or job.completed_at is not None:
+            return
+        job.completed_at = completed_at
+
+        # The service works through jobs in turn, so this one started when it was submitted or when the job before it
+        # finished, whichever was later
+        previous_finish = (
+            session.query(func.max(TTSJob.completed_at))
+            .filter(
+                TTSJob.job_id != job_id,
+                TTSJob.model == job.model,
+                TTSJob.voice == job.voice,
+                TTSJob.completed_at >= job.submitted_at,
+                TTSJob.completed_at <= completed_at,
+            )
+            .scalar()
+        )
+        started_at = max(job.submitted_at, previous_finish or job.submitted_at)
+
+        speed = session.get(TTSSpeed, (job.model, job.voice))
+        current = speed.seconds_per_char if speed is not None else None
+        seconds_per_char = update_seconds_per_char(current, (completed_at - started_at).total_seconds(), job.chars)
+        if seconds_per_char is None or seconds_per_char == current:
+            return
+        if speed is None:
+            speed = TTSSpeed(model=job.model, voice=job.voice, samples=0)
+            session.add(speed)
+        speed.seconds_per_char = seconds_per_char
+        speed.samples += 1
 
     def mark_tts_submitted(self, episode_id: str, job_id: str):
         """Mark an episode as submitted to TTS.
@@ -117,18 +757,247 @@ class EpisodeOps:
         with Session() as session:
             episode = session.query(Episode).filter_by(id=episode_id).first()
             episode.tts_job_id = job_id
+            session.merge(
+                TTSJob(
+                    job_id=job_id,
+                    episode_id=episode_id,
+                    model=Config.TTS_MODEL,
+                    voice=Config.TTS_VOICE,
+                    chars=len(episode.text or ""),
+                    submitted_at=datetime.now(timezone.utc).replace(tzinfo=None),
+                )
+            )
+            session.commit()
+
+    def record_event(self, episode_id: str, event: str, size: int | None = None, at: datetime | None = None) -> None:
+        """Record a step in an episode's life for the analytics report.
+
+        Args:
+            episode_id: The episode, or bookmark id before it has been parsed
+            event: seen, parsed, submitted, completed or downloaded
+            size: Optional characters of text or bytes of audio
+            at: When it happened, naive UTC, defaults to now
+        """
+        if at is None:
+            at = datetime.now(timezone.utc).replace(tzinfo=None)
+        with Session() as session:
+            session.add(EpisodeEvent(episode_id=episode_id, event=event, at=at, size=size))
+            session.commit()
+
+    def get_events(self, since: datetime, until: datetime) -> list[tuple[str, str, datetime, int | None]]:
+        """Get the events of every episode with an event between since and until, including its earlier events.
+
+        Args:
+            since: Start of the window, naive UTC
+            until: End of the window, naive UTC
+
+        Returns:
+            list[tuple[str, str, datetime, int | None]]: Episode id, event, time and size, oldest first
+        """
+        with ReadSession() as session:
+            in_window = (
+                session.query(EpisodeEvent.episode_id)
+                .filter(EpisodeEvent.at >= since, EpisodeEvent.at <= until)
+                .distinct()
+            )
+            rows = (
+                session.query(EpisodeEvent.episode_id, EpisodeEvent.event, EpisodeEvent.at, EpisodeEvent.size)
+                .filter(EpisodeEvent.episode_id.in_(in_window), EpisodeEvent.at <= until)
+                .order_by(EpisodeEvent.at, EpisodeEvent.id)
+            )
+            return [tuple(row) for row in rows]
+
+    def record_failure(self, item_id: str, stage: str, error: str, title: str | None = None) -> Failure:
+        """Count a failed attempt at a stage and schedule its retry, dead-lettering it after FAILURE_MAX_ATTEMPTS.
+
+        Args:
+            item_id: The episode id, or bookmark id before it has been extracted
+            stage: extract or tts
+            error: What went wrong
+            title: Optional title or url to show with the failure
+
+        Returns:
+            Failure: The updated failure
+        """
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        with Session() as session:
+            if title is None and stage == "tts":
+                episode = session.get(Episode, item_id)
+                title = episode.title if episode is not None else None
+            failure = session.get(Failure, (item_id, stage))
+            if failure is None:
+                failure = Failure(item_id=item_id, stage=stage, attempts=0, last_failed_at=now)
+                session.add(failure)
+            failure.title = title or failure.title
+            failure.attempts += 1
+            failure.last_error = error
+            failure.last_failed_at = now
+            if failure.attempts >= Config.FAILURE_MAX_ATTEMPTS:
+                failure.dead_at = now
+                failure.next_retry_at = None
+                print(f"Giving up on {stage} for {item_id} after {failure.attempts} attempts: {error}")
+            else:
+                failure.next_retry_at = now + timedelta(seconds=failure_backoff_seconds(failure.attempts))
+            session.commit()
+            session.refresh(failure)
+            session.expunge(failure)
+            return failure
+
+    def get_blocked_ids(self, stage: str) -> set[str]:
+        """Get the ids whose stage is dead-lettered or waiting out its backoff.
+
+        Args:
+            stage: extract or tts
+
+        Returns:
+            set[str]: The ids to skip for now
+        """
+        with ReadSession() as session:
+            return set(session.scalars(_blocked(stage, datetime.now(timezone.utc).replace(tzinfo=None))))
+
+    def get_failures(self, dead_only: bool = False) -> list[Failure]:
+        """Get the failures, most recent first.
+
+        Args:
+            dead_only: Only get dead-lettered failures
+
+        Returns:
+            list[Failure]: The failures
+        """
+        with ReadSession() as session:
+            query = session.query(Failure)
+            if dead_only:
+                query = query.filter(Failure.dead_at != None)
+            return query.order_by(Failure.last_failed_at.desc()).all()
+
+    def count_dead_letters(self) -> int:
+        """Count the dead-lettered failures.
+
+        Returns:
+            int: The number of stages given up on
+        """
+        with ReadSession() as session:
+            return session.query(Failure).filter(Failure.dead_at != None).count()
+
+    def retry_failures(self, item_id: str) -> int:
+        """Forget an episode's or bookmark's failures so every stage is retried on the next poll.
+
+        Args:
+            item_id: The episode id, or bookmark id before it has been extracted
+
+        Returns:
+            int: The number of failures cleared
+        """
+        with Session() as session:
+            result = session.query(Failure).filter(Failure.item_id == item_id).delete()
             session.commit()
+            return result
 
-    def add_episode(self, episode: Episode):
+    def add_episode(self, episode: Episode, extractor_version: int | None = None):
         """Add an episode to the database.
 
         Args:
             episode: The episode to add
+            extractor_version: Optional article_parse.EXTRACTOR_VERSION its text was extracted with
         """
         with Session() as session:
             session.add(episode)
+            if extractor_version is not None:
+                session.add(
+                    Extraction(
+                        episode_id=episode.id,
+                        extractor_version=extractor_version,
+                        text_hash=text_hash(episode.text),
+                        extracted_at=datetime.now(timezone.utc).replace(tzinfo=None),
+                    )
+                )
+            session.query(Failure).filter_by(item_id=episode.id, stage="extract").delete()
             session.commit()
 
+    def _stale(self, session, version: int):
+        return (
+            session.query(Episode.id)
+            .outerjoin(Extraction, Extraction.episode_id == Episode.id)
+            .filter(or_(Extraction.extractor_version == None, Extraction.extractor_version < version))
+        )
+
+    def get_stale_episode_ids(self, version: int, after: str | None = None, limit: int | None = None) -> list[str]:
+        """Get the ids of episodes extracted with an older extractor version, in id order.
+
+        Args:
+            version: The current extractor version
+            after: Optional id to start after, to page through them
+            limit: Optional maximum number of ids
+
+        Returns:
+            list[str]: The episode ids
+        """
+        with ReadSession() as session:
+            query = self._stale(session, version)
+            if after is not None:
+                query = query.filter(Episode.id > after)
+            return [episode_id for (episode_id,) in query.order_by(Episode.id).limit(limit).all()]
+
+    def get_episode_urls(self, episode_ids: list[str]) -> dict[str, str | None]:
+        """Get the article urls episodes were extracted from, archive.ph snapshots included.
+
+        Args:
+            episode_ids: The episode ids
+
+        Returns:
+            dict[str, str | None]: Episode id to url, for the episodes that exist
+        """
+        with ReadSession() as session:
+            return dict(session.query(Episode.id, Episode.url).filter(Episode.id.in_(episode_ids)).all())
+
+    def count_stale_episodes(self, version: int) -> int:
+        """Count the episodes extracted with an older extractor version.
+
+        Args:
+            version: The current extractor version
+
+        Returns:
+            int: The number of episodes
+        """
+        with ReadSession() as session:
+            return self._stale(session, version).count()
+
+    def update_extraction(self, episode_id: str, version: int, episode_dict: dict) -> bool | None:
+        """Store a new extraction of an episode, requeueing TTS if its text changed.
+
+        Args:
+            episode_id: The episode id
+            version: The extractor version the text was extracted with
+            episode_dict: The episode dict from article_parse.get_episode_dict
+
+        Returns:
+            bool | None: True if the text changed, False if it didn't, None if the episode was deleted
+        """
+        new_hash = text_hash(episode_dict["text"])
+        with Session() as session:
+            episode = session.get(Episode, episode_id)
+            if episode is None:
+                return None
+            extraction = session.get(Extraction, episode_id)
+            if extraction is None:
+                extraction = Extraction(episode_id=episode_id, text_hash=text_hash(episode.text))
+                session.add(extraction)
+
+            changed = new_hash != extraction.text_hash
+            episode.title = episode_dict["title"]
+            episode.description = episode_dict["description"]
+            episode.authors = episode_dict["authors"]
+            if changed:
+                # The audio no longer matches the text, AudioStorage deletes the old file once nothing uses it
+                episode.text = episode_dict["text"]
+                episode.tts_job_id = None
+                episode.mp3 = None
+            extraction.extractor_version = version
+            extraction.text_hash = new_hash
+            extraction.extracted_at = datetime.now(timezone.utc).replace(tzinfo=None)
+            session.commit()
+            return changed
+
     def delete_episode(self, episode_id: str) -> int:
         """Delete an episode from the database.
 
@@ -137,6 +1006,8 @@ class EpisodeOps:
         """
         with Session() as session:
             result = session.query(Episode).filter(Episode.id == episode_id).delete()
+            session.query(Failure).filter(Failure.item_id == episode_id).delete()
+            session.query(Extraction).filter(Extraction.episode_id == episode_id).delete()
             session.commit()
             return result
 
@@ -146,7 +1017,7 @@ class EpisodeOps:
         Returns:
             list[Episode]: The list of episodes
         """
-        with Session() as session:
+        with ReadSession() as session:
             if sort_by_created_at:
                 return session.query(Episode).order_by(Episode.created_at.desc()).all()
             return session.query(Episode).all()
@@ -157,7 +1028,7 @@ class EpisodeOps:
         Returns:
             datetime: The last episode
         """
-        with Session() as session:
+        with ReadSession() as session:
             episode = session.query(Episode).order_by(Episode.created_at.desc()).first()
             return to_utc(episode.created_at) if episode else None
 
@@ -182,5 +1053,62 @@ class EpisodeOps:
         Returns:
             str: The mp3 path
         """
-        with Session() as session:
+        with ReadSession() as session:
             return session.query(Episode).filter_by(id=episode_id).first().mp3
+
+    def search_episodes(self, query: str, page: int = 1, per_page: int = 20) -> tuple[int, list[tuple[Episode, str]]]:
+        """Search episode titles, authors, descriptions and text, best matches first.
+
+        Args:
+            query: The search box text
+            page: The page of results, starting at 1
+            per_page: Results per page
+
+        Returns:
+            tuple[int, list[tuple[Episode, str]]]: The total number of matches, and the episodes on this page with an
+                HTML snippet of where they matched
+        """
+        offset = (max(page, 1) - 1) * per_page
+        if not search_enabled:
+            return self._substring_search(query, offset, per_page)
+
+        fts_query = to_fts_query(query)
+        if fts_query is None:
+            return 0, []
+
+        with ReadSession() as session:
+            total = session.execute(
+                text("SELECT count(*) FROM episodes_fts WHERE episodes_fts MATCH :query"), {"query": fts_query}
+            ).scalar()
+            # Title matches count most, then authors and the description, then the article text. Scoring costs a few
+            # microseconds per match, so words that are in most of the library are listed newest first instead.
+            if total <= Config.SEARCH_RANK_MAX_MATCHES:
+                order_by = "bm25(episodes_fts, 10.0, 5.0, 3.0, 1.0)"
+            else:
+                order_by = "episodes_fts.rowid DESC"
+            rows = session.execute(
+                text(
+                    "SELECT episodes.id, snippet(episodes_fts, -1, :start, :end, '…', 24) FROM episodes_fts "
+                    "JOIN episodes ON episodes.rowid = episodes_fts.rowid WHERE episodes_fts MATCH :query "
+                    f"ORDER BY {order_by} LIMIT :limit OFFSET :offset"
+                ),
+                {"query": fts_query, "start": _MARK_START, "end": _MARK_END, "limit": per_page, "offset": offset},
+            ).all()
+            episodes = {
+                episode.id: episode
+                for episode in session.query(Episode).filter(Episode.id.in_([episode_id for episode_id, _ in rows]))
+            }
+        return total, [(episodes[episode_id], highlight_snippet(snippet)) for episode_id, snippet in rows]
+
+    def _substring_search(self, query: str, offset: int, limit: int) -> tuple[int, list[tuple[Episode, str]]]:
+        """Search titles and descriptions with LIKE, for databases without FTS5."""
+        query = query.strip()
+        if not query:
+            return 0, []
+
+        pattern = f"%{query}%"
+        with ReadSession() as session:
+            matches = session.query(Episode).filter(or_(Episode.title.like(pattern), Episode.description.like(pattern)))
+            total = matches.count()
+            episodes = matches.order_by(Episode.created_at.desc()).offset(offset).limit(limit).all()
+        return total, [(episode, html.escape(episode.description or "")) for episode in episodes]
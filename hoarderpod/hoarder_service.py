@@ -2,11 +2,14 @@
 Service for interacting with the Hoarder API
 """
 
+import os
 from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import requests
 
+from hoarderpod.circuit_breaker import hoarder_breaker
 from hoarderpod.config import Config
 from hoarderpod.utils import horder_dt_to_py
 
@@ -15,6 +18,7 @@ class PATHS:
     """Paths for the TTS service."""
 
     BOOKMARK_PATH = "api/v1/bookmarks"
+    ASSET_PATH = "api/v1/assets"
 
 
 class HoarderService:
@@ -35,21 +39,77 @@ class HoarderService:
         }
 
         self.bookmark_path = f"{self.root_url}/{PATHS.BOOKMARK_PATH}"
+        self.asset_path = f"{self.root_url}/{PATHS.ASSET_PATH}"
+        self.timeout = Config.HTTP_TIMEOUT_SECONDS
+        self.breaker = hoarder_breaker
 
-    def get_one_page_bookmarks(self, cursor: str | None = None):
+    def get_one_page_bookmarks(self, cursor: str | None = None, include_content: bool = True):
         """Get bookmarks from Hoarder.
 
         Args:
             cursor: Optional cursor to get the next page of bookmarks
+            include_content: Set to False to leave out each bookmark's html and text
         """
-        url = self.bookmark_path + (f"?cursor={cursor}" if cursor is not None else "")
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
+        params = {}
+        if cursor is not None:
+            params["cursor"] = cursor
+        if not include_content:
+            params["includeContent"] = "false"
+        with self.breaker.guard():
+            response = requests.get(self.bookmark_path, params=params, headers=self.headers, timeout=self.timeout)
+            response.raise_for_status()
         res_json = response.json()
         bookmarks = res_json["bookmarks"]
         cursor = res_json["nextCursor"]
         return bookmarks, cursor
 
+    def get_bookmark(self, bookmark_id: str) -> dict | None:
+        """Get a single bookmark with its content.
+
+        Args:
+            bookmark_id: The id of the bookmark
+
+        Returns:
+            dict | None: The bookmark, or None if it was deleted
+        """
+        with self.breaker.guard():
+            response = requests.get(f"{self.bookmark_path}/{bookmark_id}", headers=self.headers, timeout=self.timeout)
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+        return response.json()
+
+    def download_asset(self, asset_id: str, path: str) -> int:
+        """Stream an asset to a file.
+
+        Args:
+            asset_id: The id of the asset
+            path: Where to save it, the file only appears once the download is complete
+
+        Returns:
+            int: The size of the asset in bytes
+        """
+        tmp_path = f"{path}.tmp"
+        size = 0
+        try:
+            with (
+                self.breaker.guard(),
+                requests.get(
+                    f"{self.asset_path}/{asset_id}", headers=self.headers, stream=True, timeout=self.timeout
+                ) as response,
+            ):
+                response.raise_for_status()
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        f.write(chunk)
+                        size += len(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return size
+
     def get_bookmarks(
         self, before_date: datetime | None = None, max_episodes: int | None = None
     ) -> Generator[dict, None, None]:
@@ -75,3 +135,47 @@ class HoarderService:
                     return
             if cursor is None:
                 break
+
+    def get_new_bookmarks(
+        self, known_ids: set[str], before_date: datetime | None = None, max_episodes: int | None = None
+    ) -> Generator[dict, None, None]:
+        """
+        Generator to get the bookmarks from Hoarder that aren't in known_ids.
+
+        Pages are listed without content and only new bookmarks are fetched in full, HOARDER_FETCH_CONCURRENCY at a
+        time. The next page is requested while the current page's bookmarks are fetched.
+
+        Args:
+            known_ids: Ids of the bookmarks we already have
+            before_date: Optional datetime to stop at when createdAt is before this date
+            max_episodes: Optional int to stop after this many bookmarks, counting known ones like get_bookmarks does
+        """
+        listed = 0
+        pages = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hoarder-page")
+        fetches = ThreadPoolExecutor(max_workers=Config.HOARDER_FETCH_CONCURRENCY, thread_name_prefix="hoarder-fetch")
+        try:
+            next_page = pages.submit(self.get_one_page_bookmarks, None, False)
+            while next_page is not None:
+                bookmarks, cursor = next_page.result()
+
+                new_ids = []
+                done = cursor is None
+                for bookmark in bookmarks:
+                    if before_date and horder_dt_to_py(bookmark["createdAt"]) <= before_date:
+                        done = True
+                        break
+                    if bookmark["id"] not in known_ids:
+                        new_ids.append(bookmark["id"])
+                    listed += 1
+                    if max_episodes and listed >= max_episodes:
+                        done = True
+                        break
+
+                # Only prefetch when this page didn't reach the end, so a poll with nothing new makes one request
+                next_page = None if done else pages.submit(self.get_one_page_bookmarks, cursor, False)
+                for bookmark in fetches.map(self.get_bookmark, new_ids):
+                    if bookmark is not None:
+                        yield bookmark
+        finally:
+            pages.shutdown(cancel_futures=True)
+            fetches.shutdown(cancel_futures=True)
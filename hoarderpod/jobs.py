@@ -0,0 +1,230 @@
+"""
+Single-flight runner for background jobs started from the API
+"""
+
+import contextlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from datetime import datetime, timezone
+
+from hoarderpod.locks import FileLock
+
+
+class JobStatus:
+    """Statuses a background job moves through."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class Job:
+    """A unit of work submitted to the JobRunner."""
+
+    def __init__(self, key: str, func: Callable[[], None], records_path: str | None = None):
+        self.id = str(uuid.uuid4())
+        self.record_path = os.path.join(records_path, f"{self.id}.json") if records_path else None
+        self.key = key
+        self.func = func
+        self.status = JobStatus.QUEUED
+        self.progress = None
+        self.error = None
+        self.submitted_at = datetime.now(timezone.utc)
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self) -> dict:
+        """Get the job as a JSON serializable dict.
+
+        Returns:
+            dict: The job's id, key, status, progress, error and timestamps
+        """
+        return {
+            "job_id": self.id,
+            "key": self.key,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "submitted_at": self.submitted_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def save(self) -> None:
+        """Write the job to its record file, if it has one, where the runners of other processes can look it up."""
+        if self.record_path is None:
+            return
+        temp_path = f"{self.record_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(self.to_dict(), f)
+            os.replace(temp_path, self.record_path)
+        except OSError as e:
+            print(f"Could not save the status of background job {self.key} ({self.id}): {e}")
+
+
+_current = threading.local()
+
+
+def report_progress(message: str) -> None:
+    """Record a progress message on the job running in this thread, if any.
+
+    Args:
+        message: Human readable description of the current step
+    """
+    job = getattr(_current, "job", None)
+    if job is not None:
+        job.progress = message
+        job.save()
+
+
+class JobRunner:
+    """Runs background jobs one at a time on a single worker thread.
+
+    Submitting a key that is already queued returns the queued job instead of adding a duplicate. Submitting a key
+    that is currently running queues one follow-up run, so anything changed mid-run is still picked up.
+
+    With a lock_path, runners in different processes also take turns, each job waiting for the lock before it runs.
+    With a records_path, every job is also written there as JSON, so any of the processes can report on it.
+    """
+
+    def __init__(self, max_history: int = 100, lock_path: str | None = None, records_path: str | None = None):
+        """
+        Args:
+            max_history: How many finished jobs to keep around for status lookups
+            lock_path: Optional lock file shared with the runners of other processes
+            records_path: Optional directory of job records shared with the runners of other processes
+        """
+        self.max_history = max_history
+        self.lock_path = lock_path
+        self.records_path = records_path
+        if records_path:
+            os.makedirs(records_path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._queue: deque[Job] = deque()
+        self._queued_by_key: dict[str, Job] = {}
+        self._thread = None
+
+    def submit(self, key: str, func: Callable[[], None]) -> Job:
+        """Queue a job unless one with the same key is already waiting.
+
+        Args:
+            key: Identifies duplicate requests, e.g. "poll"
+            func: The function to run
+
+        Returns:
+            Job: The newly queued job, or the already queued job it was coalesced into
+        """
+        with self._lock:
+            queued = self._queued_by_key.get(key)
+            if queued is not None:
+                return queued
+
+            job = Job(key, func, self.records_path)
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._queued_by_key[key] = job
+            self._trim_history()
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run_forever, name="hoarderpod-jobs", daemon=True)
+                self._thread.start()
+            self._wakeup.notify()
+
+        job.save()
+        self._prune_records()
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        """Get a job by id.
+
+        Args:
+            job_id: The job id returned by submit
+
+        Returns:
+            Job | None: The job, or None if it is unknown or has aged out of the history
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def get_status(self, job_id: str) -> dict | None:
+        """Get a job as a dict, whether it was submitted to this runner or to one in another process.
+
+        Args:
+            job_id: The job id returned by submit
+
+        Returns:
+            dict | None: The job's to_dict, or None if it is unknown or has aged out of the history
+        """
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.records_path is None:
+            return None
+        try:
+            # Only ids submit could have made, so a lookup can't read outside records_path
+            record_path = os.path.join(self.records_path, f"{uuid.UUID(job_id)}.json")
+            with open(record_path) as f:
+                return json.load(f)
+        except (ValueError, OSError):
+            return None
+
+    def _trim_history(self) -> None:
+        """Forget the oldest finished jobs beyond max_history. Must be called with the lock held."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[: max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def _prune_records(self) -> None:
+        """Delete all but the max_history most recently updated job records, whichever process wrote them."""
+        if self.records_path is None:
+            return
+        records = []
+        for entry in os.scandir(self.records_path):
+            if entry.name.endswith(".json"):
+                # Another runner may have deleted it since the listing
+                with contextlib.suppress(FileNotFoundError):
+                    records.append((entry.stat().st_mtime, entry.path))
+        for _, path in sorted(records, reverse=True)[self.max_history :]:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+    def _run_forever(self) -> None:
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._wakeup.wait()
+                job = self._queue.popleft()
+                del self._queued_by_key[job.key]
+                job.status = JobStatus.RUNNING
+                job.started_at = datetime.now(timezone.utc)
+
+            job.save()
+            self._run(job)
+
+    def _run(self, job: Job) -> None:
+        _current.job = job
+        lock = FileLock(self.lock_path) if self.lock_path else None
+        try:
+            if lock is not None and not lock.acquire():
+                report_progress("Waiting for a job in another process to finish")
+                lock.acquire(blocking=True)
+            job.func()
+            job.status = JobStatus.SUCCEEDED
+        except Exception as e:
+            print(f"Background job {job.key} ({job.id}) failed: {e}")
+            job.error = str(e)
+            job.status = JobStatus.FAILED
+        finally:
+            if lock is not None:
+                lock.release()
+            _current.job = None
+            job.finished_at = datetime.now(timezone.utc)
+            job.save()
@@ -0,0 +1,169 @@
+"""
+Locks shared between processes
+
+Several web worker processes can serve the same database, see serve. A FileLock makes sure only one of them runs a
+background job at a time, and a Leader makes sure only one of them runs the poll scheduler. A SharedLock guards the
+short steps that talk to TTS, in web workers and the pipeline worker alike. All of them lock a file under LOCK_PATH
+with flock, so the operating system releases the lock when its process exits, however it exits.
+
+flock isn't available on Windows, where only one web worker is supported and every lock is granted.
+"""
+
+import os
+import threading
+from collections.abc import Callable
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class FileLock:
+    """An exclusive lock on a file, held until it's released or the process exits.
+
+    Locks are taken on separately opened files, so two FileLocks on the same path exclude each other within a process
+    as well as between processes.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: The lock file, created along with its directory if it doesn't exist
+        """
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self) -> bool:
+        """Whether this FileLock holds the lock."""
+        return self._file is not None
+
+    def acquire(self, blocking: bool = False) -> bool:
+        """Take the lock.
+
+        Args:
+            blocking: Whether to wait for another holder to release it
+
+        Returns:
+            bool: Whether the lock was taken
+        """
+        if self._file is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        f = open(self.path, "a+")
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                return False
+        # The holder's pid, for whoever wonders which process has it
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+        return True
+
+    def release(self) -> None:
+        """Release the lock if it's held."""
+        if self._file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire(blocking=True)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class SharedLock:
+    """A blocking lock that excludes the threads of this process as well as other processes.
+
+    Threads sharing one FileLock don't exclude each other, so they take turns on a threading.Lock before the file.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: The lock file, created along with its directory if it doesn't exist
+        """
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._file_lock = FileLock(path)
+
+    def __enter__(self) -> "SharedLock":
+        self._thread_lock.acquire()
+        try:
+            self._file_lock.acquire(blocking=True)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._file_lock.release()
+        self._thread_lock.release()
+
+
+class Leader:
+    """Starts something in only the one process that holds a lock.
+
+    Processes that don't get the lock try again every retry_seconds, so when the leader exits another one takes over.
+    """
+
+    def __init__(self, path: str, start: Callable[[], object], retry_seconds: float):
+        """
+        Args:
+            path: The lock file
+            start: Called once this process holds the lock, what it returns is kept in started
+            retry_seconds: How often a follower tries to take over
+        """
+        self.lock = FileLock(path)
+        self.start = start
+        self.retry_seconds = retry_seconds
+        self.started = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_leader(self) -> bool:
+        """Whether this process holds the lock."""
+        return self.lock.held
+
+    def run(self) -> "Leader":
+        """Take the lock and start, or keep trying in the background if another process holds it.
+
+        Returns:
+            Leader: This leader
+        """
+        if not self._try_lead():
+            print(f"Another process holds {self.lock.path}, retrying every {self.retry_seconds} seconds")
+            self._thread = threading.Thread(target=self._follow, name="hoarderpod-leader", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop trying to take over and give up the lock, leaving whatever was started to the caller."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.lock.release()
+
+    def _try_lead(self) -> bool:
+        if not self.lock.acquire():
+            return False
+        print(f"Process {os.getpid()} took {self.lock.path}")
+        self.started = self.start()
+        return True
+
+    def _follow(self) -> None:
+        while not self._stop.wait(self.retry_seconds):
+            if self._try_lead():
+                return
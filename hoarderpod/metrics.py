@@ -0,0 +1,242 @@
+"""
+Metrics exported in the Prometheus text format
+"""
+
+import bisect
+import os
+import threading
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """A histogram of observed values, one series per label combination."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [bucket counts..., sum, count]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """Record one observation.
+
+        Args:
+            value: The observed value, in seconds for timings
+            **labels: A value for each of the histogram's labelnames
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Time the body of a with block, recording it even if it raises.
+
+        Args:
+            **labels: A value for each of the histogram's labelnames
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        """Render the histogram's series as Prometheus text format lines."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+
+        for key, values in sorted(series.items()):
+            labels = dict(zip(self.labelnames, key, strict=True))
+            cumulative = 0
+            for bound, count in zip(self.buckets, values, strict=False):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {values[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {values[-1]}")
+        return lines
+
+
+class Gauge:
+    """A gauge whose value is read from a callback when metrics are scraped.
+
+    The callback returns a number, or a dict mapping label value tuples to numbers for labelled gauges.
+    """
+
+    def __init__(self, name: str, documentation: str, func: Callable, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        self.labelnames = labelnames
+
+    def render(self) -> list[str]:
+        """Render the gauge as Prometheus text format lines, skipping it if the callback fails."""
+        try:
+            value = self.func()
+        except Exception as e:
+            print(f"Error collecting metric {self.name}: {e}")
+            return []
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        if isinstance(value, dict):
+            for key, sample in sorted(value.items()):
+                labels = dict(zip(self.labelnames, key, strict=True))
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(sample)}")
+        else:
+            lines.append(f"{self.name} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    """The set of metrics rendered on a scrape."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Register a metric, replacing any earlier metric with the same name.
+
+        Args:
+            metric: A Histogram or Gauge
+
+        Returns:
+            The registered metric
+        """
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Render every registered metric in the Prometheus text format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.register(
+    Histogram("hoarderpod_stage_seconds", "Time spent in each polling stage", labelnames=("stage",))
+)
+http_client_seconds = registry.register(
+    Histogram(
+        "hoarderpod_http_client_seconds",
+        "Latency of outgoing HTTP requests by host",
+        labelnames=("host", "method", "status"),
+    )
+)
+render_seconds = registry.register(
+    Histogram("hoarderpod_render_seconds", "Time to render feed and index pages", labelnames=("view",))
+)
+
+
+def directory_size(path: str) -> int:
+    """Get the total size of the files directly inside a directory.
+
+    Args:
+        path: The directory
+
+    Returns:
+        int: The total size in bytes, 0 if the directory doesn't exist
+    """
+    if not os.path.isdir(path):
+        return 0
+    with os.scandir(path) as entries:
+        return sum(entry.stat().st_size for entry in entries if entry.is_file())
+
+
+def instrument_requests() -> None:
+    """Time every request made through the requests library, labelled by host.
+
+    This wraps requests.Session.send, which the module level helpers (requests.get etc.) and newspaper's downloader
+    all go through. Calling it more than once is a no-op.
+    """
+    import requests
+
+    original_send = requests.Session.send
+    if getattr(original_send, "_hoarderpod_instrumented", False):
+        return
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = original_send(self, request, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            http_client_seconds.observe(
+                time.perf_counter() - start,
+                host=urlparse(request.url).hostname or "",
+                method=request.method,
+                status=status,
+            )
+
+    send._hoarderpod_instrumented = True
+    requests.Session.send = send
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int) -> ThreadingHTTPServer:
+    """Serve /metrics on a background thread, for processes that don't run the API.
+
+    Args:
+        port: The port to listen on
+
+    Returns:
+        ThreadingHTTPServer: The running server
+    """
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
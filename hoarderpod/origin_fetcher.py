@@ -0,0 +1,207 @@
+"""
+Polite, cached fetching of article pages from their origin sites
+
+Bookmarks Hoarder has no html for are downloaded from the article's own site. Those fetches run here instead of in
+newspaper, with at most ORIGIN_MAX_PER_HOST requests in flight per host, ORIGIN_MIN_INTERVAL_SECONDS between requests
+to the same host, a hard ORIGIN_TIMEOUT_SECONDS for the whole download and an ORIGIN_MAX_MB size limit. Pages are kept
+in an on-disk cache with their ETag and Last-Modified, so fetching a page again, e.g. when its bookmark is retried,
+sends a conditional request.
+"""
+
+import codecs
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+
+from hoarderpod.config import Config
+from hoarderpod.metrics import stage_seconds
+
+
+class OriginFetchError(Exception):
+    """Raised when a page is too slow or too big to fetch."""
+
+
+class _Host:
+    def __init__(self, max_concurrency: int):
+        self.slots = threading.Semaphore(max_concurrency)
+        self.lock = threading.Lock()
+        self.next_request_at = 0.0
+
+
+class OriginFetcher:
+    """Fetches pages from origin sites with per-host limits and an HTTP cache."""
+
+    def __init__(self, cache_path: str | None = None):
+        self.cache_path = cache_path or Config.ORIGIN_CACHE_PATH
+        self._lock = threading.Lock()
+        self._hosts: dict[str, _Host] = {}
+        self._executor = None
+        self._prefetches: dict[str, Future] = {}
+
+    def _cache_files(self, url: str) -> tuple[str, str]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_path, f"{key}.html"), os.path.join(self.cache_path, f"{key}.json")
+
+    def _read_cache(self, url: str) -> tuple[dict | None, str | None]:
+        body_path, meta_path = self._cache_files(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, encoding=meta.get("encoding") or "utf-8", errors="replace") as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def _write_cache(self, url: str, body: bytes, meta: dict) -> None:
+        os.makedirs(self.cache_path, exist_ok=True)
+        body_path, meta_path = self._cache_files(url)
+        for path, data in ((body_path, body), (meta_path, json.dumps(meta).encode("utf-8"))):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        self._prune_cache()
+
+    def _prune_cache(self) -> None:
+        """Delete the least recently written pages while the cache is over ORIGIN_CACHE_MAX_MB."""
+        budget = Config.ORIGIN_CACHE_MAX_MB * 1024 * 1024
+        with os.scandir(self.cache_path) as entries:
+            files = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries if entry.is_file()]
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= budget:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _host(self, url: str) -> _Host:
+        netloc = urlparse(url).netloc.lower()
+        with self._lock:
+            host = self._hosts.get(netloc)
+            if host is None:
+                host = self._hosts[netloc] = _Host(Config.ORIGIN_MAX_PER_HOST)
+            return host
+
+    def _download(self, url: str, headers: dict) -> tuple[requests.Response, bytes | None]:
+        timeout = Config.ORIGIN_TIMEOUT_SECONDS
+        max_bytes = Config.ORIGIN_MAX_MB * 1024 * 1024
+        deadline = time.monotonic() + timeout
+        with requests.get(url, headers=headers, timeout=timeout, stream=True, allow_redirects=True) as response:
+            if response.status_code != 200:
+                return response, None
+            if int(response.headers.get("Content-Length") or 0) > max_bytes:
+                raise OriginFetchError(f"{url} is over {Config.ORIGIN_MAX_MB} MB")
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise OriginFetchError(f"{url} is over {Config.ORIGIN_MAX_MB} MB")
+                if time.monotonic() > deadline:
+                    raise OriginFetchError(f"{url} took longer than {timeout} seconds")
+                chunks.append(chunk)
+            return response, b"".join(chunks)
+
+    def _fetch(self, url: str) -> str | None:
+        meta, cached = self._read_cache(url)
+        headers = {"User-Agent": Config.ORIGIN_USER_AGENT}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        host = self._host(url)
+        with host.slots:
+            with host.lock:
+                now = time.monotonic()
+                wait = host.next_request_at - now
+                host.next_request_at = max(now, host.next_request_at) + Config.ORIGIN_MIN_INTERVAL_SECONDS
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                with stage_seconds.time(stage="origin_fetch"):
+                    response, body = self._download(url, headers)
+            except (requests.RequestException, OriginFetchError) as e:
+                print(f"Error fetching {url}: {e}")
+                return None
+
+        if body is None:
+            if response.status_code == 304 and cached is not None:
+                return cached
+            print(f"Error fetching {url}: HTTP {response.status_code}")
+            return None
+
+        # requests assumes ISO-8859-1 for html without a charset, most pages without one are utf-8
+        encoding = "utf-8"
+        if "charset" in response.headers.get("Content-Type", "").lower() and response.encoding:
+            try:
+                encoding = codecs.lookup(response.encoding).name
+            except LookupError:
+                pass
+        self._write_cache(
+            url,
+            body,
+            {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "encoding": encoding,
+            },
+        )
+        return body.decode(encoding, errors="replace")
+
+    def prefetch(self, url: str) -> Future:
+        """Start fetching a page in the background, so a later fetch of it doesn't wait.
+
+        Args:
+            url: The page to fetch
+
+        Returns:
+            Future: Resolves to the page's html, or None if it couldn't be fetched
+        """
+        with self._lock:
+            future = self._prefetches.get(url)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=Config.ORIGIN_FETCH_CONCURRENCY, thread_name_prefix="origin-fetch"
+                    )
+                future = self._prefetches[url] = self._executor.submit(self._fetch, url)
+            return future
+
+    def fetch(self, url: str) -> str | None:
+        """Fetch a page, or pick up its prefetch.
+
+        Args:
+            url: The page to fetch
+
+        Returns:
+            str | None: The page's html, None if it couldn't be fetched
+        """
+        with self._lock:
+            future = self._prefetches.pop(url, None)
+        if future is not None:
+            return future.result()
+        return self._fetch(url)
+
+    def discard(self, url: str) -> None:
+        """Forget a prefetch that won't be used, its page stays in the cache.
+
+        Args:
+            url: The prefetched page
+        """
+        with self._lock:
+            self._prefetches.pop(url, None)
+
+
+origin_fetcher = OriginFetcher()
@@ -0,0 +1,257 @@
+"""
+Worker pipeline that runs each polling stage on its own schedule
+
+main_poll_loop runs every stage back to back, so one slow Hoarder page or archive.ph request delays everything
+behind it. Here each stage runs in its own threads and the stages are connected by bounded queues:
+
+    hoarder sync -> archive resolution -> extraction
+    tts completion/download (own interval)
+    tts submission (own interval)
+
+A full queue blocks the stage feeding it, which is what throttles Hoarder paging when extraction falls behind.
+"""
+
+import queue
+import threading
+from collections.abc import Callable
+
+from hoarderpod import run
+from hoarderpod.circuit_breaker import hoarder_breaker
+from hoarderpod.config import Config
+from hoarderpod.episodes import init_db
+from hoarderpod.metrics import instrument_requests, serve_metrics, stage_seconds
+
+
+class PeriodicStage:
+    """A stage that runs a function every interval_seconds."""
+
+    def __init__(self, name: str, func: Callable[[], None], interval_seconds: float):
+        self.name = name
+        self.func = func
+        self.interval_seconds = interval_seconds
+
+    def start(self, stop_event: threading.Event) -> list[threading.Thread]:
+        """Start the stage's thread.
+
+        Args:
+            stop_event: Set to stop the stage after its current run
+
+        Returns:
+            list[threading.Thread]: The started thread
+        """
+        thread = threading.Thread(target=self._loop, args=(stop_event,), name=f"stage-{self.name}", daemon=True)
+        thread.start()
+        return [thread]
+
+    def _loop(self, stop_event: threading.Event) -> None:
+        while not stop_event.is_set():
+            try:
+                self.func()
+            except Exception as e:
+                print(f"Stage {self.name} failed: {e}")
+            stop_event.wait(self.interval_seconds)
+
+
+class QueueStage:
+    """A stage that handles items from a bounded inbox with a fixed number of worker threads."""
+
+    def __init__(self, name: str, handler: Callable[[dict], None], concurrency: int, max_queue_size: int):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.inbox = queue.Queue(maxsize=max_queue_size)
+
+    def put(self, item: dict, stop_event: threading.Event) -> bool:
+        """Add an item to the inbox, blocking while it is full.
+
+        Args:
+            item: The item to handle
+            stop_event: Stops waiting for room when set
+
+        Returns:
+            bool: True if the item was queued, False if the pipeline is stopping
+        """
+        while not stop_event.is_set():
+            try:
+                self.inbox.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def start(self, stop_event: threading.Event) -> list[threading.Thread]:
+        """Start the stage's worker threads.
+
+        Args:
+            stop_event: Set to stop the workers once they finish their current item
+
+        Returns:
+            list[threading.Thread]: The started threads
+        """
+        threads = []
+        for i in range(self.concurrency):
+            thread = threading.Thread(
+                target=self._loop, args=(stop_event,), name=f"stage-{self.name}-{i}", daemon=True
+            )
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def _loop(self, stop_event: threading.Event) -> None:
+        while not stop_event.is_set():
+            try:
+                item = self.inbox.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                self.handler(item)
+            except Exception as e:
+                print(f"Stage {self.name} failed on {item.get('id')}: {e}")
+            finally:
+                self.inbox.task_done()
+
+
+class Pipeline:
+    """The polling stages wired together as independently scheduled workers."""
+
+    def __init__(self):
+        self.stop_event = threading.Event()
+        # Bookmarks queued or being worked on, so the next sync doesn't queue them again
+        self._in_flight = set()
+        self._in_flight_lock = threading.Lock()
+
+        self.extract = QueueStage(
+            "extract", self.extract_bookmark, Config.PIPELINE_EXTRACT_CONCURRENCY, Config.PIPELINE_QUEUE_SIZE
+        )
+        self.archive = QueueStage(
+            "archive", self.resolve_archive, Config.PIPELINE_ARCHIVE_CONCURRENCY, Config.PIPELINE_QUEUE_SIZE
+        )
+        self.stages = [
+            PeriodicStage("hoarder-sync", self.sync_hoarder, Config.PIPELINE_SYNC_INTERVAL_SECONDS),
+            self.archive,
+            self.extract,
+            PeriodicStage("tts-download", self.download_tts, Config.PIPELINE_DOWNLOAD_INTERVAL_SECONDS),
+            PeriodicStage("tts-submit", self.submit_tts, Config.PIPELINE_SUBMIT_INTERVAL_SECONDS),
+        ]
+        if Config.TTS_RECONCILE_MODE != "full" and Config.TTS_CLEANUP_INTERVAL_MINUTES:
+            self.stages.append(
+                PeriodicStage("tts-cleanup", self.cleanup_tts, Config.TTS_CLEANUP_INTERVAL_MINUTES * 60)
+            )
+        if Config.AUDIO_STORAGE_INTERVAL_MINUTES:
+            self.stages.append(
+                PeriodicStage("audio-storage", run.audio_storage.run, Config.AUDIO_STORAGE_INTERVAL_MINUTES * 60)
+            )
+
+    def _claim(self, bookmark_id: str) -> bool:
+        with self._in_flight_lock:
+            if bookmark_id in self._in_flight:
+                return False
+            self._in_flight.add(bookmark_id)
+            return True
+
+    def _release(self, bookmark_id: str) -> None:
+        with self._in_flight_lock:
+            self._in_flight.discard(bookmark_id)
+
+    def sync_hoarder(self) -> None:
+        """Page new bookmarks from hoarder onto the archive or extraction queue."""
+        if not hoarder_breaker.available():
+            print("Hoarder is unavailable, skipping sync")
+            return
+        known_ids = run.episode_ops.get_episode_ids()
+        blocked_ids = run.episode_ops.get_blocked_ids("extract")
+        cutoff_date = run.get_poll_cutoff_date(Config.EPISODES_CUTOFF_DATE)
+
+        with stage_seconds.time(stage="hoarder_sync"):
+            for bookmark in run.list_new_bookmarks(known_ids, cutoff_date, Config.EPISODES_PULL_MAX):
+                if bookmark["id"] in known_ids or bookmark["id"] in blocked_ids or not run.is_bookmark_ready(bookmark):
+                    continue
+                if not self._claim(bookmark["id"]):
+                    continue
+                run.episode_ops.record_event(bookmark["id"], "seen")
+
+                if run.needs_archive_snapshot(bookmark):
+                    queued = self.archive.put(bookmark, self.stop_event)
+                else:
+                    queued = self._queue_extract(bookmark)
+                if not queued:
+                    self._release(bookmark["id"])
+                    return
+
+    def _queue_extract(self, bookmark: dict) -> bool:
+        # The extraction queue is the prefetch lookahead, assets download while earlier bookmarks are parsed
+        run.asset_prefetcher.prefetch(bookmark)
+        if self.extract.put(bookmark, self.stop_event):
+            return True
+        run.asset_prefetcher.release(bookmark["id"])
+        return False
+
+    def resolve_archive(self, bookmark: dict) -> None:
+        """Swap in the archive.ph snapshot url and pass the bookmark on to extraction."""
+        try:
+            resolved = run.resolve_archive_snapshot(bookmark)
+        except Exception:
+            self._release(bookmark["id"])
+            raise
+
+        if not resolved or not self._queue_extract(bookmark):
+            self._release(bookmark["id"])
+
+    def extract_bookmark(self, bookmark: dict) -> None:
+        """Parse the bookmark's article and store it as an episode."""
+        try:
+            run.add_episode_from_bookmark(bookmark)
+        finally:
+            run.asset_prefetcher.release(bookmark["id"])
+            self._release(bookmark["id"])
+
+    def download_tts(self) -> None:
+        """Download finished TTS jobs."""
+        if run.tts_service.check_health():
+            run.tts_pending_and_completed_update()
+
+    def submit_tts(self) -> None:
+        """Top the TTS queue up with waiting episodes."""
+        if run.tts_service.check_health():
+            run.submit_waiting_episodes(run.get_ongoing_tts_jobs())
+
+    def cleanup_tts(self) -> None:
+        """Delete jobs on the TTS service that no episode is waiting on."""
+        if run.tts_service.check_health():
+            run.cleanup_unknown_tts_jobs()
+
+    def start(self) -> list[threading.Thread]:
+        """Start every stage.
+
+        Returns:
+            list[threading.Thread]: The threads running the stages
+        """
+        threads = []
+        for stage in self.stages:
+            threads.extend(stage.start(self.stop_event))
+        return threads
+
+    def stop(self) -> None:
+        """Ask every stage to stop after its current item or run."""
+        self.stop_event.set()
+
+
+def run_worker() -> None:
+    """Run the pipeline in the foreground until interrupted."""
+    init_db()
+    run.register_metrics()
+    instrument_requests()
+    if Config.WORKER_METRICS_PORT:
+        serve_metrics(Config.WORKER_METRICS_PORT)
+
+    pipeline = Pipeline()
+    threads = pipeline.start()
+    print(f"Worker pipeline started with {len(threads)} threads")
+    try:
+        while not pipeline.stop_event.wait(1):
+            pass
+    except KeyboardInterrupt:
+        print("Stopping worker pipeline")
+        pipeline.stop()
+        for thread in threads:
+            thread.join(timeout=30)
@@ -0,0 +1,106 @@
+"""
+Opt-in profiling of polls and a slow log for article parsing
+"""
+
+import cProfile
+import glob
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+from hoarderpod.config import Config
+
+# Only one profiler can be active in the interpreter at a time, nested or concurrent requests run unprofiled
+_profiler_lock = threading.Lock()
+_slow_log_lock = threading.Lock()
+
+
+def profiling_enabled(name: str) -> bool:
+    """Check if profiling is turned on for a call site.
+
+    Args:
+        name: The profiled function, e.g. "main_poll_loop", "get_episode_dict" or "gen_feed"
+
+    Returns:
+        bool: True if PROFILE_POLL covers it or it is listed in PROFILE_CALLS
+    """
+    if name == "main_poll_loop":
+        return Config.PROFILE_POLL
+    return name in Config.PROFILE_CALLS
+
+
+def prune_profiles(directory: str, name: str, keep: int) -> None:
+    """Delete the oldest profiles for a call site beyond the newest keep.
+
+    Args:
+        directory: The profile directory
+        name: The profiled function
+        keep: How many profiles to keep
+    """
+    profiles = sorted(glob.glob(os.path.join(directory, f"{name}-*.prof")))
+    for path in profiles[: max(0, len(profiles) - keep)]:
+        os.remove(path)
+
+
+@contextmanager
+def profiled(name: str):
+    """Profile the body of a with block into PROFILE_DIR when profiling is enabled for name.
+
+    Profiles are written as name-<timestamp>.prof, readable with pstats or snakeviz, and only the newest
+    PROFILE_RETENTION files per name are kept.
+
+    Args:
+        name: The profiled function
+    """
+    if not profiling_enabled(name) or not _profiler_lock.acquire(blocking=False):
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+            timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+            profiler.dump_stats(os.path.join(Config.PROFILE_DIR, f"{name}-{timestamp}.prof"))
+            prune_profiles(Config.PROFILE_DIR, name, Config.PROFILE_RETENTION)
+    finally:
+        _profiler_lock.release()
+
+
+def log_slow_parse(
+    bookmark_id: str, url: str, html_bytes: int, extractor: str, parse_seconds: float, text_chars: int
+) -> None:
+    """Append a bookmark's parse stats to the slow log if it took longer than SLOW_PARSE_SECONDS.
+
+    Args:
+        bookmark_id: The bookmark id
+        url: The article url
+        html_bytes: Size of the HTML that was parsed, 0 if newspaper downloaded it
+        extractor: Which extractor's text was used
+        parse_seconds: Time spent fetching and parsing
+        text_chars: Length of the extracted text
+    """
+    if not Config.SLOW_PARSE_LOG or parse_seconds < Config.SLOW_PARSE_SECONDS:
+        return
+
+    record = {
+        "logged_at": datetime.now(timezone.utc).isoformat(),
+        "bookmark_id": bookmark_id,
+        "domain": urlparse(url).netloc,
+        "url": url,
+        "html_bytes": html_bytes,
+        "extractor": extractor,
+        "parse_seconds": round(parse_seconds, 3),
+        "text_chars": text_chars,
+    }
+    with _slow_log_lock:
+        with open(Config.SLOW_PARSE_LOG, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
@@ -0,0 +1,213 @@
+"""
+Re-extraction of stored episodes after article_parse improves
+
+Every episode records the EXTRACTOR_VERSION its text was extracted with. After a change to article_parse, bump
+EXTRACTOR_VERSION and run
+
+    python -m hoarderpod.reextract
+
+to extract every older episode again. Bookmarks are fetched from hoarder a batch at a time and parsed across a pool
+of REEXTRACT_WORKERS processes, since parsing is CPU bound. Pages come from the bookmark's inline html, its asset, or
+the origin cache, using the url stored with the episode so archive.ph snapshots are read again rather than the
+origin. An episode whose new text has the same hash as the stored one only has its version updated. One whose
+text changed has its audio cleared, so TTS is queued for it again.
+
+Progress is checkpointed to REEXTRACT_CHECKPOINT_PATH after every batch, so an interrupted run resumes after the last
+finished batch instead of starting over. Episodes that failed keep their old text and version, and are only tried
+again by a run with --restart.
+"""
+
+import json
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+from hoarderpod.article_parse import EXTRACTOR_VERSION, get_episode_dict
+from hoarderpod.config import Config
+from hoarderpod.episodes import EpisodeOps
+from hoarderpod.hoarder_service import HoarderService
+
+
+def extract(bookmark: dict) -> dict:
+    """Extract a bookmark's episode dict, in a worker process.
+
+    Args:
+        bookmark: The bookmark from hoarder
+
+    Returns:
+        dict: The episode dict from get_episode_dict
+    """
+    return get_episode_dict(bookmark)
+
+
+def _new_checkpoint(version: int) -> dict:
+    return {"version": version, "after": None, "changed": 0, "unchanged": 0, "failed": []}
+
+
+def load_checkpoint(path: str, version: int) -> dict:
+    """Load the checkpoint of an earlier run for the same extractor version.
+
+    Args:
+        path: The checkpoint file
+        version: The extractor version being re-extracted to
+
+    Returns:
+        dict: The version, last episode id done, counts and failed ids, a fresh checkpoint if there's none to resume
+    """
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        checkpoint = None
+    if checkpoint is None or checkpoint.get("version") != version:
+        return _new_checkpoint(version)
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    """Save the checkpoint, replacing the old one in one step so a crash can't leave half a file.
+
+    Args:
+        path: The checkpoint file
+        checkpoint: The checkpoint
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _extract_batch(
+    episode_ids: list[str], urls: dict[str, str | None], hoarder_service: HoarderService, executor: Executor | None
+) -> dict[str, dict | Exception]:
+    """Fetch a batch of bookmarks and extract them, parsing earlier ones while later ones are fetched.
+
+    Bookmarks are extracted from the url stored with their episode. For ARCHIVE_PH_DOMAINS that's the archive.ph
+    snapshot ingest resolved, where hoarder still has the paywalled origin.
+
+    Errors fetching from hoarder are raised, so an outage stops the run before its batch is checkpointed.
+    """
+    results = {}
+    futures = {}
+    for episode_id in episode_ids:
+        bookmark = hoarder_service.get_bookmark(episode_id)
+        if bookmark is not None and urls.get(episode_id):
+            bookmark["content"]["url"] = urls[episode_id]
+        if bookmark is None:
+            results[episode_id] = LookupError("The bookmark was deleted from hoarder")
+        elif executor is None:
+            try:
+                results[episode_id] = extract(bookmark)
+            except Exception as e:
+                results[episode_id] = e
+        else:
+            futures[episode_id] = executor.submit(extract, bookmark)
+
+    for episode_id, future in futures.items():
+        try:
+            results[episode_id] = future.result()
+        except Exception as e:
+            results[episode_id] = e
+    return results
+
+
+def reextract(
+    version: int = EXTRACTOR_VERSION,
+    workers: int | None = None,
+    batch_size: int | None = None,
+    limit: int | None = None,
+    checkpoint_path: str | None = None,
+    restart: bool = False,
+    episode_ops: EpisodeOps | None = None,
+    hoarder_service: HoarderService | None = None,
+) -> dict:
+    """Extract the episodes from older extractor versions again.
+
+    Args:
+        version: The extractor version to bring episodes up to
+        workers: Optional number of parsing processes, 0 parses in this process, defaults to REEXTRACT_WORKERS
+        batch_size: Optional episodes per checkpoint, defaults to REEXTRACT_BATCH_SIZE
+        limit: Optional maximum number of episodes to look at in this run
+        checkpoint_path: Optional checkpoint file, defaults to REEXTRACT_CHECKPOINT_PATH
+        restart: Whether to ignore the checkpoint and try earlier failures again
+        episode_ops: Optional EpisodeOps to use
+        hoarder_service: Optional HoarderService to fetch bookmarks with
+
+    Returns:
+        dict: The checkpoint, with how many episodes changed, were unchanged and failed
+    """
+    workers = Config.REEXTRACT_WORKERS if workers is None else workers
+    batch_size = batch_size or Config.REEXTRACT_BATCH_SIZE
+    checkpoint_path = checkpoint_path or Config.REEXTRACT_CHECKPOINT_PATH
+    episode_ops = episode_ops or EpisodeOps()
+    hoarder_service = hoarder_service or HoarderService()
+
+    checkpoint = _new_checkpoint(version) if restart else load_checkpoint(checkpoint_path, version)
+    if checkpoint["after"] is not None:
+        print(f"Resuming after {checkpoint['after']}")
+    print(f"{episode_ops.count_stale_episodes(version)} episodes are older than extractor version {version}")
+
+    executor = None
+    if workers > 0:
+        # Workers are spawned rather than forked, forking a process that has threads running can deadlock the child
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    seen = 0
+    try:
+        while limit is None or seen < limit:
+            size = batch_size if limit is None else min(batch_size, limit - seen)
+            episode_ids = episode_ops.get_stale_episode_ids(version, after=checkpoint["after"], limit=size)
+            if not episode_ids:
+                break
+
+            urls = episode_ops.get_episode_urls(episode_ids)
+            results = _extract_batch(episode_ids, urls, hoarder_service, executor)
+            for episode_id in episode_ids:
+                result = results[episode_id]
+                if not isinstance(result, Exception) and result["text"] is None:
+                    result = ValueError("No text could be extracted")
+                if isinstance(result, Exception):
+                    print(f"Re-extracting {episode_id} failed, keeping its old text: {result!r}")
+                    checkpoint["failed"].append(episode_id)
+                    continue
+
+                changed = episode_ops.update_extraction(episode_id, version, result)
+                if changed:
+                    episode_ops.record_event(episode_id, "parsed", len(result["text"]))
+                    checkpoint["changed"] += 1
+                elif changed is False:
+                    checkpoint["unchanged"] += 1
+
+            checkpoint["after"] = episode_ids[-1]
+            save_checkpoint(checkpoint_path, checkpoint)
+            seen += len(episode_ids)
+            print(
+                f"Re-extracted {seen} episodes: {checkpoint['changed']} changed, {checkpoint['unchanged']} unchanged, "
+                f"{len(checkpoint['failed'])} failed"
+            )
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return checkpoint
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from hoarderpod.episodes import init_db
+
+    parser = argparse.ArgumentParser(description="Extract episodes from older extractor versions again")
+    parser.add_argument("-w", "--workers", type=int, help="Parsing processes, 0 parses in the main process")
+    parser.add_argument("-b", "--batch-size", type=int, help="Episodes between checkpoints")
+    parser.add_argument("-n", "--limit", type=int, help="Maximum number of episodes to look at")
+    parser.add_argument("--checkpoint", help="Checkpoint file to resume from")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and retry earlier failures")
+    args = parser.parse_args()
+
+    init_db()
+    reextract(
+        workers=args.workers,
+        batch_size=args.batch_size,
+        limit=args.limit,
+        checkpoint_path=args.checkpoint,
+        restart=args.restart,
+    )
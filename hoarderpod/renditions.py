@@ -0,0 +1,214 @@
+"""
+Lower bitrate renditions of episode audio, encoded with ffmpeg
+
+FlaskTTS produces a full bitrate mp3, which is more than speech needs. Renditions are encoded next to the original as
+<job_id>.<rendition>.<ext>, in a worker pool after each download and lazily when a rendition is first requested.
+"""
+
+import os
+import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from hoarderpod.config import Config
+from hoarderpod.metrics import stage_seconds
+
+
+class Rendition:
+    """An ffmpeg encoding of the original audio."""
+
+    def __init__(self, name: str, extension: str, ffmpeg_format: str, mimetype: str, codec_args: list[str]):
+        self.name = name
+        self.extension = extension
+        self.ffmpeg_format = ffmpeg_format
+        self.mimetype = mimetype
+        self.codec_args = codec_args
+
+
+RENDITIONS = {
+    rendition.name: rendition
+    for rendition in (
+        Rendition("mp3-64k", "mp3", "mp3", "audio/mpeg", ["-codec:a", "libmp3lame", "-b:a", "64k"]),
+        Rendition("mp3-32k", "mp3", "mp3", "audio/mpeg", ["-codec:a", "libmp3lame", "-b:a", "32k", "-ar", "22050"]),
+        Rendition(
+            "opus-32k", "opus", "ogg", "audio/ogg", ["-codec:a", "libopus", "-b:a", "32k", "-application", "voip"]
+        ),
+        Rendition(
+            "opus-16k", "opus", "ogg", "audio/ogg", ["-codec:a", "libopus", "-b:a", "16k", "-application", "voip"]
+        ),
+    )
+}
+
+
+class RenditionError(Exception):
+    """Raised when a rendition can't be encoded."""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+# One lock per output file, so a download and a request for the same rendition don't both encode it
+_encode_locks = {}
+_encode_locks_lock = threading.Lock()
+
+
+def configured_renditions() -> dict[str, Rendition]:
+    """Get the renditions turned on with AUDIO_RENDITIONS.
+
+    Returns:
+        dict[str, Rendition]: Rendition name to rendition, unknown names are skipped
+    """
+    renditions = {}
+    for name in Config.AUDIO_RENDITIONS:
+        if name in RENDITIONS:
+            renditions[name] = RENDITIONS[name]
+        else:
+            print(f"Unknown audio rendition {name}, expected one of {', '.join(RENDITIONS)}")
+    return renditions
+
+
+def get_rendition(name: str | None) -> Rendition | None:
+    """Look up a configured rendition.
+
+    Args:
+        name: The rendition name, None for the original audio
+
+    Returns:
+        Rendition | None: The rendition, None for the original audio
+
+    Raises:
+        KeyError: If the rendition isn't configured
+    """
+    if not name:
+        return None
+    return configured_renditions()[name]
+
+
+def rendition_filename(mp3_filename: str, rendition: Rendition | None) -> str:
+    """Get the file name of a rendition of an episode's audio.
+
+    Args:
+        mp3_filename: The original mp3 file name, e.g. <job_id>.mp3
+        rendition: The rendition, None for the original
+
+    Returns:
+        str: The rendition's file name, e.g. <job_id>.opus-16k.opus
+    """
+    if rendition is None:
+        return mp3_filename
+    stem, _ = os.path.splitext(os.path.basename(mp3_filename))
+    return f"{stem}.{rendition.name}.{rendition.extension}"
+
+
+def parse_rendition_filename(filename: str) -> tuple[str, Rendition] | None:
+    """Work out which original and rendition a rendition file name is for.
+
+    Args:
+        filename: A file name as returned by rendition_filename
+
+    Returns:
+        tuple[str, Rendition] | None: The original mp3 file name and the rendition, None if it isn't a configured
+            rendition's file name
+    """
+    parts = os.path.basename(filename).split(".")
+    if len(parts) != 3:
+        return None
+    stem, name, extension = parts
+    rendition = configured_renditions().get(name)
+    if rendition is None or rendition.extension != extension:
+        return None
+    return f"{stem}.mp3", rendition
+
+
+def encode_rendition(source_path: str, output_path: str, rendition: Rendition) -> None:
+    """Encode a rendition with ffmpeg, writing to a temporary file so a partial encode is never served.
+
+    Args:
+        source_path: The original audio
+        output_path: Where to save the rendition
+        rendition: The rendition to encode
+
+    Raises:
+        RenditionError: If ffmpeg is missing, fails or times out
+    """
+    temp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    command = [
+        Config.FFMPEG_PATH, "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+        "-i", source_path, "-vn", "-ac", "1", *rendition.codec_args, "-f", rendition.ffmpeg_format, temp_path,
+    ]  # fmt: skip
+    try:
+        with stage_seconds.time(stage="rendition"):
+            subprocess.run(
+                command, check=True, capture_output=True, timeout=Config.AUDIO_RENDITION_TIMEOUT_SECONDS
+            )
+        os.replace(temp_path, output_path)
+    except FileNotFoundError as e:
+        raise RenditionError(f"ffmpeg not found at {Config.FFMPEG_PATH}") from e
+    except subprocess.CalledProcessError as e:
+        raise RenditionError(f"ffmpeg failed for {rendition.name}: {e.stderr.decode(errors='replace').strip()}") from e
+    except subprocess.TimeoutExpired as e:
+        raise RenditionError(f"ffmpeg timed out encoding {rendition.name}") from e
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def ensure_rendition(mp3_filename: str, rendition: Rendition) -> str:
+    """Get the path of a rendition, encoding it first if it isn't cached yet.
+
+    Args:
+        mp3_filename: The original mp3 file name in MP3_STORAGE_PATH
+        rendition: The rendition
+
+    Returns:
+        str: The rendition's path
+
+    Raises:
+        FileNotFoundError: If the original audio doesn't exist
+        RenditionError: If the rendition can't be encoded
+    """
+    source_path = os.path.join(Config.MP3_STORAGE_PATH, os.path.basename(mp3_filename))
+    output_path = os.path.join(Config.MP3_STORAGE_PATH, rendition_filename(mp3_filename, rendition))
+    if os.path.exists(output_path):
+        return output_path
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(source_path)
+
+    with _encode_locks_lock:
+        lock = _encode_locks.setdefault(output_path, threading.Lock())
+    try:
+        with lock:
+            if not os.path.exists(output_path):
+                encode_rendition(source_path, output_path, rendition)
+    finally:
+        with _encode_locks_lock:
+            _encode_locks.pop(output_path, None)
+    return output_path
+
+
+def _encode_in_background(mp3_filename: str, rendition: Rendition) -> None:
+    try:
+        ensure_rendition(mp3_filename, rendition)
+    except (OSError, RenditionError) as e:
+        print(f"Could not encode {rendition.name} for {mp3_filename}: {e}")
+
+
+def queue_renditions(mp3_filename: str) -> list[Future]:
+    """Encode every configured rendition of a freshly downloaded mp3 in the rendition worker pool.
+
+    Args:
+        mp3_filename: The original mp3 file name in MP3_STORAGE_PATH
+
+    Returns:
+        list[Future]: One future per rendition
+    """
+    global _executor
+    renditions = configured_renditions()
+    if not renditions:
+        return []
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=Config.AUDIO_RENDITION_WORKERS, thread_name_prefix="rendition"
+            )
+    return [_executor.submit(_encode_in_background, mp3_filename, rendition) for rendition in renditions.values()]
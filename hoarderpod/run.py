@@ -4,23 +4,78 @@ Main logic/glue for polling hoarder and generating podcast feed
 """
 
 import os
+from collections.abc import Iterable
 from datetime import datetime, timezone
 
-from feedgen.feed import FeedGenerator
+import requests
 
-from hoarderpod.article_parse import get_episode_dict
 from hoarderpod.config import Config
-from hoarderpod.episodes import Episode, EpisodeOps
+from hoarderpod.assets import AssetPrefetcher
+from hoarderpod.circuit_breaker import STATE_VALUES, CircuitOpenError, archive_ph_breaker, breakers, hoarder_breaker
+from hoarderpod.episodes import Episode, EpisodeOps, init_db
 from hoarderpod.hoarder_service import HoarderService
-from hoarderpod.archive_scraper import get_latest_snapshot, snapshot
-from hoarderpod.tts_service import TTSService
+from hoarderpod.jobs import report_progress
+from hoarderpod.locks import SharedLock
+from hoarderpod.metrics import Gauge, directory_size, registry, stage_seconds
+from hoarderpod.origin_fetcher import origin_fetcher
+from hoarderpod.profiling import profiled
+from hoarderpod.renditions import Rendition, queue_renditions, rendition_filename
+from hoarderpod.archive_scraper import MirrorPool, get_latest_snapshot, snapshot
+from hoarderpod.storage import AudioStorage
+from hoarderpod.tts_service import FAILED_STATUSES, TTSService
 from hoarderpod.utils import oxford_join, to_local_datetime, remove_www, sanitize_xml_string
 from urllib.parse import urlparse
 
-# Initialize services
+# Initialize services, these only read config so importing this module has no side effects.
+# The parsing stack (newspaper, markdownify, ftfy) and feedgen are imported where they're used, so the web process
+# doesn't load them until it first needs them.
 tts_service = TTSService()
 hoarder_service = HoarderService()
 episode_ops = EpisodeOps()
+audio_storage = AudioStorage()
+asset_prefetcher = AssetPrefetcher(hoarder_service=hoarder_service, origin_fetcher=origin_fetcher)
+archive_mirrors = MirrorPool(Config.ARCHIVE_PH_MIRRORS)
+
+# Serializes downloads between polls, the pipeline worker and TTS completion callbacks, in every process, so a job is
+# downloaded and deleted once
+tts_download_lock = SharedLock(os.path.join(Config.LOCK_PATH, "tts_download.lock"))
+# Held while a job is submitted and recorded, and while jobs are reconciled, in every process. Reconciling never sees a
+# job the TTS service knows about before the database does, and an episode is only submitted once
+tts_submit_lock = SharedLock(os.path.join(Config.LOCK_PATH, "tts_submit.lock"))
+
+
+def register_metrics() -> None:
+    """Register the gauges for the episode queue and audio storage."""
+    registry.register(
+        Gauge("hoarderpod_episodes_waiting_tts", "Episodes not yet submitted to TTS", episode_ops.count_episodes_to_tts)
+    )
+    registry.register(
+        Gauge(
+            "hoarderpod_tts_jobs_in_flight", "Episodes submitted to TTS without an mp3", episode_ops.count_tts_in_flight
+        )
+    )
+    registry.register(
+        Gauge(
+            "hoarderpod_dead_letters",
+            "Extractions and TTS jobs given up on after FAILURE_MAX_ATTEMPTS",
+            episode_ops.count_dead_letters,
+        )
+    )
+    registry.register(
+        Gauge(
+            "hoarderpod_circuit_state",
+            "Circuit breaker state of each external service, 0 closed, 1 half open, 2 open",
+            lambda: {(name,): STATE_VALUES[breaker.state] for name, breaker in breakers.items()},
+            labelnames=("service",),
+        )
+    )
+    registry.register(
+        Gauge(
+            "hoarderpod_audio_bytes",
+            "Disk used by downloaded audio",
+            lambda: directory_size(tts_service.mp3_storage_path),
+        )
+    )
 
 
 def episode_to_tts_text(episode: Episode, max_length: int | None = None) -> str:
@@ -35,16 +90,19 @@ def episode_to_tts_text(episode: Episode, max_length: int | None = None) -> str:
     return f"{episode.title}\n{by_line}\n\n{text}"
 
 
-def gen_feed(episodes: list[Episode], root_url: str) -> str:
+def gen_feed(episodes: list[Episode], root_url: str, rendition: Rendition | None = None) -> str:
     """Generate an RSS feed of the bookmarks.
 
     Args:
         episodes: The list of episodes to include in the feed
         root_url: The root URL of the Hoarder instance
+        rendition: Optional audio rendition to link to instead of the original mp3
 
     Returns:
         str: The path to the RSS feed
     """
+    from feedgen.feed import FeedGenerator
+
     fg = FeedGenerator()
     fg.id(sanitize_xml_string(Config.HOARDER_ROOT_URL))
     fg.title(sanitize_xml_string("Hoarder Articles"))
@@ -67,59 +125,157 @@ def gen_feed(episodes: list[Episode], root_url: str) -> str:
 
         authors_list = episode.authors if episode.authors else []
         fe.author({"name": sanitize_xml_string(oxford_join(authors_list))})
-        fe.enclosure(root_url + f"audio/{os.path.basename(episode.mp3)}", 0, "audio/mpeg")
+        audio_filename = rendition_filename(os.path.basename(episode.mp3), rendition)
+        fe.enclosure(root_url + f"audio/{audio_filename}", 0, rendition.mimetype if rendition else "audio/mpeg")
         fe.podcast.itunes_image(root_url + "cover.jpg")
 
     return fg.rss_str(pretty=True)
 
 
-def update_db_with_new_episodes(bookmarks: list[dict]) -> None:
-    """Update the SQL database with bookmarks from hoarder.
+def is_bookmark_ready(bookmark: dict) -> bool:
+    """Check that Hoarder has crawled a bookmark and it has a url.
 
     Args:
-        bookmarks: The list of bookmarks to update the database with
+        bookmark: The bookmark from hoarder
+
+    Returns:
+        bool: True if the bookmark can be turned into an episode
     """
+    return (
+        bookmark["content"]["crawledAt"] is not None
+        and "url" in bookmark["content"]
+        and bookmark["content"]["url"] is not None
+    )
 
-    known_ids = episode_ops.get_episode_ids()
 
-    for bookmark in bookmarks:
-        if (
-            bookmark["content"]["crawledAt"] is None
-            or "url" not in bookmark["content"]
-            or bookmark["content"]["url"] is None
-        ):
-            continue
+def needs_archive_snapshot(bookmark: dict) -> bool:
+    """Check if a bookmark's domain should be read from archive.ph instead of the origin.
 
-        if remove_www(urlparse(bookmark["content"]["url"]).netloc) in Config.ARCHIVE_PH_DOMAINS:
-            latest_snapshot = get_latest_snapshot(bookmark["content"]["url"])
-            if latest_snapshot:
-                print(f"overwriting {bookmark["content"]["url"]} with {latest_snapshot}")
-                bookmark["content"]["url"] = latest_snapshot
-            else:
-                snapshot(bookmark["content"]["url"], complete=False)
-                print(f"No snapshot found for {bookmark["content"]["url"]}... requesting one")
-                print("Skipping TTS until next run")
-                continue
+    Args:
+        bookmark: The bookmark from hoarder
 
-        if bookmark["id"] in known_ids:
-            continue
+    Returns:
+        bool: True if the bookmark's domain is in ARCHIVE_PH_DOMAINS
+    """
+    return remove_www(urlparse(bookmark["content"]["url"]).netloc) in Config.ARCHIVE_PH_DOMAINS
 
-        episode_dict = get_episode_dict(bookmark)
 
-        if episode_dict["text"] is None:
-            continue
+def resolve_archive_snapshot(bookmark: dict) -> bool:
+    """Point a bookmark's url at its latest archive.ph snapshot, requesting one if there isn't any yet.
+
+    Args:
+        bookmark: The bookmark from hoarder, updated in place
+
+    Returns:
+        bool: True if a snapshot was found, False if the bookmark should be retried on a later run
+    """
+    url = bookmark["content"]["url"]
+    try:
+        with stage_seconds.time(stage="archive_resolve"):
+            latest_snapshot = archive_ph_breaker.call(get_latest_snapshot, url, pool=archive_mirrors)
+        if latest_snapshot:
+            print(f"overwriting {url} with {latest_snapshot}")
+            bookmark["content"]["url"] = latest_snapshot
+            return True
+
+        with stage_seconds.time(stage="archive_snapshot"):
+            archive_ph_breaker.call(snapshot, url, complete=False, pool=archive_mirrors)
+    except CircuitOpenError as e:
+        print(f"Skipping {url} until next run, {e}")
+        return False
+    print(f"No snapshot found for {url}... requesting one")
+    print("Skipping TTS until next run")
+    return False
+
+
+def add_episode_from_bookmark(bookmark: dict) -> bool:
+    """Extract a bookmark's article and store it as an episode.
+
+    Args:
+        bookmark: The bookmark from hoarder
+
+    Returns:
+        bool: True if an episode was added, False if no text could be extracted
+    """
+    from hoarderpod.article_parse import EXTRACTOR_VERSION, get_episode_dict
+
+    html_path = asset_prefetcher.take(bookmark["id"])
+    try:
+        with stage_seconds.time(stage="parse"), profiled("get_episode_dict"):
+            episode_dict = get_episode_dict(bookmark, html_path)
+    except Exception as e:
+        episode_ops.record_failure(bookmark["id"], "extract", repr(e), bookmark["content"].get("url"))
+        raise
+
+    if episode_dict["text"] is None:
+        episode_ops.record_failure(bookmark["id"], "extract", "No text could be extracted", episode_dict["url"])
+        return False
+
+    episode = Episode(
+        id=bookmark["id"],
+        title=episode_dict["title"],
+        description=episode_dict["description"],
+        text=episode_dict["text"],
+        url=episode_dict["url"],
+        authors=episode_dict["authors"],
+        created_at=episode_dict["createdAt"],
+        crawled_at=episode_dict["crawledAt"],
+    )
+    episode_ops.add_episode(episode, EXTRACTOR_VERSION)
+    # The episode is detached once it's committed, so its fields are read from the dict
+    episode_ops.record_event(bookmark["id"], "parsed", len(episode_dict["text"]))
+    return True
 
-        episode = Episode(
-            id=bookmark["id"],
-            title=episode_dict["title"],
-            description=episode_dict["description"],
-            text=episode_dict["text"],
-            url=episode_dict["url"],
-            authors=episode_dict["authors"],
-            created_at=episode_dict["createdAt"],
-            crawled_at=episode_dict["crawledAt"],
-        )
-        episode_ops.add_episode(episode)
+
+def list_new_bookmarks(
+    known_ids: set[str], cutoff_date: datetime | None = None, max_episodes: int | None = None
+) -> Iterable[dict]:
+    """Get the bookmarks from hoarder to sync, as set by HOARDER_SYNC_MODE.
+
+    Args:
+        known_ids: Ids of the episodes we already have
+        cutoff_date: Optional date to stop at
+        max_episodes: Optional maximum number of bookmarks to look at
+
+    Returns:
+        Iterable[dict]: The bookmarks, in full mode this includes known ones
+    """
+    if Config.HOARDER_SYNC_MODE == "full":
+        return hoarder_service.get_bookmarks(cutoff_date, max_episodes)
+    return hoarder_service.get_new_bookmarks(known_ids, cutoff_date, max_episodes)
+
+
+def update_db_with_new_episodes(bookmarks: Iterable[dict], known_ids: set[str] | None = None) -> None:
+    """Update the SQL database with bookmarks from hoarder.
+
+    Args:
+        bookmarks: The bookmarks to update the database with
+        known_ids: Optional ids of the episodes we already have, read from the database when not given
+    """
+
+    if known_ids is None:
+        known_ids = episode_ops.get_episode_ids()
+    # Bookmarks whose extraction failed recently or too often
+    blocked_ids = episode_ops.get_blocked_ids("extract")
+
+    def bookmarks_to_parse():
+        for bookmark in bookmarks:
+            if bookmark["id"] in known_ids or bookmark["id"] in blocked_ids or not is_bookmark_ready(bookmark):
+                continue
+            episode_ops.record_event(bookmark["id"], "seen")
+            if needs_archive_snapshot(bookmark) and not resolve_archive_snapshot(bookmark):
+                continue
+            yield bookmark
+
+    for bookmark in asset_prefetcher.prefetched(bookmarks_to_parse()):
+        report_progress(f"Processing bookmark {bookmark['id']}")
+        try:
+            add_episode_from_bookmark(bookmark)
+        except Exception as e:
+            # Counted as a failure, the bookmark is retried after a backoff instead of holding up the rest
+            print(f"Error extracting bookmark {bookmark['id']}: {e!r}")
+        finally:
+            asset_prefetcher.release(bookmark["id"])
 
 
 def submit_tts_request_for_episodes(episodes: list[Episode]) -> None:
@@ -129,20 +285,73 @@ def submit_tts_request_for_episodes(episodes: list[Episode]) -> None:
         episodes: The list of episodes to submit the TTS request for
     """
     for episode in episodes:
-        tts_job_id = tts_service.submit_tts(episode_to_tts_text(episode))
-        episode_ops.mark_tts_submitted(episode.id, tts_job_id)
+        with tts_submit_lock:
+            if not episode_ops.is_waiting_for_tts(episode.id):
+                # Another process submitted it since the episodes were listed
+                continue
+            tts_text = episode_to_tts_text(episode)
+            try:
+                with stage_seconds.time(stage="tts_submit"):
+                    tts_job_id = tts_service.submit_tts(tts_text)
+            except requests.HTTPError as e:
+                if e.response is None or not 400 <= e.response.status_code < 500:
+                    raise
+                # The TTS service rejected this episode's text, the others can still go
+                print(f"TTS service rejected episode {episode.id}: {e}")
+                episode_ops.record_failure(episode.id, "tts", str(e), episode.title)
+                continue
+            episode_ops.mark_tts_submitted(episode.id, tts_job_id)
+            episode_ops.record_event(episode.id, "submitted", len(tts_text))
 
 
-def download_completed_tts_jobs(completed_jobs: list[str]):
+def download_completed_tts_jobs(completed_jobs: list[str], completed_at: datetime | None = None):
     """Download the mp3 for the completed TTS jobs and update the database.
 
+    A job's synthesis time is only recorded when it's known: when the TTS service reports when the job finished, or
+    from completed_at. Otherwise all a poll knows is that it finished some time since the last poll.
+
     Args:
         completed_jobs: The list of completed job ids
+        completed_at: Optional time the jobs finished at, naive UTC, for jobs a callback just reported finished
     """
-    for job_id in completed_jobs:
-        mp3_path = tts_service.download_mp3(job_id)
-        tts_service.delete_job(job_id)
-        episode_ops.mark_tts_completed(job_id, os.path.basename(mp3_path))
+    with tts_download_lock:
+        for job_id in completed_jobs:
+            if not episode_ops.is_tts_job_pending(job_id):
+                # Already picked up by a callback or an earlier poll
+                continue
+            job_completed_at = tts_service.pop_completed_at(job_id) or completed_at
+            with stage_seconds.time(stage="tts_download"):
+                mp3_path = tts_service.download_mp3(job_id)
+            tts_service.delete_job(job_id)
+            episode_id = episode_ops.mark_tts_completed(job_id, os.path.basename(mp3_path), job_completed_at)
+            if job_completed_at is not None:
+                episode_ops.record_event(episode_id, "completed", at=job_completed_at)
+            mp3_bytes = os.path.getsize(mp3_path) if os.path.exists(mp3_path) else None
+            episode_ops.record_event(episode_id, "downloaded", mp3_bytes)
+            queue_renditions(os.path.basename(mp3_path))
+
+
+def complete_tts_job(job_id: str) -> bool:
+    """Download and mark a single finished TTS job without running a full poll.
+
+    This is the fast path for TTS completion callbacks, the regular poll still picks up anything missed here.
+
+    Args:
+        job_id: The job id reported as finished
+
+    Returns:
+        bool: True if the job was completed and its mp3 downloaded
+    """
+    if not episode_ops.is_tts_job_pending(job_id):
+        return False
+
+    # The callback is sent as the job finishes, so now is when synthesis ended
+    completed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    if tts_service.get_job_status(job_id) != "completed":
+        return False
+
+    download_completed_tts_jobs([job_id], completed_at)
+    return True
 
 
 def filter_job_ids_to_ones_we_know_about(job_ids: list[str]) -> list[str]:
@@ -166,43 +375,172 @@ def filter_job_ids_to_ones_we_know_about(job_ids: list[str]) -> list[str]:
     return result
 
 
-def tts_pending_and_completed_update() -> None:
-    """Update the TTS service and the database."""
-    completed_jobs, ongoing_jobs = tts_service.get_jobs()
+def cleanup_unknown_tts_jobs() -> None:
+    """Delete finished jobs on the TTS service that no episode is waiting on.
 
-    completed_jobs = filter_job_ids_to_ones_we_know_about(completed_jobs)
+    This lists every job on the TTS service, so in targeted reconcile mode it runs every TTS_CLEANUP_INTERVAL_MINUTES
+    rather than every poll.
+    """
+    with tts_submit_lock:
+        with stage_seconds.time(stage="tts_cleanup"):
+            completed_jobs, _ = tts_service.get_jobs()
+        filter_job_ids_to_ones_we_know_about(completed_jobs)
 
-    download_completed_tts_jobs(completed_jobs)
-    nulled_tts_jobs = episode_ops.null_episodes_that_tts_doesnt_know_about(ongoing_jobs)
-    for episode_id, tts_job_id in nulled_tts_jobs:
-        print(f"Episode {episode_id} has a job id {tts_job_id} but the TTS service doesn't know about it.")
 
+def reconcile_all_tts_jobs() -> list[str]:
+    """Download finished jobs and requeue lost ones by listing every job on the TTS service.
 
-def main_poll_loop(cutoff_date: datetime | None = None, max_episodes: int | None = None) -> None:
-    """Main function to run the script.
+    Returns:
+        list[str]: The jobs still ongoing on the TTS service
+    """
+    with tts_submit_lock:
+        with stage_seconds.time(stage="tts_reconcile"):
+            completed_jobs, ongoing_jobs = tts_service.get_jobs()
+
+        completed_jobs = filter_job_ids_to_ones_we_know_about(completed_jobs)
+
+        download_completed_tts_jobs(completed_jobs)
+        nulled_tts_jobs = episode_ops.null_episodes_that_tts_doesnt_know_about(ongoing_jobs)
+        for episode_id, tts_job_id in nulled_tts_jobs:
+            print(f"Episode {episode_id} has a job id {tts_job_id} but the TTS service doesn't know about it.")
+            episode_ops.record_failure(episode_id, "tts", f"TTS job {tts_job_id} failed or was lost")
+
+    return ongoing_jobs
+
+
+def reconcile_outstanding_tts_jobs() -> list[str]:
+    """Download finished jobs and requeue lost ones, asking the TTS service only about jobs we're waiting on.
+
+    Returns:
+        list[str]: Our jobs still ongoing on the TTS service
+    """
+    with tts_submit_lock:
+        with stage_seconds.time(stage="tts_reconcile"):
+            statuses = tts_service.get_job_statuses(episode_ops.get_outstanding_job_ids())
+
+        completed_jobs = [job_id for job_id, status in statuses.items() if status == "completed"]
+        ongoing_jobs = [
+            job_id for job_id, status in statuses.items() if status not in (None, "completed", *FAILED_STATUSES)
+        ]
+        # Lost jobs and failed ones are requeued, as a failure so a job that keeps failing is backed off
+        lost_jobs = [job_id for job_id, status in statuses.items() if status is None or status in FAILED_STATUSES]
+
+        download_completed_tts_jobs(completed_jobs)
+        for episode_id, tts_job_id in episode_ops.null_tts_jobs(lost_jobs):
+            if statuses.get(tts_job_id) is None:
+                print(f"Episode {episode_id} has a job id {tts_job_id} but the TTS service doesn't know about it.")
+                episode_ops.record_failure(episode_id, "tts", f"TTS job {tts_job_id} was lost")
+            else:
+                print(f"TTS job {tts_job_id} for episode {episode_id} failed.")
+                episode_ops.record_failure(episode_id, "tts", f"TTS job {tts_job_id} failed")
+                tts_service.delete_job(tts_job_id)
+
+    return ongoing_jobs
+
+
+def tts_pending_and_completed_update() -> list[str]:
+    """Update the TTS service and the database, using TTS_RECONCILE_MODE.
+
+    Returns:
+        list[str]: The jobs still ongoing on the TTS service
+    """
+    if Config.TTS_RECONCILE_MODE == "full":
+        return reconcile_all_tts_jobs()
+    return reconcile_outstanding_tts_jobs()
+
+
+def get_ongoing_tts_jobs() -> list[str]:
+    """Get the jobs taking up room on the TTS service, to work out how many more to submit.
+
+    In targeted mode these come from the database, without a request to the TTS service.
+
+    Returns:
+        list[str]: The ongoing job ids
+    """
+    if Config.TTS_RECONCILE_MODE == "full":
+        _, ongoing_jobs = tts_service.get_jobs()
+        return ongoing_jobs
+    return episode_ops.get_outstanding_job_ids()
+
+
+def tts_submission_slots(ongoing_jobs: list[str], max_in_flight: int) -> int:
+    """Get how many new TTS jobs to submit to top the TTS queue up to max_in_flight.
 
     Args:
-        cutoff_date: The date to stop updating the database at
-        max_episodes: The maximum number of episodes to update the database with
+        ongoing_jobs: The jobs currently queued or running on the TTS service
+        max_in_flight: The target number of jobs on the TTS service
+
+    Returns:
+        int: The number of episodes to submit
+    """
+    return max(0, max_in_flight - len(ongoing_jobs))
+
+
+def submit_waiting_episodes(ongoing_jobs: list[str]) -> None:
+    """Submit waiting episodes to TTS, topping the TTS queue up to TTS_MAX_IN_FLIGHT.
+
+    Args:
+        ongoing_jobs: The jobs currently queued or running on the TTS service
     """
+    slots = tts_submission_slots(ongoing_jobs, Config.TTS_MAX_IN_FLIGHT)
+    if slots > 0:
+        report_progress(f"Submitting up to {slots} episodes to TTS")
+        submit_tts_request_for_episodes(episode_ops.get_episodes_to_tts(limit=slots))
+
 
+def submit_tts_for_waiting_episodes() -> None:
+    """Submit waiting episodes to TTS without syncing hoarder, for when episodes were sent back to TTS."""
+    if tts_service.check_health():
+        submit_waiting_episodes(get_ongoing_tts_jobs())
+    else:
+        print("TTS service is not healthy, waiting episodes are submitted on the next poll")
+
+
+def get_poll_cutoff_date(cutoff_date: datetime | None = None) -> datetime:
+    """Get the date to stop paging hoarder at, the later of cutoff_date and the newest episode we have.
+
+    Args:
+        cutoff_date: Optional configured cutoff date
+
+    Returns:
+        datetime: The cutoff date to use
+    """
     last_episode_date = episode_ops.get_latest_episode_date() or datetime.fromtimestamp(0, tz=timezone.utc)
     print(f"Last episode date: {last_episode_date}")
     if cutoff_date is None or last_episode_date > cutoff_date:
         cutoff_date = last_episode_date
     print(f"Cutoff date: {cutoff_date}")
+    return cutoff_date
 
-    update_db_with_new_episodes(hoarder_service.get_bookmarks(cutoff_date, max_episodes))
 
-    if tts_service.check_health():
-        tts_pending_and_completed_update()
+def main_poll_loop(cutoff_date: datetime | None = None, max_episodes: int | None = None) -> None:
+    """Main function to run the script.
 
-        episodes_to_tts = episode_ops.get_episodes_to_tts()[: Config.TTS_BATCH_SIZE]
+    Args:
+        cutoff_date: The date to stop updating the database at
+        max_episodes: The maximum number of episodes to update the database with
+    """
 
-        submit_tts_request_for_episodes(episodes_to_tts)
+    with stage_seconds.time(stage="poll"), profiled("main_poll_loop"):
+        cutoff_date = get_poll_cutoff_date(cutoff_date)
+
+        if hoarder_breaker.available():
+            report_progress("Syncing bookmarks from Hoarder")
+            try:
+                with stage_seconds.time(stage="hoarder_sync"):
+                    known_ids = episode_ops.get_episode_ids()
+                    update_db_with_new_episodes(list_new_bookmarks(known_ids, cutoff_date, max_episodes), known_ids)
+            except CircuitOpenError as e:
+                print(f"Stopped syncing bookmarks, {e}")
+        else:
+            print("Hoarder is unavailable, skipping sync")
 
-    else:
-        print("TTS service is not healthy, skipping TTS request")
+        if tts_service.check_health():
+            report_progress("Downloading completed TTS jobs")
+            ongoing_jobs = tts_pending_and_completed_update()
+            submit_waiting_episodes(ongoing_jobs)
+        else:
+            print("TTS service is not healthy, skipping TTS request")
 
 
 def poll_hoarder_and_tts():
@@ -221,7 +559,16 @@ if __name__ == "__main__":
     parser.add_argument(
         "-m", "--max-episodes", type=int, required=False, default=None, help="Only pull this many episodes"
     )
+    parser.add_argument(
+        "-w", "--worker", action="store_true", help="Run every stage continuously on its own schedule until stopped"
+    )
 
     args = parser.parse_args()
 
-    main_poll_loop(to_local_datetime(args.cutoff_date), args.max_episodes)
+    if args.worker:
+        from hoarderpod.pipeline import run_worker
+
+        run_worker()
+    else:
+        init_db()
+        main_poll_loop(to_local_datetime(args.cutoff_date), args.max_episodes)
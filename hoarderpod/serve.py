@@ -0,0 +1,125 @@
+"""
+Serving the web app from several processes
+
+waitress serves requests on threads, so within one process feed generation and page rendering share a GIL with each
+other and with the poll. serve() binds the port once and forks WEB_WORKERS processes that each run waitress on the
+same socket, the kernel handing each connection to one of them.
+
+    hoarderpod serve --workers 4
+    WEB_WORKERS=4 python hoarderpod/api.py
+
+Every worker creates its own app, but only the one holding the scheduler lock under LOCK_PATH starts the poll
+scheduler. The others check every SCHEDULER_LOCK_RETRY_SECONDS and one of them takes over if it exits. Jobs requested
+through the API run in the worker that received the request, taking turns with the other workers' jobs through the jobs
+lock, so a poll never runs alongside another one. With API_POLLING_ENABLED off no worker polls, and the standalone
+worker (hoarderpod poll --worker) can do it instead.
+
+The parent process only binds the socket, creates the database tables and restarts workers that die. Forking needs a
+Unix, elsewhere serve() runs a single worker.
+"""
+
+import os
+import signal
+import socket
+import sys
+import time
+
+from hoarderpod import episodes
+from hoarderpod.api import create_app
+from hoarderpod.config import Config
+
+# Seconds to wait before replacing a worker that died, so one that dies on startup doesn't spin
+RESTART_DELAY_SECONDS = 1
+
+
+def _run_worker(sock: socket.socket) -> None:
+    """Serve the app on the inherited socket in a forked worker process, never returning."""
+    import waitress
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    status = 1
+    try:
+        waitress.serve(create_app(), sockets=[sock])
+        status = 0
+    except BaseException as e:
+        print(f"Web worker {os.getpid()} failed: {e!r}", file=sys.stderr)
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
+
+
+def serve(workers: int | None = None, host: str = "0.0.0.0", port: int | None = None) -> None:
+    """Serve the web app until interrupted.
+
+    Args:
+        workers: Optional number of web worker processes, defaults to WEB_WORKERS
+        host: The address to listen on
+        port: Optional port to listen on, defaults to PORT
+    """
+    workers = Config.WEB_WORKERS if workers is None else workers
+    port = Config.PORT if port is None else port
+    if workers <= 1 or not hasattr(os, "fork"):
+        import waitress
+
+        waitress.serve(create_app(), host=host, port=port)
+        return
+
+    sock = socket.create_server((host, port), backlog=1024)
+    # Create the tables once here rather than racing to in every worker, without keeping connections a fork would share
+    episodes.init_db()
+    for engine in {episodes.engine, episodes.read_engine}:
+        engine.dispose()
+
+    children: dict[int, int] = {}
+    stopping = False
+
+    def spawn(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(sock)
+        children[pid] = index
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for index in range(workers):
+        spawn(index)
+    print(f"Serving on http://{host}:{port} with {workers} web workers: {', '.join(map(str, children))}")
+
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index = children.pop(pid, None)
+            if index is None or stopping:
+                continue
+            print(f"Web worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, starting another")
+            time.sleep(RESTART_DELAY_SECONDS)
+            if not stopping:
+                spawn(index)
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the web app from several processes")
+    parser.add_argument("-w", "--workers", type=int, help="Web worker processes, defaults to WEB_WORKERS")
+    parser.add_argument("--host", default="0.0.0.0", help="Address to listen on")
+    parser.add_argument("-p", "--port", type=int, help="Port to listen on, defaults to PORT")
+    args = parser.parse_args()
+
+    serve(workers=args.workers, host=args.host, port=args.port)
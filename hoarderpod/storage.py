@@ -0,0 +1,283 @@
+"""
+Disk budget, eviction and garbage collection for episode audio
+
+Every file in MP3_STORAGE_PATH is indexed in the audio_files table with its size and when it was last served. A
+periodic run deletes files no episode uses and, past AUDIO_STORAGE_BUDGET_MB, evicts the least recently played audio
+of episodes that have dropped out of the feed. Evicted rows are kept, so a request for one of their files can send the
+episode back to TTS instead of failing.
+"""
+
+import os
+import time
+from collections.abc import Iterable
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, or_, select, update
+
+from hoarderpod.config import Config
+from hoarderpod.episodes import AudioFile, Episode, EpisodeFilter, ReadSession, Session
+from hoarderpod.metrics import stage_seconds
+from hoarderpod.utils import chunked
+
+# Served files have their access time updated at most this often, so playing an episode doesn't write on every range
+# request
+ACCESS_RESOLUTION = timedelta(minutes=10)
+
+
+def original_mp3(filename: str) -> str:
+    """Get the original mp3 a file in the audio directory belongs to.
+
+    Args:
+        filename: An mp3, a rendition (<job_id>.<rendition>.<ext>) or a partial encode
+
+    Returns:
+        str: The original mp3 file name, <job_id>.mp3
+    """
+    return os.path.basename(filename).split(".")[0] + ".mp3"
+
+
+class AudioStorage:
+    """Keeps the audio directory within its disk budget."""
+
+    def __init__(self, storage_path: str | None = None):
+        self.storage_path = storage_path or Config.MP3_STORAGE_PATH
+
+    def _files_on_disk(self) -> dict[str, os.stat_result]:
+        if not os.path.isdir(self.storage_path):
+            return {}
+        with os.scandir(self.storage_path) as entries:
+            return {entry.name: entry.stat() for entry in entries if entry.is_file()}
+
+    def _remove(self, filename: str) -> None:
+        try:
+            os.remove(os.path.join(self.storage_path, filename))
+        except FileNotFoundError:
+            pass
+
+    def sync_index(self) -> None:
+        """Bring the audio_files index in line with the files on disk."""
+        on_disk = self._files_on_disk()
+        with Session() as session:
+            with_mp3 = session.query(Episode.id, Episode.mp3).filter(Episode.mp3 != None)
+            episode_ids = {mp3: episode_id for episode_id, mp3 in with_mp3}
+            indexed = {row.filename: row for row in session.query(AudioFile)}
+
+            for filename, stat in on_disk.items():
+                row = indexed.get(filename)
+                if row is None:
+                    mp3 = original_mp3(filename)
+                    session.add(
+                        AudioFile(
+                            filename=filename,
+                            mp3=mp3,
+                            episode_id=episode_ids.get(mp3),
+                            size_bytes=stat.st_size,
+                            created_at=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc).replace(tzinfo=None),
+                        )
+                    )
+                else:
+                    row.size_bytes = stat.st_size
+                    row.evicted_at = None
+                    row.episode_id = row.episode_id or episode_ids.get(row.mp3)
+
+            for filename, row in indexed.items():
+                if filename not in on_disk and row.evicted_at is None:
+                    session.delete(row)
+            session.commit()
+
+    def record_access(self, filename: str) -> None:
+        """Note that a file was served, for least recently used eviction.
+
+        Args:
+            filename: The served file name
+        """
+        filename = os.path.basename(filename)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        # Check on a reader first, most requests don't need to take the write lock
+        with ReadSession() as session:
+            last_accessed_at = session.query(AudioFile.last_accessed_at).filter(AudioFile.filename == filename).scalar()
+        if last_accessed_at is not None and last_accessed_at > now - ACCESS_RESOLUTION:
+            return
+
+        with Session() as session:
+            session.execute(
+                update(AudioFile)
+                .where(
+                    AudioFile.filename == filename,
+                    or_(AudioFile.last_accessed_at == None, AudioFile.last_accessed_at < now - ACCESS_RESOLUTION),
+                )
+                .values(last_accessed_at=now)
+            )
+            session.commit()
+
+    def collect_orphans(self) -> list[str]:
+        """Delete files that no episode uses, once they're older than AUDIO_ORPHAN_GRACE_MINUTES.
+
+        This covers audio of deleted episodes, mp3s replaced by a new TTS run and partial encodes left by a crash.
+
+        Returns:
+            list[str]: The deleted file names
+        """
+        cutoff = time.time() - Config.AUDIO_ORPHAN_GRACE_MINUTES * 60
+        removed = []
+        with Session() as session:
+            in_use = {mp3 for (mp3,) in session.query(Episode.mp3).filter(Episode.mp3 != None)}
+            for filename, stat in self._files_on_disk().items():
+                if original_mp3(filename) in in_use and not filename.endswith(".tmp"):
+                    continue
+                if stat.st_mtime > cutoff:
+                    continue
+                print(f"Removing orphaned audio {filename}")
+                self._remove(filename)
+                session.query(AudioFile).filter(AudioFile.filename == filename).delete()
+                removed.append(filename)
+
+            # Evicted rows are only needed while their episode could still ask for them back
+            episodes = dict(session.query(Episode.id, Episode.mp3).all())
+            for row in session.query(AudioFile).filter(AudioFile.evicted_at != None):
+                if row.episode_id not in episodes or episodes[row.episode_id] not in (None, row.mp3):
+                    session.delete(row)
+            session.commit()
+        return removed
+
+    def enforce_budget(self, budget_bytes: int | None = None) -> list[str]:
+        """Evict the least recently played audio of episodes outside the feed until under budget.
+
+        Args:
+            budget_bytes: Optional budget, defaults to AUDIO_STORAGE_BUDGET_MB
+
+        Returns:
+            list[str]: The ids of the episodes whose audio was evicted
+        """
+        if budget_bytes is None:
+            budget_bytes = Config.AUDIO_STORAGE_BUDGET_MB * 1024 * 1024
+        if not budget_bytes:
+            return []
+
+        evicted = []
+        with Session() as session:
+            rows = session.query(AudioFile).filter(AudioFile.evicted_at == None).all()
+            total = sum(row.size_bytes for row in rows)
+            if total <= budget_bytes:
+                return []
+
+            feed_window = {
+                mp3
+                for (mp3,) in session.query(Episode.mp3)
+                .filter(Episode.mp3 != None)
+                .order_by(Episode.created_at.desc())
+                .limit(Config.FEED_MAX_EPISODES)
+            }
+            by_mp3 = {}
+            for row in rows:
+                if row.episode_id and row.mp3 not in feed_window:
+                    by_mp3.setdefault(row.mp3, []).append(row)
+
+            def last_used(files: list[AudioFile]) -> datetime:
+                return max(row.last_accessed_at or row.created_at for row in files)
+
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            for files in sorted(by_mp3.values(), key=last_used):
+                if total <= budget_bytes:
+                    break
+                for row in files:
+                    self._remove(row.filename)
+                    row.evicted_at = now
+                    total -= row.size_bytes
+                evicted.append(files[0].episode_id)
+                print(f"Evicted audio for episode {files[0].episode_id}, {len(files)} files")
+            session.commit()
+
+        if total > budget_bytes:
+            print(f"Audio is {total} bytes over budget, but everything left is in the feed")
+        return evicted
+
+    def delete_audio(self, mp3: str | None) -> None:
+        """Delete an episode's mp3 and its renditions.
+
+        Args:
+            mp3: The episode's mp3 file name
+        """
+        self.delete_audio_files([mp3])
+
+    def delete_audio_files(self, mp3s: Iterable[str | None]) -> list[str]:
+        """Delete mp3s and their renditions, in one pass over the audio directory.
+
+        Args:
+            mp3s: The mp3 file names, None for episodes without audio
+
+        Returns:
+            list[str]: The deleted file names
+        """
+        mp3s = {os.path.basename(mp3) for mp3 in mp3s if mp3}
+        if not mp3s:
+            return []
+        removed = [filename for filename in self._files_on_disk() if original_mp3(filename) in mp3s]
+        for filename in removed:
+            self._remove(filename)
+        with Session() as session:
+            for chunk in chunked(sorted(mp3s)):
+                session.execute(delete(AudioFile).where(AudioFile.mp3.in_(chunk)))
+            session.commit()
+        return removed
+
+    def purge_audio(self, episode_filter: EpisodeFilter) -> list[str]:
+        """Evict the audio of the episodes a filter matches, keeping the episodes in the feed.
+
+        Like audio evicted for the budget, an episode goes back to TTS when its audio is requested again.
+
+        Args:
+            episode_filter: The filter
+
+        Returns:
+            list[str]: The ids of the episodes whose audio was purged
+        """
+        # Files are only indexed on storage runs, index any new ones so their rows can requeue the episode
+        self.sync_index()
+        with Session() as session:
+            evicted = session.execute(
+                update(AudioFile)
+                .where(
+                    AudioFile.evicted_at == None,
+                    AudioFile.mp3.in_(select(Episode.mp3).where(Episode.mp3 != None, episode_filter.clause())),
+                )
+                .values(evicted_at=datetime.now(timezone.utc).replace(tzinfo=None))
+                .returning(AudioFile.filename, AudioFile.episode_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            session.commit()
+        for filename, _ in evicted:
+            self._remove(filename)
+        return sorted({episode_id for _, episode_id in evicted if episode_id})
+
+    def requeue_evicted(self, filename: str) -> bool:
+        """Send the episode of an evicted file back to TTS.
+
+        Args:
+            filename: The requested file name
+
+        Returns:
+            bool: True if the file was evicted and its episode is waiting for new audio
+        """
+        with Session() as session:
+            row = session.get(AudioFile, os.path.basename(filename))
+            if row is None or row.evicted_at is None or row.episode_id is None:
+                return False
+            episode = session.get(Episode, row.episode_id)
+            if episode is None:
+                return False
+            if episode.mp3 == row.mp3:
+                print(f"Requeueing TTS for episode {episode.id}, its audio was evicted")
+                episode.mp3 = None
+                episode.tts_job_id = None
+                session.commit()
+                return True
+            # Already requeued by an earlier request, and still waiting unless it has a new mp3
+            return episode.mp3 is None
+
+    def run(self) -> None:
+        """Index the audio directory, delete orphans and enforce the budget."""
+        with stage_seconds.time(stage="audio_storage"):
+            self.sync_index()
+            self.collect_orphans()
+            self.enforce_budget()
@@ -0,0 +1,112 @@
+"""
+Ordering of the TTS queue and estimates of when waiting episodes will be ready
+
+The order waiting episodes are submitted in is set by TTS_QUEUE_POLICY:
+
+    fifo      oldest bookmark first
+    newest    newest bookmark first
+    sjf       shortest job first, by estimated synthesis time
+    weighted  shortest job first, but every second an episode has waited takes TTS_QUEUE_AGING seconds off its
+              estimate, so a long article isn't starved by a steady stream of short ones
+
+Estimates use a seconds-per-character rate learned per TTS model and voice from completed jobs. This module only has
+the arithmetic, EpisodeOps stores the rates and applies the ordering.
+"""
+
+from datetime import datetime, timedelta
+
+POLICIES = ("fifo", "newest", "sjf", "weighted")
+
+# Weight of the newest sample in the learned rate
+SPEED_SMOOTHING = 0.2
+
+
+class QueuedEpisode:
+    """An episode waiting for TTS, with what the policies order on."""
+
+    def __init__(self, id: str, created_at: datetime, chars: int):
+        self.id = id
+        self.created_at = created_at
+        self.chars = chars
+
+
+def order_queue(
+    queue: list[QueuedEpisode], policy: str, seconds_per_char: float, now: datetime, aging: float = 0.0
+) -> list[QueuedEpisode]:
+    """Sort waiting episodes into the order they should be submitted in.
+
+    Args:
+        queue: The waiting episodes
+        policy: One of POLICIES
+        seconds_per_char: Estimated synthesis seconds per character
+        now: The current time, naive UTC like the database
+        aging: For "weighted", estimated seconds taken off per second waited
+
+    Returns:
+        list[QueuedEpisode]: The episodes, next to submit first
+    """
+    if policy == "newest":
+        return sorted(queue, key=lambda episode: episode.created_at, reverse=True)
+    if policy == "sjf":
+        return sorted(queue, key=lambda episode: (episode.chars, episode.created_at))
+    if policy == "weighted":
+
+        def score(episode: QueuedEpisode) -> tuple[float, datetime]:
+            waited = (now - episode.created_at).total_seconds()
+            return episode.chars * seconds_per_char - aging * waited, episode.created_at
+
+        return sorted(queue, key=score)
+    if policy != "fifo":
+        raise ValueError(f"Unknown TTS queue policy {policy}, expected one of {', '.join(POLICIES)}")
+    return sorted(queue, key=lambda episode: episode.created_at)
+
+
+def update_seconds_per_char(current: float | None, duration_seconds: float, chars: int) -> float | None:
+    """Fold a completed job into the learned rate.
+
+    Args:
+        current: The rate so far, None before the first sample
+        duration_seconds: How long the job took to synthesize
+        chars: The length of the job's text
+
+    Returns:
+        float | None: The new rate, unchanged if the sample isn't usable
+    """
+    if chars <= 0 or duration_seconds <= 0:
+        return current
+    sample = duration_seconds / chars
+    if current is None:
+        return sample
+    return current + SPEED_SMOOTHING * (sample - current)
+
+
+def predict_ready_times(
+    in_flight: list[tuple[str, datetime, int]], waiting: list[QueuedEpisode], seconds_per_char: float, now: datetime
+) -> dict[str, datetime]:
+    """Predict when each queued episode's audio will be ready.
+
+    The TTS service is assumed to work through jobs one at a time in the order they were submitted, and waiting
+    episodes to be submitted in queue order.
+
+    Args:
+        in_flight: Episode id, submission time and length of each submitted job, oldest first
+        waiting: The waiting episodes in queue order
+        seconds_per_char: Estimated synthesis seconds per character
+        now: The current time, naive UTC like the database
+
+    Returns:
+        dict[str, datetime]: Episode id to predicted ready time
+    """
+    ready_at = {}
+    finished_at = None
+    for episode_id, submitted_at, chars in in_flight:
+        start = submitted_at if finished_at is None else max(finished_at, submitted_at)
+        finished_at = start + timedelta(seconds=chars * seconds_per_char)
+        # Overdue jobs are expected any moment now
+        ready_at[episode_id] = max(finished_at, now)
+
+    finished_at = max(finished_at or now, now)
+    for episode in waiting:
+        finished_at += timedelta(seconds=episode.chars * seconds_per_char)
+        ready_at[episode.id] = finished_at
+    return ready_at
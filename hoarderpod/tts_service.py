@@ -3,11 +3,44 @@ Service for interacting with the TTS service
 """
 
 import os
+import time
+from datetime import datetime, timezone
 
 import requests
 
+from hoarderpod.circuit_breaker import CircuitOpenError, tts_breaker
 from hoarderpod.config import Config
 
+# Job statuses the TTS service reports for jobs that won't complete
+FAILED_STATUSES = ("failed", "error")
+
+
+def job_completed_at(job: dict) -> datetime | None:
+    """Get when the TTS service says a job finished.
+
+    Versions of the service differ in whether and how they report it, so completed_at or finished_at is read as
+    either ISO 8601 or epoch seconds.
+
+    Args:
+        job: The job as listed by the TTS service
+
+    Returns:
+        datetime | None: When the job finished, naive UTC, or None if the service doesn't say
+    """
+    value = job.get("completed_at") or job.get("finished_at")
+    try:
+        if isinstance(value, int | float):
+            finished = datetime.fromtimestamp(value, tz=timezone.utc)
+        elif isinstance(value, str):
+            finished = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        else:
+            return None
+    except (ValueError, OverflowError, OSError):
+        return None
+    if finished.tzinfo is not None:
+        finished = finished.astimezone(timezone.utc).replace(tzinfo=None)
+    return finished
+
 
 class PATHS:
     """Paths for the TTS service."""
@@ -27,13 +60,19 @@ class TTSService:
             self.root_url = self.root_url[:-1]
 
         self.mp3_storage_path = Config.MP3_STORAGE_PATH
-        if not os.path.exists(self.mp3_storage_path):
-            os.makedirs(self.mp3_storage_path)
 
         self.synthesize_path = f"{self.root_url}/{PATHS.SYNTHESIZE}"
         self.jobs_path = f"{self.root_url}/{PATHS.JOBS}"
         self.download_path = f"{self.root_url}/{PATHS.DOWNLOAD}"
         self.health_path = f"{self.root_url}/{PATHS.HEALTH}"
+        # Set to False the first time the service ignores or rejects the ids filter on the jobs list
+        self.batch_status_supported = True
+        # When finished jobs completed, as reported by the service, until the poll that downloads them picks them up
+        self.completed_at: dict[str, datetime] = {}
+        self.timeout = Config.HTTP_TIMEOUT_SECONDS
+        self.breaker = tts_breaker
+        # (monotonic time, result) of the last health check, reused for HEALTH_CACHE_SECONDS
+        self._health = None
 
     def submit_tts(self, text: str) -> str:
         """Submit a TTS request and return the job id.
@@ -49,32 +88,117 @@ class TTSService:
         if Config.TTS_VOICE and len(Config.TTS_VOICE) > 0:
             opts["voice"] = Config.TTS_VOICE
 
-        response = requests.post(
-            self.synthesize_path,
-            json=opts,
-        )
-        response.raise_for_status()
+        with self.breaker.guard():
+            response = requests.post(self.synthesize_path, json=opts, timeout=self.timeout)
+            response.raise_for_status()
         return response.json()["job_id"]
 
     def get_jobs(self) -> tuple[list[str], list[str]]:
         """Get the TTS jobs from the TTS service.
 
         Returns:
-            tuple[list[str], list[str]]: The list of completed and ongoing TTS jobs
+            tuple[list[str], list[str]]: The list of completed and ongoing TTS jobs, failed jobs are in neither
         """
-        response = requests.get(self.jobs_path)
-        response.raise_for_status()
+        with self.breaker.guard():
+            response = requests.get(self.jobs_path, timeout=self.timeout)
+            response.raise_for_status()
         res_json = response.json()["jobs"]
         completed_jobs = []
         ongoing_jobs = []
+        # Every finished job is listed, so this replaces what earlier polls recorded
+        self.completed_at = {}
         for job in res_json:
             if job["status"].lower() == "completed":
                 completed_jobs.append(job["job_id"])
-            else:
+                self._record_completion(job["job_id"], job)
+            elif job["status"].lower() not in FAILED_STATUSES:
                 ongoing_jobs.append(job["job_id"])
 
         return completed_jobs, ongoing_jobs
 
+    def get_job_status(self, job_id: str) -> str | None:
+        """Get the status of a single TTS job.
+
+        Args:
+            job_id: The job id to look up
+
+        Returns:
+            str | None: The lowercased job status, or None if the TTS service doesn't know the job
+        """
+        with self.breaker.guard():
+            response = requests.get(f"{self.jobs_path}/{job_id}", timeout=self.timeout)
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+        job = response.json()
+        self._record_completion(job_id, job)
+        return job["status"].lower()
+
+    def get_job_statuses(self, job_ids: list[str]) -> dict[str, str | None]:
+        """Get the status of specific TTS jobs without listing every job.
+
+        Jobs are looked up TTS_STATUS_BATCH_SIZE at a time with GET tts/jobs?ids=..., falling back to one request per
+        job if the TTS service doesn't support filtering by id.
+
+        Args:
+            job_ids: The job ids to look up
+
+        Returns:
+            dict[str, str | None]: Job id to lowercased status, None for jobs the TTS service doesn't know
+        """
+        statuses = {}
+        batch_size = max(1, Config.TTS_STATUS_BATCH_SIZE)
+        for i in range(0, len(job_ids), batch_size):
+            batch = job_ids[i : i + batch_size]
+            batch_statuses = self._get_job_statuses_batch(batch) if self.batch_status_supported else None
+            if batch_statuses is None:
+                batch_statuses = {job_id: self.get_job_status(job_id) for job_id in batch}
+            statuses.update(batch_statuses)
+        return statuses
+
+    def _get_job_statuses_batch(self, job_ids: list[str]) -> dict[str, str | None] | None:
+        """Look up a batch of jobs with one request.
+
+        Args:
+            job_ids: The job ids to look up
+
+        Returns:
+            dict[str, str | None] | None: Job id to status, or None if the TTS service can't filter by id
+        """
+        with self.breaker.guard():
+            response = requests.get(self.jobs_path, params={"ids": ",".join(job_ids)}, timeout=self.timeout)
+            if response.status_code in (400, 404, 405, 422):
+                self.batch_status_supported = False
+                return None
+            response.raise_for_status()
+
+        wanted = set(job_ids)
+        returned = {}
+        for job in response.json()["jobs"]:
+            returned[job["job_id"]] = job["status"].lower()
+            self._record_completion(job["job_id"], job)
+        if not returned.keys() <= wanted:
+            # The filter was ignored and every job came back, use what we got but don't ask like this again
+            self.batch_status_supported = False
+        return {job_id: returned.get(job_id) for job_id in job_ids}
+
+    def _record_completion(self, job_id: str, job: dict) -> None:
+        """Remember when a completed job finished, if the service says."""
+        completed_at = job_completed_at(job) if job["status"].lower() == "completed" else None
+        if completed_at is not None:
+            self.completed_at[job_id] = completed_at
+
+    def pop_completed_at(self, job_id: str) -> datetime | None:
+        """Get and forget when a job finished, as reported by the last status check that saw it completed.
+
+        Args:
+            job_id: The job id
+
+        Returns:
+            datetime | None: When the job finished, naive UTC, or None if the service didn't say
+        """
+        return self.completed_at.pop(job_id, None)
+
     def download_mp3(self, job_id: str) -> str:
         """Download the mp3 for the job.
 
@@ -84,8 +208,10 @@ class TTSService:
         Returns:
             str: The path where the mp3 was saved
         """
-        response = requests.get(self.download_path.format(job_id=job_id))
-        response.raise_for_status()
+        with self.breaker.guard():
+            response = requests.get(self.download_path.format(job_id=job_id), timeout=self.timeout)
+            response.raise_for_status()
+        os.makedirs(self.mp3_storage_path, exist_ok=True)
         saved_path = os.path.join(self.mp3_storage_path, f"{job_id}.mp3")
         with open(saved_path, "wb") as f:
             f.write(response.content)
@@ -97,10 +223,36 @@ class TTSService:
         Args:
             job_id: The job id to delete
         """
-        response = requests.delete(f"{self.jobs_path}/{job_id}")
-        response.raise_for_status()
+        with self.breaker.guard():
+            response = requests.delete(f"{self.jobs_path}/{job_id}", timeout=self.timeout)
+            response.raise_for_status()
 
     def check_health(self) -> bool:
-        """Check the health of the TTS service."""
-        response = requests.get(self.health_path)
-        return response.status_code == 200
+        """Check the health of the TTS service.
+
+        The result is reused for HEALTH_CACHE_SECONDS, and while the circuit breaker is open the service is unhealthy
+        without a request. Once it half-opens, the health check is the probe.
+
+        Returns:
+            bool: True if the TTS service answered its health check
+        """
+        if not self.breaker.available():
+            return False
+        if self._health is not None and time.monotonic() - self._health[0] < Config.HEALTH_CACHE_SECONDS:
+            return self._health[1]
+
+        healthy = False
+        try:
+            with self.breaker.guard():
+                response = requests.get(self.health_path, timeout=Config.HEALTH_TIMEOUT_SECONDS)
+                if response.status_code != 200:
+                    raise requests.HTTPError(f"Health check returned {response.status_code}", response=response)
+            healthy = True
+        except CircuitOpenError:
+            # Another thread took the probe
+            return False
+        except requests.RequestException as e:
+            # Only connection errors, timeouts, 5xx and 429 count against the breaker, but nothing else is healthy either
+            print(f"TTS service is not healthy: {e}")
+        self._health = (time.monotonic(), healthy)
+        return healthy
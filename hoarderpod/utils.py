@@ -2,6 +2,7 @@
 Utility functions for the application
 """
 
+from collections.abc import Iterator
 from datetime import datetime, timezone
 
 
@@ -24,6 +25,20 @@ def oxford_join(items: list[str]) -> str:
     return f"{', '.join(items[:-1])}, and {items[-1]}"
 
 
+def chunked(items: list, size: int = 500) -> Iterator[list]:
+    """Split a list into lists of at most size items, e.g. to keep an SQL IN clause under SQLite's parameter limit.
+
+    Args:
+        items: The items
+        size: The most items per list
+
+    Returns:
+        Iterator[list]: The lists, in order
+    """
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
 def to_local_datetime(input_date: str) -> datetime:
     """Convert a date string to a local datetime
 
@@ -0,0 +1,99 @@
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# Config asserts on the API key at import time and init_db()/create_app() use the database, audio, asset spool, page
+# cache and lock directories, so point them at throwaway locations before any import.
+os.environ.setdefault("HOARDER_API_KEY", "test-key")
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+os.environ.setdefault("MP3_STORAGE_PATH", tempfile.mkdtemp(prefix="hoarderpod-audio-"))
+os.environ.setdefault("ASSET_SPOOL_PATH", tempfile.mkdtemp(prefix="hoarderpod-spool-"))
+os.environ.setdefault("ORIGIN_CACHE_PATH", tempfile.mkdtemp(prefix="hoarderpod-origin-"))
+os.environ.setdefault("LOCK_PATH", tempfile.mkdtemp(prefix="hoarderpod-locks-"))
+
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breakers():
+    """Breakers are shared by every service instance, so one test's outages mustn't skip calls in the next."""
+    from hoarderpod.circuit_breaker import breakers
+
+    for breaker in breakers.values():
+        breaker.reset()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def reset_mirror_pools():
+    """Mirror stats are module-level too, a mirror one test benched must still be tried first in the next."""
+    from hoarderpod import run
+    from hoarderpod.archive_scraper import mirror_pool
+
+    mirror_pool.reset()
+    run.archive_mirrors.reset()
+    yield
+
+
+@pytest.fixture
+def ops(monkeypatch, tmp_path):
+    """EpisodeOps on a fresh database file, so the read-only engine sees what the writer commits."""
+    from hoarderpod.config import Config
+    from hoarderpod.episodes import EpisodeOps, init_db
+
+    monkeypatch.setattr(Config, "DATABASE_URI", f"sqlite:///{tmp_path / 'episodes.db'}")
+    init_db()
+    return EpisodeOps()
+
+
+@pytest.fixture
+def audio_dir(monkeypatch, tmp_path):
+    """An empty MP3_STORAGE_PATH."""
+    from hoarderpod.config import Config
+
+    path = tmp_path / "audio"
+    path.mkdir()
+    monkeypatch.setattr(Config, "MP3_STORAGE_PATH", str(path))
+    return path
+
+
+@pytest.fixture
+def add_episode(ops):
+    """Add episodes to the ops database, with defaults for every column a test doesn't care about.
+
+    created_at defaults to hours_ago before now, and tts_job_id to the name of the mp3 without .mp3.
+    """
+    from hoarderpod.episodes import Episode
+
+    def add(episode_id, text="Some text", hours_ago=0, created_at=None, extractor_version=None, **columns):
+        if created_at is None:
+            created_at = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=hours_ago)
+        if columns.get("mp3") and "tts_job_id" not in columns:
+            columns["tts_job_id"] = columns["mp3"].removesuffix(".mp3")
+        columns.setdefault("title", episode_id)
+        columns.setdefault("authors", [])
+        columns.setdefault("crawled_at", created_at)
+        ops.add_episode(Episode(id=episode_id, text=text, created_at=created_at, **columns), extractor_version)
+
+    return add
+
+
+@pytest.fixture
+def make_bookmark():
+    """Build hoarder bookmarks with the article text inline."""
+
+    def make(bookmark_id, text="Some text", **content):
+        return {
+            "id": bookmark_id,
+            "createdAt": "2026-02-05T16:46:22.000Z",
+            "content": {
+                "url": f"https://example.com/{bookmark_id}",
+                "title": f"Title of {bookmark_id}",
+                "description": None,
+                "crawledAt": "2026-02-05T16:46:22.000Z",
+                "htmlContent": f"<html><body><article><p>{text}</p></article></body></html>",
+                **content,
+            },
+        }
+
+    return make
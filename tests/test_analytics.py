@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from hoarderpod.analytics import analytics_report, build_report, format_report, parse_window, percentile
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+def ago(minutes):
+    return NOW - timedelta(minutes=minutes)
+
+
+def test_parse_window():
+    assert parse_window("90m") == timedelta(minutes=90)
+    assert parse_window("24h") == timedelta(hours=24)
+    assert parse_window("7d") == timedelta(days=7)
+    assert parse_window("6") == timedelta(hours=6)
+    for window in ("", "0h", "3y", "-1d"):
+        with pytest.raises(ValueError):
+            parse_window(window)
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile(list(range(1, 101)), 95) == 95
+    assert percentile([5], 95) == 5
+
+
+def test_build_report_pairs_events_per_episode():
+    events = [
+        ("ep1", "seen", ago(100), None),
+        ("ep1", "parsed", ago(99), 1_000),
+        ("ep1", "submitted", ago(90), 900),
+        ("ep1", "completed", ago(80), None),
+        ("ep1", "downloaded", ago(79), 5_000),
+        ("ep2", "seen", ago(60), None),
+        ("ep2", "parsed", ago(60), 2_000),
+        ("ep2", "submitted", ago(30), 1_800),
+    ]
+
+    report = build_report(events, ago(120), NOW)
+
+    assert report["counts"] == {"seen": 2, "parsed": 2, "submitted": 2, "completed": 1, "downloaded": 1}
+    assert report["throughput_per_hour"] == pytest.approx(0.5)
+    assert report["text_chars"] == 3_000
+    assert report["audio_bytes"] == 5_000
+    assert report["queue_wait"] == {"count": 2, "mean": 19.5 * 60, "p50": 9 * 60, "p95": 30 * 60}
+    assert report["synthesis"]["p50"] == 10 * 60
+    assert report["end_to_end"]["p50"] == 21 * 60
+
+
+def test_build_report_counts_durations_ending_in_the_window():
+    events = [
+        ("ep1", "seen", ago(300), None),
+        ("ep1", "parsed", ago(300), 1_000),
+        ("ep1", "submitted", ago(200), 900),
+        ("ep1", "completed", ago(50), None),
+        ("ep1", "downloaded", ago(50), 5_000),
+        # Regenerated, its new synthesis doesn't pair with the original parse
+        ("ep1", "submitted", ago(20), 900),
+        ("ep1", "completed", ago(10), None),
+        ("ep1", "downloaded", ago(10), 5_000),
+    ]
+
+    report = build_report(events, ago(60), NOW)
+
+    assert report["counts"]["submitted"] == 1
+    assert report["queue_wait"]["count"] == 0
+    assert sorted([report["synthesis"]["p50"], report["synthesis"]["p95"]]) == [10 * 60, 150 * 60]
+    assert report["end_to_end"] == {"count": 1, "mean": 250 * 60, "p50": 250 * 60, "p95": 250 * 60}
+
+
+def test_analytics_report_reads_earlier_events_of_episodes_in_the_window(ops):
+    ops.record_event("old", "seen", at=ago(60 * 48))
+    ops.record_event("ep1", "seen", at=ago(60 * 30))
+    ops.record_event("ep1", "parsed", 1_000, at=ago(60 * 30))
+    ops.record_event("ep1", "submitted", 900, at=ago(60))
+    ops.record_event("ep1", "completed", at=ago(30))
+    ops.record_event("ep1", "downloaded", 5_000, at=ago(29))
+
+    report = analytics_report("24h", now=NOW, episode_ops=ops)
+
+    assert report["window"] == "24h"
+    assert report["counts"] == {"seen": 0, "parsed": 0, "submitted": 1, "completed": 1, "downloaded": 1}
+    assert report["queue_wait"]["p50"] == 29 * 3600
+    assert report["end_to_end"]["p50"] == 30 * 3600 - 29 * 60
+    assert "end_to_end" in format_report(report)
+
+
+@patch("hoarderpod.run.episode_ops")
+@patch("hoarderpod.run.tts_service")
+def test_tts_steps_record_events(mock_tts_service, mock_episode_ops, tmp_path):
+    from hoarderpod import run
+    from hoarderpod.episodes import Episode
+
+    mp3_path = tmp_path / "job1.mp3"
+    mp3_path.write_bytes(b"x" * 123)
+    mock_tts_service.submit_tts.return_value = "job1"
+    mock_tts_service.download_mp3.return_value = str(mp3_path)
+    mock_episode_ops.is_tts_job_pending.return_value = True
+    mock_episode_ops.mark_tts_completed.return_value = "ep1"
+
+    with patch("hoarderpod.run.queue_renditions"):
+        run.submit_tts_request_for_episodes([Episode(id="ep1", title="Title", text="Some text", authors=[])])
+        run.download_completed_tts_jobs(["job1"])
+
+    recorded = [(c.args[0], c.args[1]) for c in mock_episode_ops.record_event.call_args_list]
+    assert recorded == [("ep1", "submitted"), ("ep1", "completed"), ("ep1", "downloaded")]
+    assert mock_episode_ops.record_event.call_args_list[-1].args[2] == 123
+
+
+def test_analytics_endpoint(ops):
+    from hoarderpod.api import create_app
+
+    ops.record_event("ep1", "downloaded", 5_000)
+    with patch("hoarderpod.api.init_db"):
+        client = create_app(start_scheduler=False).test_client()
+
+    reports = client.get("/episodes/analytics?window=1h&window=7d").get_json()
+
+    assert [report["window"] for report in reports] == ["1h", "7d"]
+    assert reports[0]["counts"]["downloaded"] == 1
+    assert client.get("/episodes/analytics?window=soon").status_code == 400
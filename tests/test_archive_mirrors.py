@@ -0,0 +1,93 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from hoarderpod.archive_scraper import MirrorPool, get_latest_snapshot, normalize_mirror, snapshot
+from hoarderpod.circuit_breaker import CircuitBreaker
+
+SEARCH = "/search/?q=https://example.com"
+RESULTS = '<div>12 Mar 2023 15:30</div></a></div></div><div><a href="/abc123">'
+
+
+def test_normalize_mirror():
+    assert normalize_mirror(" archive.is/ ") == "https://archive.is"
+    assert normalize_mirror("http://archive.md") == "http://archive.md"
+    assert MirrorPool([]).mirrors[0] == "https://archive.ph"
+
+
+def test_first_request_races_the_best_two_and_sticks_to_the_winner():
+    pool = MirrorPool(["https://a.test", "https://b.test", "https://c.test"])
+    attempted = []
+
+    def attempt(mirror, method, path, kwargs):
+        attempted.append(mirror)
+        if mirror == "https://a.test":
+            time.sleep(0.3)
+        pool.record(mirror, latency=0.3 if mirror == "https://a.test" else 0.01)
+        return mirror, MagicMock(), MagicMock(status_code=200)
+
+    with patch.object(pool, "_attempt", side_effect=attempt):
+        start = time.monotonic()
+        mirror, _, _ = pool.request("GET", SEARCH)
+        assert mirror == "https://b.test"
+        assert time.monotonic() - start < 0.3
+        assert sorted(attempted) == ["https://a.test", "https://b.test"]
+
+        # The slower mirror still finishes for its latency
+        for _ in range(100):
+            if pool.to_dict()["https://a.test"]["latency_seconds"] is not None:
+                break
+            time.sleep(0.01)
+        assert pool.ranked() == ["https://b.test", "https://a.test", "https://c.test"]
+
+        attempted.clear()
+        assert pool.request("GET", SEARCH)[0] == "https://b.test"
+        assert attempted == ["https://b.test"]
+
+
+def test_failing_mirror_is_benched_and_the_next_one_answers(requests_mock):
+    pool = MirrorPool(["https://a.test", "https://b.test", "https://c.test"])
+    pool.record("https://a.test", latency=0.1)
+    pool.record("https://b.test", latency=0.2)
+    pool._proven = "https://a.test"
+    requests_mock.get(f"https://a.test{SEARCH}", status_code=503)
+    requests_mock.get(f"https://b.test{SEARCH}", text=RESULTS)
+
+    assert get_latest_snapshot("https://example.com", pool=pool) == "/abc123"
+
+    stats = pool.to_dict()
+    assert stats["https://a.test"]["benched"] and stats["https://a.test"]["errors"] == 1
+    assert pool.ranked() == ["https://b.test", "https://c.test", "https://a.test"]
+
+
+def test_rate_limited_everywhere_is_an_outage(requests_mock):
+    pool = MirrorPool(["https://a.test", "https://b.test", "https://c.test"])
+    breaker = CircuitBreaker("archive_ph", failure_threshold=1, reset_seconds=60)
+    for mirror in pool.mirrors:
+        requests_mock.get(f"{mirror}{SEARCH}", status_code=429)
+
+    with pytest.raises(requests.HTTPError):
+        breaker.call(get_latest_snapshot, "https://example.com", pool=pool)
+    assert all(stats["benched"] for stats in pool.to_dict().values())
+    assert breaker.state == "open"
+
+
+def test_snapshot_submits_to_the_mirror_that_answered(requests_mock):
+    pool = MirrorPool(["https://a.test", "https://b.test"])
+    requests_mock.get("https://a.test", exc=requests.ConnectTimeout)
+    requests_mock.get("https://b.test", text='<input type="hidden" name="submitid" value="token">')
+    submitted = requests_mock.post("https://b.test/submit/", status_code=302, headers={"Location": "/abc123"})
+    requests_mock.get("https://b.test/abc123", text="<html></html>")
+
+    assert snapshot("https://example.com", complete=False, pool=pool)["url"] == "https://b.test/abc123"
+    assert submitted.call_count == 1
+
+
+def test_explicit_domain_bypasses_the_pool(requests_mock):
+    pool = MirrorPool(["https://a.test"])
+    requests_mock.get(f"https://archive.is{SEARCH}", text=RESULTS)
+
+    assert get_latest_snapshot("https://example.com", domain="https://archive.is", pool=pool) == "/abc123"
+    assert pool.to_dict()["https://a.test"]["latency_seconds"] is None
@@ -160,6 +160,28 @@ def test_get_episode_dict_with_inline_html(mock_html2text, mock_newspaper):
     mock_html2text.assert_called_once_with("<html><body>Article content</body></html>")
 
 
+@patch("hoarderpod.article_parse.log_slow_parse")
+@patch("hoarderpod.article_parse.parse_with_newspaper")
+def test_get_episode_dict_logs_the_html_size_in_bytes(mock_newspaper, mock_log_slow_parse):
+    mock_newspaper.return_value = {"authors": [], "title": None, "text": "Café", "description": None}
+    bookmark = {
+        "id": "test-id",
+        "createdAt": "2026-02-05T16:46:22.000Z",
+        "content": {
+            "url": "https://example.com/article",
+            "title": "Test Article",
+            "description": None,
+            "htmlContent": "<p>Café</p>",
+            "crawledAt": "2026-02-05T16:46:23.000Z",
+        },
+    }
+
+    get_episode_dict(bookmark)
+
+    # é is two bytes in UTF-8
+    assert mock_log_slow_parse.call_args.args[2] == 12
+
+
 @patch("hoarderpod.article_parse.fetch_asset_content")
 @patch("hoarderpod.article_parse.parse_with_newspaper")
 @patch("hoarderpod.article_parse.html2text")
@@ -242,3 +264,33 @@ def test_get_episode_dict_with_precrawled_archive_asset(mock_html2text, mock_new
 
     # Verify fallback to precrawledArchiveAssetId
     mock_fetch_asset.assert_called_once_with("91adcf83-bc10-4a44-87ea-893f60e57bd0")
+
+
+@patch("hoarderpod.article_parse.fetch_asset_content")
+@patch("hoarderpod.article_parse.parse_with_newspaper")
+@patch("hoarderpod.article_parse.html2text")
+def test_get_episode_dict_reads_prefetched_asset(mock_html2text, mock_newspaper, mock_fetch_asset, tmp_path):
+    """Test get_episode_dict reads a SingleFile asset the prefetcher already spooled instead of fetching it."""
+    mock_newspaper.return_value = {"authors": [], "title": None, "text": None, "description": None}
+    mock_html2text.return_value = "Spooled article text"
+    html_path = tmp_path / "singlefile-id.html"
+    html_path.write_text("<html><body>Spooled article</body></html>", encoding="utf-8")
+
+    bookmark = {
+        "id": "singlefile-id",
+        "createdAt": "2026-02-05T16:46:22.000Z",
+        "content": {
+            "url": "https://example.com/article",
+            "title": "Spooled Article",
+            "description": None,
+            "htmlContent": None,
+            "precrawledArchiveAssetId": "91adcf83-bc10-4a44-87ea-893f60e57bd0",
+            "crawledAt": "2026-02-05T16:46:23.000Z"
+        }
+    }
+
+    result = get_episode_dict(bookmark, str(html_path))
+
+    assert result["text"] == "Spooled article text"
+    mock_fetch_asset.assert_not_called()
+    mock_html2text.assert_called_once_with("<html><body>Spooled article</body></html>")
@@ -0,0 +1,154 @@
+import os
+import threading
+from unittest.mock import Mock
+
+import pytest
+import requests
+
+from hoarderpod.assets import AssetPrefetcher, bookmark_asset_id
+from hoarderpod.config import Config
+from hoarderpod.hoarder_service import HoarderService
+
+
+class StubHoarder:
+    """Writes each asset's id as its content, recording the order downloads start and finish in."""
+
+    def __init__(self, fail=(), hang=()):
+        self.started = []
+        self.finished = []
+        self.fail = set(fail)
+        self.hang = set(hang)
+        self.unhang = threading.Event()
+        self.lock = threading.Lock()
+
+    def download_asset(self, asset_id, path):
+        with self.lock:
+            self.started.append(asset_id)
+        if asset_id in self.hang:
+            self.unhang.wait(5)
+        with self.lock:
+            self.finished.append(asset_id)
+        if asset_id in self.fail:
+            raise RuntimeError("asset gone")
+        with open(path, "w") as f:
+            f.write(asset_id * 10)
+        return len(asset_id) * 10
+
+
+def make_bookmark(bookmark_id, **content):
+    content = {"htmlContent": None, "precrawledArchiveAssetId": f"asset-{bookmark_id}", **content}
+    return {"id": bookmark_id, "content": content}
+
+
+@pytest.fixture
+def stub_hoarder():
+    return StubHoarder()
+
+
+def test_bookmark_asset_id():
+    assert bookmark_asset_id(make_bookmark("a")) == "asset-a"
+    assert bookmark_asset_id(make_bookmark("a", precrawledArchiveAssetId=None, contentAssetId="c")) == "c"
+    assert bookmark_asset_id(make_bookmark("a", htmlContent="<p>inline</p>")) is None
+
+
+def test_download_asset_streams_to_file(requests_mock, tmp_path):
+    service = HoarderService("http://test-hoarder.com", "test-key")
+    requests_mock.get(f"{service.asset_path}/asset1", content=b"<html>" + b"x" * 200_000 + b"</html>")
+    path = str(tmp_path / "asset1.html")
+
+    assert service.download_asset("asset1", path) == 200_013
+    assert os.path.getsize(path) == 200_013
+    assert os.listdir(tmp_path) == ["asset1.html"]
+
+
+def test_download_asset_leaves_nothing_behind_on_error(requests_mock, tmp_path):
+    service = HoarderService("http://test-hoarder.com", "test-key")
+    requests_mock.get(f"{service.asset_path}/missing", status_code=404)
+
+    with pytest.raises(requests.HTTPError):
+        service.download_asset("missing", str(tmp_path / "missing.html"))
+    assert os.listdir(tmp_path) == []
+
+
+def test_prefetcher_spools_and_releases(stub_hoarder, tmp_path):
+    prefetcher = AssetPrefetcher(str(tmp_path), concurrency=2, budget_bytes=1024, hoarder_service=stub_hoarder)
+    prefetcher.prefetch(make_bookmark("a"))
+
+    path = prefetcher.take("a")
+    with open(path) as f:
+        assert f.read() == "asset-a" * 10
+
+    prefetcher.release("a")
+    assert os.listdir(tmp_path) == []
+    assert prefetcher.take("a") is None
+
+
+def test_prefetcher_waits_for_budget_unless_asked(stub_hoarder, tmp_path):
+    prefetcher = AssetPrefetcher(str(tmp_path), concurrency=2, budget_bytes=1, hoarder_service=stub_hoarder)
+    for bookmark_id in ("a", "b", "c"):
+        prefetcher.prefetch(make_bookmark(bookmark_id))
+
+    prefetcher.take("a")
+    prefetcher.take("b")
+    # The spool is over budget, so c waits for it to drain
+    prefetcher.release("a")
+    assert sorted(stub_hoarder.started) == ["asset-a", "asset-b"]
+
+    # Unless the parser needs it now
+    assert prefetcher.take("c") == str(tmp_path / "c.html")
+    assert stub_hoarder.started[-1] == "asset-c"
+
+
+def test_prefetcher_fetches_what_the_parser_needs_while_every_prefetch_is_busy(tmp_path):
+    stub_hoarder = StubHoarder(hang={"asset-a"})
+    prefetcher = AssetPrefetcher(str(tmp_path), concurrency=1, budget_bytes=1024, hoarder_service=stub_hoarder)
+    prefetcher.prefetch(make_bookmark("a"))
+    prefetcher.prefetch(make_bookmark("b"))
+
+    # a holds the only prefetch slot, b doesn't queue behind it
+    assert prefetcher.take("b") == str(tmp_path / "b.html")
+    assert (stub_hoarder.started, stub_hoarder.finished) == (["asset-a", "asset-b"], ["asset-b"])
+
+    stub_hoarder.unhang.set()
+    assert prefetcher.take("a") == str(tmp_path / "a.html")
+
+
+def test_prefetcher_failed_download_falls_back_to_inline(tmp_path):
+    stub_hoarder = StubHoarder(fail={"asset-a"})
+    prefetcher = AssetPrefetcher(str(tmp_path), concurrency=1, budget_bytes=1024, hoarder_service=stub_hoarder)
+    prefetcher.prefetch(make_bookmark("a"))
+
+    assert prefetcher.take("a") is None
+    prefetcher.release("a")
+    assert os.listdir(tmp_path) == []
+
+
+def test_prefetched_looks_ahead_in_order(stub_hoarder, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "ASSET_PREFETCH_LOOKAHEAD", 2)
+    prefetcher = AssetPrefetcher(str(tmp_path), concurrency=4, budget_bytes=1024, hoarder_service=stub_hoarder)
+    bookmarks = [make_bookmark(bookmark_id) for bookmark_id in "abcde"] + [make_bookmark("f", htmlContent="<p/>")]
+
+    stream = prefetcher.prefetched(bookmarks)
+    first = next(stream)
+    assert first["id"] == "a"
+    # a and the two bookmarks after it were handed to the prefetcher before a was yielded
+    for bookmark_id in "abc":
+        prefetcher.take(bookmark_id)
+    assert sorted(stub_hoarder.started) == ["asset-a", "asset-b", "asset-c"]
+
+    assert [b["id"] for b in stream] == ["b", "c", "d", "e", "f"]
+
+
+def test_prefetcher_hands_bookmarks_without_html_to_the_origin_fetcher(stub_hoarder, tmp_path):
+    origin_fetcher = Mock()
+    prefetcher = AssetPrefetcher(
+        str(tmp_path), concurrency=2, budget_bytes=1024, hoarder_service=stub_hoarder, origin_fetcher=origin_fetcher
+    )
+    bookmark = make_bookmark("a", precrawledArchiveAssetId=None, url="https://example.com/a")
+
+    prefetcher.prefetch(bookmark)
+    origin_fetcher.prefetch.assert_called_once_with("https://example.com/a")
+    assert stub_hoarder.started == []
+
+    prefetcher.release("a")
+    origin_fetcher.discard.assert_called_once_with("https://example.com/a")
@@ -0,0 +1,30 @@
+import json
+
+from benchmarks import load
+from benchmarks.bench import main
+
+
+def test_bench_check_fails_when_baseline_exceeded(tmp_path, capsys):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"transform_markdown[2000 lines]": 1e-9}))
+
+    args = ["-k", r"^transform_markdown", "--quick", "--repeat", "1", "--baseline", str(baseline)]
+
+    assert main(args) == 0
+    assert main(args + ["--check"]) == 1
+    assert "SLOWER" in capsys.readouterr().out
+
+
+def test_bench_save_baseline(tmp_path):
+    baseline = tmp_path / "baseline.json"
+
+    assert main(["-k", r"^transform_markdown", "--quick", "--repeat", "1", "--baseline", str(baseline), "--save-baseline"]) == 0
+
+    assert list(json.loads(baseline.read_text())) == ["transform_markdown[2000 lines]"]
+
+
+def test_load_refuses_to_compare_workers_on_one_cpu(monkeypatch, capsys):
+    monkeypatch.setattr(load.os, "cpu_count", lambda: 1)
+
+    assert load.main(["--workers", "1,2"]) == 2
+    assert "multi-core" in capsys.readouterr().err
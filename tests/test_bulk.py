@@ -0,0 +1,142 @@
+import os
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+from hoarderpod import cli
+from hoarderpod.bulk import run_bulk
+from hoarderpod.config import Config
+from hoarderpod.episodes import EpisodeFilter
+from hoarderpod.storage import AudioStorage
+
+
+@pytest.fixture
+def library(ops, audio_dir, add_episode):
+    library = [
+        ("news", "https://www.example.com/news", ["Jane Doe"], 10, "ready"),
+        ("blog", "https://blog.example.com/post?id=1", ["John Smith", "Jane Doe"], 5, "ready"),
+        ("lookalike", "https://notexample.com/", ["Ann Other"], 3, "processing"),
+        ("other", "https://other.org", [], 1, "waiting"),
+    ]
+    for episode_id, url, authors, days_ago, status in library:
+        job_id = None if status == "waiting" else f"job-{episode_id}"
+        mp3 = f"{job_id}.mp3" if status == "ready" else None
+        created_at = datetime(2026, 3, 1) - timedelta(days=days_ago)
+        add_episode(episode_id, url=url, authors=authors, created_at=created_at, tts_job_id=job_id, mp3=mp3)
+        if mp3:
+            for filename in (mp3, f"{job_id}.opus-16k.opus"):
+                (audio_dir / filename).write_bytes(b"audio")
+    return ops
+
+
+def matching(ops, **criteria):
+    return ops.get_matching_ids(EpisodeFilter(**criteria))
+
+
+def test_filters(library):
+    assert matching(library, domain="example.com") == ["news", "blog"]
+    assert matching(library, domain="other.org") == ["other"]
+    assert matching(library, author="jane") == ["news", "blog"]
+    assert matching(library, author="jane", domain="blog.example.com") == ["blog"]
+    assert matching(library, since="2026-02-24", until=datetime(2026, 2, 28)) == ["blog", "lookalike"]
+    assert matching(library, since="2026-02-24T00:00:00+01:00") == ["blog", "lookalike", "other"]
+    assert matching(library, status="waiting") == ["other"]
+    assert matching(library, status="processing") == ["lookalike"]
+    assert matching(library, status="ready") == ["news", "blog"]
+    assert matching(library, ids=["other", "news", "missing"]) == ["news", "other"]
+
+    library.record_failure("blog", "tts", "TTS job failed")
+    assert matching(library, status="failed") == ["blog"]
+
+    with pytest.raises(ValueError):
+        EpisodeFilter(status="done")
+    with pytest.raises(ValueError):
+        EpisodeFilter(since="last tuesday")
+    with pytest.raises(ValueError):
+        run_bulk("delete", EpisodeFilter(), episode_ops=library)
+
+
+def test_dry_run_changes_nothing(library):
+    result = run_bulk("delete", EpisodeFilter(domain="example.com"), dry_run=True, episode_ops=library)
+
+    assert result == {"action": "delete", "dry_run": True, "count": 2, "ids": ["news", "blog"]}
+    assert library.get_episode_ids() == {"news", "blog", "lookalike", "other"}
+    assert len(os.listdir(Config.MP3_STORAGE_PATH)) == 4
+
+
+def test_delete_removes_episodes_and_their_audio(library):
+    library.record_failure("blog", "tts", "TTS job failed")
+
+    result = run_bulk("delete", EpisodeFilter(author="jane"), episode_ops=library)
+
+    assert sorted(result["ids"]) == ["blog", "news"]
+    assert library.get_episode_ids() == {"lookalike", "other"}
+    assert os.listdir(Config.MP3_STORAGE_PATH) == []
+    assert library.get_failures() == []
+
+
+def test_regenerate_requeues_tts_and_clears_failures(library):
+    for _ in range(3):
+        library.record_failure("news", "tts", "TTS job failed")
+
+    result = run_bulk("regenerate", EpisodeFilter(status="failed"), episode_ops=library)
+
+    assert result["ids"] == ["news"]
+    assert [e.id for e in library.get_episodes_to_tts()] == ["news", "other"]
+    assert sorted(os.listdir(Config.MP3_STORAGE_PATH)) == ["job-blog.mp3", "job-blog.opus-16k.opus"]
+    assert library.get_failures() == []
+
+
+def test_purge_audio_evicts_so_a_request_requeues_tts(library):
+    storage = AudioStorage()
+
+    result = run_bulk("purge_audio", EpisodeFilter(ids=["news", "other"]), episode_ops=library, audio_storage=storage)
+
+    assert result["ids"] == ["news"]
+    assert sorted(os.listdir(Config.MP3_STORAGE_PATH)) == ["job-blog.mp3", "job-blog.opus-16k.opus"]
+    assert library.get_episode_mp3("news") == "job-news.mp3"
+    assert storage.requeue_evicted("job-news.mp3")
+    assert "news" in [e.id for e in library.get_episodes_to_tts()]
+
+
+def test_bulk_endpoint(library):
+    from hoarderpod.api import create_app
+
+    with patch("hoarderpod.api.init_db"):
+        client = create_app(start_scheduler=False).test_client()
+
+    response = client.post("/episodes/bulk/delete", json={"domain": "example.com", "dry_run": True})
+    assert response.get_json()["ids"] == ["news", "blog"]
+    assert client.post("/episodes/bulk/delete", json={}).status_code == 400
+    assert client.post("/episodes/bulk/delete", json={"status": "done"}).status_code == 400
+    assert client.post("/episodes/bulk/explode", json={"ids": ["news"]}).status_code == 404
+
+    with patch("hoarderpod.api.submit_tts") as mock_submit_tts:
+        mock_submit_tts.return_value.to_dict.return_value = {"job_id": "job"}
+        mock_submit_tts.return_value.id = "job"
+        response = client.post("/episodes/bulk/regenerate", json={"since": "2026-02-20"})
+        assert response.status_code == 202
+        assert response.get_json()["ids"] == ["blog", "lookalike", "other"]
+
+        assert client.delete("/episodes/tts/news").status_code == 202
+        assert client.delete("/episodes/tts/missing").status_code == 404
+    assert client.delete("/episodes/news").status_code == 200
+    assert client.delete("/episodes/news").status_code == 404
+
+
+def test_cli(library, capsys):
+    assert cli.main(["delete", "--domain", "example.com", "--until", "2026-02-22", "--dry-run"]) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == "news"
+
+    assert cli.main(["purge-audio", "--status", "ready", "--json"]) == 0
+    assert '"count": 2' in capsys.readouterr().out
+
+    assert cli.main(["regenerate"]) == 2
+    assert "at least one filter" in capsys.readouterr().err
+    assert library.get_episode_ids() == {"news", "blog", "lookalike", "other"}
+
+
+def test_episode_dates_are_naive_utc():
+    episode_filter = EpisodeFilter(since=datetime(2026, 1, 1, 1, tzinfo=timezone(timedelta(hours=1))))
+    assert episode_filter.since == datetime(2026, 1, 1)
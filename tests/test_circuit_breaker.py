@@ -0,0 +1,135 @@
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from hoarderpod import run
+from hoarderpod.circuit_breaker import CircuitBreaker, CircuitOpenError, hoarder_breaker, tts_breaker
+from hoarderpod.config import Config
+from hoarderpod.hoarder_service import HoarderService
+from hoarderpod.tts_service import TTSService
+
+
+def fail(breaker, error=None):
+    with pytest.raises(requests.RequestException):
+        with breaker.guard():
+            raise error or requests.ConnectionError("connection refused")
+
+
+def test_breaker_opens_after_threshold_and_half_opens_to_probe():
+    breaker = CircuitBreaker("service", failure_threshold=2, reset_seconds=60)
+    fail(breaker)
+    assert breaker.state == "closed"
+    fail(breaker)
+    assert breaker.state == "open"
+    assert not breaker.available()
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "not called")
+
+    with patch("hoarderpod.circuit_breaker.time.monotonic", return_value=breaker._opened_at + 60):
+        assert breaker.state == "half_open"
+        # A failed probe opens it again straight away
+        fail(breaker)
+        assert breaker.state == "open"
+
+    with patch("hoarderpod.circuit_breaker.time.monotonic", return_value=breaker._opened_at + 60):
+        assert breaker.call(lambda: "probe") == "probe"
+    assert breaker.state == "closed"
+    assert breaker.to_dict()["failures"] == 0
+
+
+def test_only_outages_count():
+    breaker = CircuitBreaker("service", failure_threshold=1, reset_seconds=60)
+    response = requests.Response()
+    response.status_code = 404
+    fail(breaker, requests.HTTPError("not found", response=response))
+    with pytest.raises(ValueError):
+        with breaker.guard():
+            raise ValueError("bad page")
+    assert breaker.state == "closed"
+
+    response.status_code = 503
+    fail(breaker, requests.HTTPError("unavailable", response=response))
+    assert breaker.state == "open"
+
+    breaker.reset()
+    response.status_code = 429
+    fail(breaker, requests.HTTPError("too many requests", response=response))
+    assert breaker.state == "open"
+    assert breaker.to_dict()["retry_in_seconds"] > 0
+
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = CircuitBreaker("service", failure_threshold=1, reset_seconds=0)
+    fail(breaker)
+    with breaker.guard():
+        assert not breaker.available()
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: "second probe")
+    assert breaker.available()
+
+
+def test_hoarder_outage_short_circuits(requests_mock, monkeypatch):
+    monkeypatch.setattr(hoarder_breaker, "failure_threshold", 2)
+    service = HoarderService("http://test-hoarder.com", "test-key")
+    requests_mock.get(f"{service.bookmark_path}/b1", exc=requests.ConnectTimeout)
+
+    for _ in range(2):
+        with pytest.raises(requests.ConnectTimeout):
+            service.get_bookmark("b1")
+    with pytest.raises(CircuitOpenError):
+        service.get_bookmark("b1")
+    assert requests_mock.call_count == 2
+
+
+def test_tts_health_is_cached_and_skipped_while_open(requests_mock, monkeypatch):
+    monkeypatch.setattr(Config, "HEALTH_CACHE_SECONDS", 60)
+    service = TTSService()
+    requests_mock.get(service.health_path, [{"status_code": 200}, {"status_code": 503}])
+
+    assert service.check_health()
+    assert service.check_health()
+    assert requests_mock.call_count == 1
+
+    service._health = None
+    monkeypatch.setattr(tts_breaker, "failure_threshold", 1)
+    assert not service.check_health()
+    assert tts_breaker.state == "open"
+    service._health = None
+    assert not service.check_health()
+    assert requests_mock.call_count == 2
+
+
+@patch.object(run, "hoarder_service")
+@patch.object(run, "episode_ops")
+@patch.object(run, "tts_service")
+def test_poll_skips_hoarder_while_its_breaker_is_open(mock_tts, mock_ops, mock_hoarder, monkeypatch):
+    monkeypatch.setattr(hoarder_breaker, "failure_threshold", 1)
+    hoarder_breaker.record_failure("connection refused")
+    mock_ops.get_latest_episode_date.return_value = None
+    mock_tts.check_health.return_value = True
+    mock_tts.get_job_statuses.return_value = {}
+    mock_ops.get_outstanding_job_ids.return_value = []
+    mock_ops.get_episodes_to_tts.return_value = []
+
+    run.main_poll_loop()
+
+    mock_hoarder.get_new_bookmarks.assert_not_called()
+    mock_hoarder.get_bookmarks.assert_not_called()
+    # TTS is still reconciled
+    mock_ops.get_episodes_to_tts.assert_called_once()
+
+
+def test_health_endpoint_and_metrics(monkeypatch):
+    from hoarderpod.api import create_app
+
+    monkeypatch.setattr(tts_breaker, "failure_threshold", 1)
+    tts_breaker.record_failure("connection refused")
+    with patch("hoarderpod.api.init_db"):
+        client = create_app(start_scheduler=False).test_client()
+
+    health = client.get("/health").get_json()
+    assert health["status"] == "degraded"
+    assert health["services"]["tts"]["state"] == "open"
+    assert health["services"]["hoarder"]["state"] == "closed"
+    assert 'hoarderpod_circuit_state{service="tts"} 2' in client.get("/metrics").get_data(as_text=True)
@@ -0,0 +1,109 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from hoarderpod import episodes
+from hoarderpod.episodes import Base, Episode, EpisodeOps, ReadSession, init_db
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "episodes.db")
+
+
+def make_episode(episode_id: str) -> Episode:
+    now = datetime(2025, 1, 1)
+    return Episode(id=episode_id, title=episode_id, created_at=now, crawled_at=now, mp3=f"{episode_id}.mp3")
+
+
+def hold_write_lock(db_path: str, seconds: float) -> threading.Thread:
+    """Hold the write lock from another connection, like a big import in the poll would."""
+    locked = threading.Event()
+
+    def writer():
+        connection = sqlite3.connect(db_path, isolation_level=None)
+        connection.execute("BEGIN EXCLUSIVE")
+        connection.execute(
+            "INSERT INTO episodes (id, title, created_at, crawled_at) VALUES (?, ?, ?, ?)",
+            ("import", "x", "2025-01-01 00:00:00", "2025-01-01 00:00:00"),
+        )
+        locked.set()
+        time.sleep(seconds)
+        connection.execute("COMMIT")
+        connection.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    locked.wait()
+    return thread
+
+
+def test_rollback_journal_reads_fail_during_writes(db_path):
+    """How the default engine behaved: any write transaction locks readers out."""
+    old_engine = create_engine(f"sqlite:///{db_path}", connect_args={"timeout": 0.1})
+    Base.metadata.create_all(old_engine)
+
+    writer = hold_write_lock(db_path, 0.5)
+    try:
+        with pytest.raises(OperationalError, match="database is locked"):
+            with old_engine.connect() as connection:
+                connection.execute(text("SELECT count(*) FROM episodes")).scalar()
+    finally:
+        writer.join()
+        old_engine.dispose()
+
+
+def test_wal_reads_continue_during_writes(db_path):
+    init_db(f"sqlite:///{db_path}")
+    EpisodeOps().add_episode(make_episode("ep1"))
+
+    writer = hold_write_lock(db_path, 0.5)
+    try:
+        start = time.perf_counter()
+        # Readers see the last committed state without waiting for the writer
+        assert [episode.id for episode in EpisodeOps().get_episodes_with_mp3()] == ["ep1"]
+        assert time.perf_counter() - start < 0.25
+    finally:
+        writer.join()
+
+    assert EpisodeOps().get_episode_ids() == {"ep1", "import"}
+
+
+def test_writers_wait_for_the_lock(db_path):
+    init_db(f"sqlite:///{db_path}")
+
+    writer = hold_write_lock(db_path, 0.3)
+    try:
+        # Queues on busy_timeout instead of failing with "database is locked"
+        EpisodeOps().add_episode(make_episode("ep1"))
+    finally:
+        writer.join()
+
+    assert EpisodeOps().get_episode_ids() == {"ep1", "import"}
+
+
+def test_pragmas_and_read_only_engine(db_path):
+    init_db(f"sqlite:///{db_path}")
+
+    with episodes.engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+
+    with ReadSession() as session:
+        with pytest.raises(OperationalError, match="readonly"):
+            session.add(make_episode("ep1"))
+            session.commit()
+
+
+def test_in_memory_database_shares_one_engine():
+    init_db("sqlite://")
+
+    assert episodes.read_engine is episodes.engine
+    EpisodeOps().add_episode(make_episode("ep1"))
+    assert EpisodeOps().get_episode_ids() == {"ep1"}
@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+from hoarderpod import run
+from hoarderpod.config import Config
+from hoarderpod.episodes import failure_backoff_seconds
+
+
+@pytest.fixture
+def ops(ops, monkeypatch):
+    monkeypatch.setattr(Config, "FAILURE_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(Config, "FAILURE_BACKOFF_SECONDS", 60)
+    monkeypatch.setattr(Config, "FAILURE_BACKOFF_MAX_SECONDS", 3600)
+    monkeypatch.setattr(run, "episode_ops", ops)
+    return ops
+
+
+def test_failure_backoff_doubles_up_to_the_maximum(monkeypatch):
+    monkeypatch.setattr(Config, "FAILURE_BACKOFF_SECONDS", 60)
+    monkeypatch.setattr(Config, "FAILURE_BACKOFF_MAX_SECONDS", 200)
+    assert [failure_backoff_seconds(attempts) for attempts in (1, 2, 3, 4)] == [60, 120, 200, 200]
+
+
+def test_failures_back_off_then_dead_letter(ops, add_episode):
+    add_episode("ep1")
+
+    failure = ops.record_failure("ep1", "tts", "TTS job job1 failed")
+    assert failure.title == "ep1"
+    assert failure.next_retry_at - failure.last_failed_at == timedelta(seconds=60)
+    assert ops.get_episodes_to_tts() == []
+    assert ops.count_episodes_to_tts() == 0
+
+    failure = ops.record_failure("ep1", "tts", "TTS job job2 failed")
+    assert failure.next_retry_at - failure.last_failed_at == timedelta(seconds=120)
+    assert failure.dead_at is None
+
+    failure = ops.record_failure("ep1", "tts", "TTS job job3 failed")
+    assert failure.attempts == 3
+    assert failure.dead_at is not None and failure.next_retry_at is None
+    assert [f.item_id for f in ops.get_failures(dead_only=True)] == ["ep1"]
+    assert ops.count_dead_letters() == 1
+
+    assert ops.retry_failures("ep1") == 1
+    assert [e.id for e in ops.get_episodes_to_tts()] == ["ep1"]
+
+
+def test_completing_tts_clears_its_failures(ops, add_episode):
+    add_episode("ep1")
+    ops.record_failure("ep1", "tts", "TTS job job1 was lost")
+    ops.retry_failures("ep1")
+    ops.record_failure("ep1", "tts", "TTS job job1 was lost")
+
+    with patch("hoarderpod.episodes.datetime") as mock_datetime:
+        mock_datetime.now.return_value = datetime.now(timezone.utc) + timedelta(minutes=2)
+        assert [e.id for e in ops.get_episodes_to_tts()] == ["ep1"]
+    ops.mark_tts_submitted("ep1", "job2")
+    ops.mark_tts_completed("job2", "job2.mp3")
+
+    assert ops.get_failures() == []
+
+
+def test_null_episodes_that_tts_doesnt_know_about_reports_the_lost_job(ops, add_episode):
+    add_episode("ep1")
+    ops.mark_tts_submitted("ep1", "job1")
+
+    assert ops.null_episodes_that_tts_doesnt_know_about(set()) == [("ep1", "job1")]
+
+
+def test_failed_extraction_is_skipped_until_its_retry(ops, make_bookmark):
+    parsed = []
+
+    def get_episode_dict(bookmark, html_path=None):
+        parsed.append(bookmark["id"])
+        if bookmark["id"] == "poison":
+            raise RuntimeError("parser crashed")
+        return {
+            "title": "Title",
+            "description": None,
+            "text": "Some text",
+            "url": bookmark["content"]["url"],
+            "authors": [],
+            "createdAt": datetime(2026, 2, 5),
+            "crawledAt": datetime(2026, 2, 5),
+        }
+
+    with patch("hoarderpod.article_parse.get_episode_dict", side_effect=get_episode_dict):
+        run.update_db_with_new_episodes([make_bookmark("poison"), make_bookmark("good")])
+        # The poison bookmark didn't stop the good one, and is backing off on the next poll
+        run.update_db_with_new_episodes([make_bookmark("poison"), make_bookmark("good")])
+
+    assert parsed == ["poison", "good"]
+    assert ops.get_episode_ids() == {"good"}
+    [failure] = ops.get_failures()
+    assert (failure.item_id, failure.stage, failure.title) == ("poison", "extract", "https://example.com/poison")
+    assert "parser crashed" in failure.last_error
+
+
+@patch.object(run, "episode_ops")
+@patch.object(run, "tts_service")
+def test_targeted_reconcile_requeues_failed_jobs_as_failures(mock_tts, mock_ops, monkeypatch):
+    monkeypatch.setattr(Config, "TTS_RECONCILE_MODE", "targeted")
+    mock_ops.get_outstanding_job_ids.return_value = ["failed", "lost"]
+    mock_ops.null_tts_jobs.return_value = [("ep1", "failed"), ("ep2", "lost")]
+    mock_tts.get_job_statuses.return_value = {"failed": "failed", "lost": None}
+
+    assert run.tts_pending_and_completed_update() == []
+
+    mock_ops.null_tts_jobs.assert_called_once_with(["failed", "lost"])
+    mock_tts.delete_job.assert_called_once_with("failed")
+    assert [c.args[:2] for c in mock_ops.record_failure.call_args_list] == [("ep1", "tts"), ("ep2", "tts")]
+
+
+def test_submit_skips_episodes_the_tts_service_rejects(ops, add_episode, requests_mock, monkeypatch):
+    from hoarderpod.tts_service import TTSService
+
+    service = TTSService()
+    monkeypatch.setattr(run, "tts_service", service)
+    add_episode("rejected")
+    add_episode("fine")
+    responses = [{"status_code": 422}, {"json": {"job_id": "job1"}, "status_code": 202}]
+    requests_mock.post(service.synthesize_path, responses)
+
+    run.submit_tts_request_for_episodes(ops.get_episodes_to_tts())
+
+    assert ops.get_outstanding_job_ids() == ["job1"]
+    assert [(f.item_id, f.stage) for f in ops.get_failures()] == [("rejected", "tts")]
+
+
+def test_failures_endpoints_list_and_retry(ops, add_episode):
+    from hoarderpod.api import create_app
+
+    add_episode("ep1")
+    for _ in range(3):
+        ops.record_failure("ep1", "tts", "TTS job failed")
+    with patch("hoarderpod.api.init_db"):
+        client = create_app(start_scheduler=False).test_client()
+
+    failures = client.get("/episodes/failures?dead=true").get_json()
+    assert [(f["item_id"], f["attempts"]) for f in failures] == [("ep1", 3)]
+    assert b"Given up on" in client.get("/").data
+
+    with patch("hoarderpod.api.submit_poll") as mock_submit_poll:
+        mock_submit_poll.return_value.to_dict.return_value = {"id": "poll"}
+        assert client.post("/episodes/failures/ep1/retry").status_code == 202
+    assert client.post("/episodes/failures/ep1/retry").status_code == 404
+    assert client.get("/episodes/failures").get_json() == []
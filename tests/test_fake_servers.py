@@ -0,0 +1,133 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from benchmarks.fake_servers import FakeHoarder, FakeTTS, serve
+from hoarderpod.article_parse import fetch_asset_content
+from hoarderpod.config import Config
+from hoarderpod.hoarder_service import HoarderService
+from hoarderpod.tts_service import TTSService
+
+
+@pytest.fixture
+def fake_hoarder(monkeypatch):
+    hoarder = FakeHoarder(corpus_size=25, page_size=10)
+    with serve(hoarder.app) as url:
+        monkeypatch.setattr(Config, "HOARDER_ROOT_URL", url)
+        monkeypatch.setattr(Config, "HOARDER_API_KEY", hoarder.api_key)
+        yield hoarder, HoarderService(url, hoarder.api_key)
+
+
+@pytest.fixture
+def fake_tts(monkeypatch, tmp_path):
+    tts = FakeTTS(base_seconds=0.5)
+    with serve(tts.app) as url:
+        monkeypatch.setattr(Config, "TTS_ROOT_URL", url)
+        monkeypatch.setattr(Config, "MP3_STORAGE_PATH", str(tmp_path))
+        yield tts, TTSService()
+
+
+def test_hoarder_service_pages_through_fake(fake_hoarder):
+    hoarder, service = fake_hoarder
+
+    bookmarks = list(service.get_bookmarks())
+
+    assert len(bookmarks) == 25
+    assert [b["id"] for b in bookmarks] == [b["id"] for b in hoarder.bookmarks]
+
+
+def test_light_sync_through_fake_fetches_only_new_bookmarks(fake_hoarder):
+    hoarder, service = fake_hoarder
+    known_ids = {b["id"] for b in hoarder.bookmarks[3:]}
+
+    bookmarks = list(service.get_new_bookmarks(known_ids))
+
+    assert [b["id"] for b in bookmarks] == [b["id"] for b in hoarder.bookmarks[:3]]
+    assert all("htmlContent" in b["content"] for b in bookmarks)
+    assert hoarder.faults.endpoint_requests["list_bookmarks"] == 3
+    assert hoarder.faults.endpoint_requests["get_bookmark"] == 3
+
+
+def test_fake_hoarder_serves_singlefile_assets(fake_hoarder):
+    hoarder, service = fake_hoarder
+    bookmark = next(b for b in service.get_bookmarks() if b["content"].get("precrawledArchiveAssetId"))
+
+    html = fetch_asset_content(bookmark["content"]["precrawledArchiveAssetId"])
+
+    assert "Page saved with SingleFile" in html
+
+
+def test_tts_service_round_trip_through_fake(fake_tts):
+    tts, service = fake_tts
+    assert service.check_health()
+
+    job_id = service.submit_tts("Hello there")
+    completed, ongoing = service.get_jobs()
+    assert ongoing == [job_id] and completed == []
+
+    time.sleep(0.6)
+    assert service.get_job_status(job_id) == "completed"
+    path = service.download_mp3(job_id)
+    with open(path, "rb") as f:
+        assert f.read().startswith(b"ID3")
+
+    service.delete_job(job_id)
+    assert service.get_job_status(job_id) is None
+
+
+def test_fake_tts_runs_jobs_serially(fake_tts):
+    tts, service = fake_tts
+    first = service.submit_tts("first")
+    second = service.submit_tts("second")
+
+    time.sleep(0.7)
+
+    assert service.get_job_status(first) == "completed"
+    assert service.get_job_status(second) == "processing"
+
+
+@pytest.mark.parametrize("support_ids_filter", [True, False])
+def test_targeted_reconcile_against_fake(monkeypatch, tmp_path, support_ids_filter):
+    from hoarderpod import run
+    from hoarderpod.episodes import Episode, EpisodeOps, init_db
+
+    init_db(f"sqlite:///{tmp_path / 'episodes.db'}")
+    tts = FakeTTS(base_seconds=0.05, workers=2, support_ids_filter=support_ids_filter)
+    with serve(tts.app) as url:
+        monkeypatch.setattr(Config, "TTS_ROOT_URL", url)
+        monkeypatch.setattr(Config, "TTS_RECONCILE_MODE", "targeted")
+        # Lost jobs are requeued once their backoff is up, which here is straight away
+        monkeypatch.setattr(Config, "FAILURE_BACKOFF_SECONDS", 0)
+        service = TTSService()
+        service.mp3_storage_path = str(tmp_path)
+        monkeypatch.setattr(run, "tts_service", service)
+        episode_ops = EpisodeOps()
+        monkeypatch.setattr(run, "episode_ops", episode_ops)
+
+        job_ids = {}
+        for episode_id in ("done", "lost"):
+            now = datetime.now()
+            episode = Episode(
+                id=episode_id, title=episode_id, text="Some text", url="https://example.com", created_at=now, crawled_at=now
+            )
+            episode_ops.add_episode(episode)
+            job_ids[episode_id] = service.submit_tts("Some text")
+            episode_ops.mark_tts_submitted(episode_id, job_ids[episode_id])
+        tts.jobs.pop(job_ids["lost"])
+        # Plenty of jobs from other clients, which a full listing would pull every poll
+        for i in range(20):
+            service.submit_tts(f"someone else's article {i}")
+
+        time.sleep(1)
+        assert run.tts_pending_and_completed_update() == []
+
+        # One request for both jobs, an older TTS ignoring the filter costs one full listing before falling back
+        assert tts.faults.endpoint_requests["list_jobs"] == 1
+        assert [e.id for e in episode_ops.get_episodes_with_mp3()] == ["done"]
+        assert [e.id for e in episode_ops.get_episodes_to_tts()] == ["lost"]
+        assert [(f.item_id, f.attempts) for f in episode_ops.get_failures()] == [("lost", 1)]
+        assert len(tts.jobs) == 20
+
+        run.cleanup_unknown_tts_jobs()
+        assert tts.jobs == {}
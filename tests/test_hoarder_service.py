@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from hoarderpod.hoarder_service import HoarderService
+
+
+@pytest.fixture
+def hoarder_service():
+    return HoarderService("http://test-hoarder.com", "test-key")
+
+
+def make_bookmark(bookmark_id, created_at="2026-02-05T16:46:22.000Z", **content):
+    return {"id": bookmark_id, "createdAt": created_at, "content": {"url": "https://example.com", **content}}
+
+
+def mock_pages(requests_mock, service, pages):
+    """Serve pages of bookmarks, chained by cursors "1", "2", ..."""
+
+    def page_for(request, context):
+        cursor = int(request.qs.get("cursor", ["0"])[0])
+        next_cursor = str(cursor + 1) if cursor + 1 < len(pages) else None
+        return {"bookmarks": pages[cursor], "nextCursor": next_cursor}
+
+    requests_mock.get(service.bookmark_path, json=page_for)
+
+
+def page_requests(requests_mock, service):
+    return [r for r in requests_mock.request_history if r.url.split("?")[0] == service.bookmark_path]
+
+
+def test_get_bookmark_returns_none_when_deleted(requests_mock, hoarder_service):
+    requests_mock.get(f"{hoarder_service.bookmark_path}/gone", status_code=404)
+    requests_mock.get(f"{hoarder_service.bookmark_path}/there", json=make_bookmark("there", htmlContent="<p>hi</p>"))
+
+    assert hoarder_service.get_bookmark("gone") is None
+    assert hoarder_service.get_bookmark("there")["content"]["htmlContent"] == "<p>hi</p>"
+
+
+def test_get_new_bookmarks_only_fetches_unknown_ids(requests_mock, hoarder_service):
+    mock_pages(
+        requests_mock,
+        hoarder_service,
+        [[make_bookmark("new1"), make_bookmark("known1")], [make_bookmark("known2"), make_bookmark("new2")]],
+    )
+    for bookmark_id in ("new1", "new2"):
+        requests_mock.get(
+            f"{hoarder_service.bookmark_path}/{bookmark_id}", json=make_bookmark(bookmark_id, htmlContent="<p/>")
+        )
+
+    bookmarks = list(hoarder_service.get_new_bookmarks({"known1", "known2"}))
+
+    assert [b["id"] for b in bookmarks] == ["new1", "new2"]
+    assert all(b["content"]["htmlContent"] == "<p/>" for b in bookmarks)
+    pages = page_requests(requests_mock, hoarder_service)
+    assert len(pages) == 2
+    assert all(r.qs["includecontent"] == ["false"] for r in pages)
+    fetched = {r.path.rsplit("/", 1)[1] for r in requests_mock.request_history if r not in pages}
+    assert fetched == {"new1", "new2"}
+
+
+def test_get_new_bookmarks_stops_at_cutoff_without_prefetching(requests_mock, hoarder_service):
+    """A poll with nothing new is a single light page request."""
+    mock_pages(
+        requests_mock,
+        hoarder_service,
+        [[make_bookmark("known1", "2026-02-05T16:46:22.000Z"), make_bookmark("old", "2026-01-01T00:00:00.000Z")], []],
+    )
+
+    before_date = datetime(2026, 2, 1, tzinfo=timezone.utc)
+    assert list(hoarder_service.get_new_bookmarks({"known1"}, before_date)) == []
+    assert len(requests_mock.request_history) == 1
+
+
+def test_get_new_bookmarks_counts_known_bookmarks_towards_max(requests_mock, hoarder_service):
+    mock_pages(
+        requests_mock, hoarder_service, [[make_bookmark("known1"), make_bookmark("new1"), make_bookmark("new2")]]
+    )
+    requests_mock.get(f"{hoarder_service.bookmark_path}/new1", json=make_bookmark("new1"))
+
+    assert [b["id"] for b in hoarder_service.get_new_bookmarks({"known1"}, max_episodes=2)] == ["new1"]
+
+
+def test_get_new_bookmarks_skips_bookmarks_deleted_while_syncing(requests_mock, hoarder_service):
+    mock_pages(requests_mock, hoarder_service, [[make_bookmark("deleted"), make_bookmark("new1")]])
+    requests_mock.get(f"{hoarder_service.bookmark_path}/deleted", status_code=404)
+    requests_mock.get(f"{hoarder_service.bookmark_path}/new1", json=make_bookmark("new1"))
+
+    assert [b["id"] for b in hoarder_service.get_new_bookmarks(set())] == ["new1"]
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+
+from hoarderpod.jobs import JobRunner, JobStatus, report_progress
+
+
+def wait_for(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while job.finished_at is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.finished_at is not None, "job did not finish in time"
+
+
+def test_submit_runs_job():
+    runner = JobRunner()
+    calls = []
+
+    job = runner.submit("poll", lambda: calls.append(1))
+    wait_for(job)
+
+    assert calls == [1]
+    assert job.status == JobStatus.SUCCEEDED
+    assert runner.get(job.id) is job
+
+
+def test_failed_job_records_error():
+    runner = JobRunner()
+
+    def boom():
+        raise RuntimeError("hoarder is down")
+
+    job = runner.submit("poll", boom)
+    wait_for(job)
+
+    assert job.status == JobStatus.FAILED
+    assert job.error == "hoarder is down"
+
+
+def test_duplicate_submissions_are_coalesced():
+    """While a job is running, repeated submits collapse into a single follow-up run."""
+    runner = JobRunner()
+    release = threading.Event()
+    started = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+
+    running = runner.submit("poll", slow)
+    started.wait(5)
+
+    follow_up = runner.submit("poll", slow)
+    assert runner.submit("poll", slow) is follow_up
+    assert follow_up is not running
+    assert follow_up.status == JobStatus.QUEUED
+
+    release.set()
+    wait_for(running)
+    wait_for(follow_up)
+    assert len(calls) == 2
+
+
+def test_report_progress():
+    runner = JobRunner()
+
+    job = runner.submit("poll", lambda: report_progress("Syncing bookmarks"))
+    wait_for(job)
+
+    assert job.to_dict()["progress"] == "Syncing bookmarks"
+
+    # Outside of a job it is a no-op
+    report_progress("ignored")
+
+
+def test_history_is_bounded():
+    runner = JobRunner(max_history=2)
+    jobs = []
+    for i in range(5):
+        job = runner.submit(f"job-{i}", lambda: None)
+        wait_for(job)
+        jobs.append(job)
+
+    assert runner.get(jobs[0].id) is None
+    assert runner.get(jobs[-1].id) is jobs[-1]
+
+
+def test_jobs_are_recorded_for_other_processes(tmp_path):
+    records_path = str(tmp_path / "jobs")
+    runner, other_process = JobRunner(max_history=2, records_path=records_path), JobRunner(records_path=records_path)
+    started, release = threading.Event(), threading.Event()
+
+    def poll():
+        report_progress("Syncing bookmarks")
+        started.set()
+        release.wait(5)
+
+    job = runner.submit("poll", poll)
+    started.wait(5)
+    assert other_process.get_status(job.id)["progress"] == "Syncing bookmarks"
+
+    release.set()
+    wait_for(job)
+    assert other_process.get_status(job.id) == job.to_dict()
+    assert other_process.get_status("../jobs") is None
+
+    for i in range(3):
+        wait_for(runner.submit(f"job-{i}", lambda: None))
+    assert other_process.get_status(job.id) is None
+    assert len(os.listdir(records_path)) == 2
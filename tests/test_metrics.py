@@ -0,0 +1,64 @@
+from hoarderpod.metrics import Gauge, Histogram, Registry, directory_size, http_client_seconds, instrument_requests
+
+
+def test_histogram_render():
+    histogram = Histogram("test_seconds", "Test timings", labelnames=("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="parse")
+    histogram.observe(0.5, stage="parse")
+    histogram.observe(5, stage="parse")
+
+    lines = histogram.render()
+
+    assert "# TYPE test_seconds histogram" in lines
+    assert 'test_seconds_bucket{stage="parse",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="parse",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{stage="parse",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{stage="parse"} 5.55' in lines
+    assert 'test_seconds_count{stage="parse"} 3' in lines
+
+
+def test_histogram_time_records_on_error():
+    histogram = Histogram("test_seconds", "Test timings", labelnames=("stage",))
+    try:
+        with histogram.time(stage="boom"):
+            raise ValueError()
+    except ValueError:
+        pass
+
+    assert 'test_seconds_count{stage="boom"} 1' in histogram.render()
+
+
+def test_gauge_render():
+    registry = Registry()
+    registry.register(Gauge("test_waiting", "Waiting episodes", lambda: 7))
+    registry.register(Gauge("test_labelled", "Labelled", lambda: {("a\"b",): 1}, labelnames=("name",)))
+    registry.register(Gauge("test_broken", "Broken", lambda: 1 / 0))
+
+    text = registry.render()
+
+    assert "test_waiting 7\n" in text
+    assert 'test_labelled{name="a\\"b"} 1' in text
+    assert "test_broken" not in text
+
+
+def test_directory_size(tmp_path):
+    (tmp_path / "a.mp3").write_bytes(b"x" * 10)
+    (tmp_path / "b.mp3").write_bytes(b"x" * 5)
+
+    assert directory_size(str(tmp_path)) == 15
+    assert directory_size(str(tmp_path / "missing")) == 0
+
+
+def test_instrument_requests(requests_mock):
+    import requests
+
+    instrument_requests()
+    instrument_requests()
+    requests_mock.get("http://tts.example.com/health/check", status_code=200)
+
+    requests.get("http://tts.example.com/health/check")
+
+    assert any(
+        line.startswith('hoarderpod_http_client_seconds_count{host="tts.example.com",method="GET",status="200"}')
+        for line in http_client_seconds.render()
+    )
@@ -0,0 +1,95 @@
+import re
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from hoarderpod.article_parse import parse_with_newspaper
+from hoarderpod.config import Config
+from hoarderpod.origin_fetcher import OriginFetcher
+
+ARTICLE_URL = "https://example.com/article"
+
+
+@pytest.fixture
+def fetcher(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "ORIGIN_MIN_INTERVAL_SECONDS", 0)
+    return OriginFetcher(str(tmp_path))
+
+
+def test_fetch_caches_and_revalidates(requests_mock, fetcher):
+    validators = {"ETag": '"v1"', "Last-Modified": "Mon, 02 Feb 2026 00:00:00 GMT"}
+    requests_mock.get(ARTICLE_URL, [{"text": "<html>first</html>", "headers": validators}, {"status_code": 304}])
+
+    assert fetcher.fetch(ARTICLE_URL) == "<html>first</html>"
+    # Fetching again sends a conditional request and is answered from the cache
+    assert fetcher.fetch(ARTICLE_URL) == "<html>first</html>"
+
+    revalidation = requests_mock.request_history[1]
+    assert revalidation.headers["If-None-Match"] == '"v1"'
+    assert revalidation.headers["If-Modified-Since"] == "Mon, 02 Feb 2026 00:00:00 GMT"
+
+
+def test_fetch_decodes_with_declared_charset(requests_mock, fetcher):
+    requests_mock.get(
+        ARTICLE_URL, content="<p>café</p>".encode("latin-1"), headers={"Content-Type": "text/html; charset=ISO-8859-1"}
+    )
+    assert fetcher.fetch(ARTICLE_URL) == "<p>café</p>"
+
+    requests_mock.get(ARTICLE_URL, content="<p>café</p>".encode(), headers={"Content-Type": "text/html"})
+    assert fetcher.fetch(ARTICLE_URL) == "<p>café</p>"
+
+
+def test_fetch_gives_up_on_errors_and_oversized_pages(requests_mock, fetcher, monkeypatch):
+    monkeypatch.setattr(Config, "ORIGIN_MAX_MB", 1)
+    requests_mock.get("https://example.com/gone", status_code=404)
+    requests_mock.get("https://example.com/huge", content=b"x" * (1024 * 1024 + 1))
+
+    assert fetcher.fetch("https://example.com/gone") is None
+    assert fetcher.fetch("https://example.com/huge") is None
+
+
+def test_prefetch_is_picked_up_by_fetch(requests_mock, fetcher):
+    requests_mock.get(ARTICLE_URL, text="<html>prefetched</html>")
+
+    fetcher.prefetch(ARTICLE_URL).result()
+    assert fetcher.fetch(ARTICLE_URL) == "<html>prefetched</html>"
+    assert requests_mock.call_count == 1
+
+
+def test_requests_to_a_host_are_spaced_out(requests_mock, fetcher, monkeypatch):
+    monkeypatch.setattr(Config, "ORIGIN_MIN_INTERVAL_SECONDS", 0.2)
+    starts = []
+    lock = threading.Lock()
+
+    def page(request, context):
+        with lock:
+            starts.append(time.monotonic())
+        return "<html></html>"
+
+    requests_mock.get(re.compile(r"https://example\.com/\d"), text=page)
+    futures = [fetcher.prefetch(f"https://example.com/{i}") for i in range(3)]
+    for future in futures:
+        future.result()
+
+    starts.sort()
+    assert starts[1] - starts[0] >= 0.19
+    assert starts[2] - starts[1] >= 0.19
+
+
+@patch("hoarderpod.article_parse.origin_fetcher")
+def test_parse_with_newspaper_downloads_through_origin_fetcher(mock_fetcher):
+    mock_fetcher.fetch.return_value = "<html><head><title>Fetched</title></head><body><p>Body</p></body></html>"
+
+    result = parse_with_newspaper(ARTICLE_URL)
+
+    mock_fetcher.fetch.assert_called_once_with(ARTICLE_URL)
+    assert result["title"] == "Fetched"
+
+
+@patch("hoarderpod.article_parse.origin_fetcher")
+def test_parse_with_newspaper_handles_failed_download(mock_fetcher):
+    mock_fetcher.fetch.return_value = None
+
+    assert parse_with_newspaper(ARTICLE_URL) == {"authors": [], "title": None, "text": None, "description": None}
@@ -0,0 +1,128 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from hoarderpod import run
+from hoarderpod.config import Config
+from hoarderpod.pipeline import Pipeline, QueueStage
+
+
+def make_bookmark(bookmark_id, url="https://example.com/article"):
+    return {
+        "id": bookmark_id,
+        "createdAt": "2026-02-05T16:46:22.000Z",
+        "content": {"url": url, "crawledAt": "2026-02-05T16:46:23.000Z"},
+    }
+
+
+def test_queue_stage_put_gives_up_when_stopping():
+    """A full inbox blocks the producer until the pipeline stops."""
+    stage = QueueStage("test", lambda item: None, concurrency=1, max_queue_size=1)
+    stop_event = threading.Event()
+
+    assert stage.put({"id": "a"}, stop_event) is True
+
+    stop_event.set()
+    assert stage.put({"id": "b"}, stop_event) is False
+    assert stage.inbox.qsize() == 1
+
+
+def test_queue_stage_handles_items():
+    handled = []
+    stage = QueueStage("test", lambda item: handled.append(item["id"]), concurrency=2, max_queue_size=10)
+    stop_event = threading.Event()
+    stage.start(stop_event)
+
+    for i in range(5):
+        stage.put({"id": str(i)}, stop_event)
+    stage.inbox.join()
+    stop_event.set()
+
+    assert sorted(handled) == ["0", "1", "2", "3", "4"]
+
+
+@pytest.fixture
+def pipeline_run(monkeypatch):
+    monkeypatch.setattr(Config, "HOARDER_SYNC_MODE", "full")
+    with (
+        patch.object(run, "hoarder_service") as mock_hoarder,
+        patch.object(run, "episode_ops") as mock_ops,
+        patch.object(run, "needs_archive_snapshot", side_effect=lambda b: "archived" in b["content"]["url"]),
+    ):
+        mock_ops.get_latest_episode_date.return_value = None
+        yield mock_hoarder, mock_ops
+
+
+def test_sync_routes_new_bookmarks(pipeline_run):
+    mock_hoarder, mock_ops = pipeline_run
+    mock_ops.get_episode_ids.return_value = {"known"}
+    mock_hoarder.get_bookmarks.return_value = [
+        make_bookmark("known"),
+        make_bookmark("new"),
+        make_bookmark("paywalled", url="https://archived.example.com/article"),
+    ]
+
+    pipeline = Pipeline()
+    pipeline.sync_hoarder()
+
+    assert [b["id"] for b in pipeline.extract.inbox.queue] == ["new"]
+    assert [b["id"] for b in pipeline.archive.inbox.queue] == ["paywalled"]
+
+    # Bookmarks already queued aren't queued again by the next sync
+    pipeline.sync_hoarder()
+    assert pipeline.extract.inbox.qsize() == 1
+    assert pipeline.archive.inbox.qsize() == 1
+
+
+def test_extract_releases_bookmark_on_failure(pipeline_run):
+    mock_hoarder, mock_ops = pipeline_run
+    mock_ops.get_episode_ids.return_value = set()
+    mock_hoarder.get_bookmarks.return_value = [make_bookmark("new")]
+
+    pipeline = Pipeline()
+    pipeline.sync_hoarder()
+    bookmark = pipeline.extract.inbox.get_nowait()
+
+    with patch.object(run, "add_episode_from_bookmark", side_effect=RuntimeError("parse failed")):
+        with pytest.raises(RuntimeError):
+            pipeline.extract_bookmark(bookmark)
+
+    # The failed bookmark can be picked up again on the next sync
+    pipeline.sync_hoarder()
+    assert [b["id"] for b in pipeline.extract.inbox.queue] == ["new"]
+
+
+def test_reconcile_waits_for_a_submitted_job_to_be_recorded(monkeypatch):
+    """The download stage mustn't null a job the TTS service accepted before the episode row records it."""
+    monkeypatch.setattr(run.Config, "TTS_RECONCILE_MODE", "full", raising=False)
+    accepted = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def submit_tts(text):
+        accepted.set()
+        release.wait(5)
+        return "job-1"
+
+    with patch.object(run, "tts_service") as mock_tts, patch.object(run, "episode_ops") as mock_ops:
+        mock_tts.submit_tts.side_effect = submit_tts
+        mock_tts.get_jobs.side_effect = lambda: calls.append("reconciled") or ([], ["job-1"])
+        mock_ops.mark_tts_submitted.side_effect = lambda *args: calls.append("recorded")
+        mock_ops.null_episodes_that_tts_doesnt_know_about.return_value = []
+        episode = MagicMock(id="ep1", title="Title", authors=[], text="Some text")
+
+        submitter = threading.Thread(target=run.submit_tts_request_for_episodes, args=([episode],))
+        submitter.start()
+        assert accepted.wait(5)
+        reconciler = threading.Thread(target=run.tts_pending_and_completed_update)
+        reconciler.start()
+        time.sleep(0.1)
+        assert calls == []
+
+        release.set()
+        submitter.join(5)
+        reconciler.join(5)
+
+    assert calls == ["recorded", "reconciled"]
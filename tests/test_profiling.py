@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+
+from hoarderpod.config import Config
+from hoarderpod.profiling import log_slow_parse, profiled, prune_profiles
+
+
+@pytest.fixture
+def profile_config(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(Config, "PROFILE_POLL", True)
+    monkeypatch.setattr(Config, "PROFILE_CALLS", {"gen_feed"})
+    monkeypatch.setattr(Config, "PROFILE_RETENTION", 2)
+    return tmp_path / "profiles"
+
+
+def test_profiled_writes_profile(profile_config):
+    with profiled("main_poll_loop"):
+        sum(range(1000))
+
+    profiles = os.listdir(profile_config)
+    assert len(profiles) == 1
+    assert profiles[0].startswith("main_poll_loop-") and profiles[0].endswith(".prof")
+
+
+def test_profiled_disabled(profile_config):
+    with profiled("get_episode_dict"):
+        pass
+
+    assert not os.path.exists(profile_config)
+
+
+def test_profiled_nested_runs_unprofiled(profile_config):
+    """Only the outer block is profiled since cProfile can't run two profilers at once."""
+    with profiled("main_poll_loop"):
+        with profiled("gen_feed"):
+            pass
+
+    assert [name.split("-")[0] for name in os.listdir(profile_config)] == ["main_poll_loop"]
+
+
+def test_prune_profiles(tmp_path):
+    for timestamp in ["20260101T000000", "20260102T000000", "20260103T000000"]:
+        (tmp_path / f"gen_feed-{timestamp}.prof").write_bytes(b"")
+    (tmp_path / "main_poll_loop-20250101T000000.prof").write_bytes(b"")
+
+    prune_profiles(str(tmp_path), "gen_feed", 2)
+
+    assert sorted(os.listdir(tmp_path)) == [
+        "gen_feed-20260102T000000.prof",
+        "gen_feed-20260103T000000.prof",
+        "main_poll_loop-20250101T000000.prof",
+    ]
+
+
+def test_log_slow_parse(monkeypatch, tmp_path):
+    slow_log = tmp_path / "slow.jsonl"
+    monkeypatch.setattr(Config, "SLOW_PARSE_LOG", str(slow_log))
+    monkeypatch.setattr(Config, "SLOW_PARSE_SECONDS", 1.0)
+
+    log_slow_parse("fast", "https://example.com/a", 100, "newspaper", 0.2, 50)
+    log_slow_parse("slow", "https://example.com/b", 5_000_000, "html2text", 3.5, 40_000)
+
+    records = [json.loads(line) for line in slow_log.read_text().splitlines()]
+    assert len(records) == 1
+    assert records[0]["bookmark_id"] == "slow"
+    assert records[0]["domain"] == "example.com"
+    assert records[0]["html_bytes"] == 5_000_000
+    assert records[0]["extractor"] == "html2text"
+    assert records[0]["text_chars"] == 40_000
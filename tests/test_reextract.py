@@ -0,0 +1,142 @@
+import json
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from hoarderpod import run
+from hoarderpod.reextract import reextract
+
+
+@pytest.fixture
+def fake_hoarder(make_bookmark):
+    def fake(texts):
+        hoarder = MagicMock()
+        hoarder.get_bookmark.side_effect = lambda bookmark_id: make_bookmark(bookmark_id, texts[bookmark_id])
+        return hoarder
+
+    return fake
+
+
+def episode_dict(bookmark):
+    text = bookmark["content"]["htmlContent"].split("<p>")[1].split("</p>")[0]
+    return {
+        "title": bookmark["content"]["title"],
+        "description": "",
+        "text": text or None,
+        "authors": ["Someone"],
+        "url": bookmark["content"]["url"],
+    }
+
+
+@patch("hoarderpod.reextract.get_episode_dict", side_effect=episode_dict)
+def test_reextract_requeues_tts_only_when_the_text_changed(mock_parse, ops, tmp_path, add_episode, fake_hoarder):
+    add_episode("changed", "Old text", mp3="changed.mp3")
+    add_episode("same", "Same text", mp3="same.mp3")
+    add_episode("current", "Current text", mp3="current.mp3", extractor_version=2)
+    assert ops.get_stale_episode_ids(2) == ["changed", "same"]
+
+    checkpoint = reextract(
+        version=2,
+        workers=0,
+        checkpoint_path=str(tmp_path / "checkpoint.json"),
+        episode_ops=ops,
+        hoarder_service=fake_hoarder({"changed": "New text", "same": "Same text"}),
+    )
+
+    assert (checkpoint["changed"], checkpoint["unchanged"], checkpoint["failed"]) == (1, 1, [])
+    assert ops.count_stale_episodes(2) == 0
+    assert [e.id for e in ops.get_episodes_to_tts()] == ["changed"]
+    episodes = {e.id: e for e in ops.get_all_episodes()}
+    assert episodes["changed"].text == "New text"
+    assert (episodes["same"].mp3, episodes["same"].title) == ("same.mp3", "Title of same")
+    assert episodes["current"].title == "current"
+
+
+@patch("hoarderpod.reextract.get_episode_dict", side_effect=episode_dict)
+def test_reextract_resumes_from_its_checkpoint(mock_parse, ops, tmp_path, add_episode, fake_hoarder):
+    for episode_id in ("ep1", "ep2", "ep3"):
+        add_episode(episode_id, "Old text")
+    hoarder = fake_hoarder({"ep1": "", "ep2": "New text", "ep3": "New text"})
+    options = {
+        "version": 2,
+        "workers": 0,
+        "checkpoint_path": str(tmp_path / "checkpoint.json"),
+        "episode_ops": ops,
+        "hoarder_service": hoarder,
+    }
+
+    reextract(batch_size=1, limit=2, **options)
+    with open(options["checkpoint_path"]) as f:
+        assert json.load(f) == {"version": 2, "after": "ep2", "changed": 1, "unchanged": 0, "failed": ["ep1"]}
+
+    # ep1 failed and isn't tried again until a restart
+    hoarder.get_bookmark.reset_mock()
+    checkpoint = reextract(**options)
+    assert [c.args[0] for c in hoarder.get_bookmark.call_args_list] == ["ep3"]
+    assert checkpoint["changed"] == 2
+    assert ops.get_stale_episode_ids(2) == ["ep1"]
+
+    hoarder.get_bookmark.reset_mock()
+    reextract(restart=True, **options)
+    assert [c.args[0] for c in hoarder.get_bookmark.call_args_list] == ["ep1"]
+
+
+def test_reextract_reads_archive_snapshots_again(ops, tmp_path, add_episode, make_bookmark):
+    snapshot_url = "https://archive.ph/abcde"
+    add_episode("paywalled", "The full article", mp3="paywalled.mp3", url=snapshot_url)
+    hoarder = MagicMock()
+    hoarder.get_bookmark.return_value = {
+        "id": "paywalled",
+        "content": {"url": "https://paywalled.example.com/article", "title": "Title of paywalled"},
+    }
+    pages = {snapshot_url: "The full article", "https://paywalled.example.com/article": "Subscribe to keep reading"}
+
+    def parse(bookmark):
+        return {**episode_dict(make_bookmark("paywalled", "")), "text": pages[bookmark["content"]["url"]]}
+
+    with patch("hoarderpod.reextract.get_episode_dict", side_effect=parse):
+        checkpoint = reextract(
+            version=2,
+            workers=0,
+            checkpoint_path=str(tmp_path / "checkpoint.json"),
+            episode_ops=ops,
+            hoarder_service=hoarder,
+        )
+
+    assert (checkpoint["changed"], checkpoint["unchanged"]) == (0, 1)
+    [episode] = ops.get_all_episodes()
+    assert (episode.text, episode.mp3) == ("The full article", "paywalled.mp3")
+
+
+def test_reextract_parses_in_worker_processes(ops, tmp_path, add_episode, fake_hoarder):
+    add_episode("ep1", "Old text", mp3="ep1.mp3")
+    text = "A new paragraph that the improved extractor finds in the page. " * 20
+
+    checkpoint = reextract(
+        version=2,
+        workers=2,
+        checkpoint_path=str(tmp_path / "checkpoint.json"),
+        episode_ops=ops,
+        hoarder_service=fake_hoarder({"ep1": text}),
+    )
+
+    assert checkpoint["changed"] == 1
+    [episode] = ops.get_all_episodes()
+    assert "improved extractor" in episode.text and episode.mp3 is None
+
+
+def test_new_episodes_are_stamped_with_the_extractor_version(ops, monkeypatch, make_bookmark):
+    from hoarderpod.article_parse import EXTRACTOR_VERSION
+
+    monkeypatch.setattr(run, "episode_ops", ops)
+    with patch("hoarderpod.article_parse.get_episode_dict") as mock_parse:
+        mock_parse.return_value = {
+            **episode_dict(make_bookmark("ep1", "Some text")),
+            "createdAt": datetime(2026, 2, 5),
+            "crawledAt": datetime(2026, 2, 5),
+        }
+        assert run.add_episode_from_bookmark(make_bookmark("ep1", "Some text"))
+
+    assert ops.get_stale_episode_ids(EXTRACTOR_VERSION) == []
+    assert ops.get_stale_episode_ids(EXTRACTOR_VERSION + 1) == ["ep1"]
@@ -0,0 +1,130 @@
+import subprocess
+from unittest.mock import patch
+
+import pytest
+
+from hoarderpod.config import Config
+from hoarderpod.renditions import (
+    RENDITIONS,
+    RenditionError,
+    ensure_rendition,
+    parse_rendition_filename,
+    queue_renditions,
+    rendition_filename,
+)
+
+
+@pytest.fixture
+def audio_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "MP3_STORAGE_PATH", str(tmp_path))
+    monkeypatch.setattr(Config, "AUDIO_RENDITIONS", ["opus-16k", "mp3-32k"])
+    (tmp_path / "job1.mp3").write_bytes(b"ID3 original audio")
+    return tmp_path
+
+
+def fake_ffmpeg(command, **kwargs):
+    """Write the output file ffmpeg would have written."""
+    with open(command[-1], "wb") as f:
+        f.write(b"encoded " + command[command.index("-b:a") + 1].encode())
+    return subprocess.CompletedProcess(command, 0)
+
+
+def test_rendition_filenames(audio_dir):
+    assert rendition_filename("job1.mp3", None) == "job1.mp3"
+    assert rendition_filename("job1.mp3", RENDITIONS["opus-16k"]) == "job1.opus-16k.opus"
+
+    assert parse_rendition_filename("job1.opus-16k.opus") == ("job1.mp3", RENDITIONS["opus-16k"])
+    assert parse_rendition_filename("job1.mp3") is None
+    # Only configured renditions are encoded on request
+    assert parse_rendition_filename("job1.opus-32k.opus") is None
+    assert parse_rendition_filename("job1.opus-16k.mp3") is None
+
+
+@patch("hoarderpod.renditions.subprocess.run", side_effect=fake_ffmpeg)
+def test_ensure_rendition_encodes_once(mock_run, audio_dir):
+    path = ensure_rendition("job1.mp3", RENDITIONS["opus-16k"])
+
+    assert path == str(audio_dir / "job1.opus-16k.opus")
+    with open(path, "rb") as f:
+        assert f.read() == b"encoded 16k"
+    assert ensure_rendition("job1.mp3", RENDITIONS["opus-16k"]) == path
+    assert mock_run.call_count == 1
+    assert sorted(p.name for p in audio_dir.iterdir()) == ["job1.mp3", "job1.opus-16k.opus"]
+
+
+@patch("hoarderpod.renditions.subprocess.run")
+def test_ensure_rendition_failure_leaves_nothing_behind(mock_run, audio_dir):
+    mock_run.side_effect = subprocess.CalledProcessError(1, "ffmpeg", stderr=b"Unknown encoder")
+
+    with pytest.raises(RenditionError, match="Unknown encoder"):
+        ensure_rendition("job1.mp3", RENDITIONS["opus-16k"])
+    assert [p.name for p in audio_dir.iterdir()] == ["job1.mp3"]
+
+
+def test_ensure_rendition_missing_original(audio_dir):
+    with pytest.raises(FileNotFoundError):
+        ensure_rendition("missing.mp3", RENDITIONS["opus-16k"])
+
+
+@patch("hoarderpod.renditions.subprocess.run", side_effect=fake_ffmpeg)
+def test_queue_renditions(mock_run, audio_dir):
+    for future in queue_renditions("job1.mp3"):
+        future.result()
+
+    assert (audio_dir / "job1.opus-16k.opus").exists()
+    assert (audio_dir / "job1.mp3-32k.mp3").exists()
+
+
+def test_queue_renditions_disabled(monkeypatch):
+    monkeypatch.setattr(Config, "AUDIO_RENDITIONS", [])
+    assert queue_renditions("job1.mp3") == []
+
+
+@pytest.fixture
+def client(audio_dir):
+    from hoarderpod.api import create_app
+
+    return create_app(start_scheduler=False).test_client()
+
+
+@patch("hoarderpod.renditions.subprocess.run", side_effect=fake_ffmpeg)
+def test_serve_audio_encodes_rendition_on_request(mock_run, client):
+    response = client.get("/audio/job1.opus-16k.opus")
+    assert response.status_code == 200
+    assert response.mimetype == "audio/ogg"
+    assert response.data == b"encoded 16k"
+
+    assert client.get("/audio/job1.mp3?rendition=opus-16k").data == b"encoded 16k"
+    assert client.get("/audio/job1.mp3").data == b"ID3 original audio"
+    assert client.get("/audio/job1.mp3?rendition=opus-32k").status_code == 404
+    assert client.get("/audio/job2.opus-16k.opus").status_code == 404
+    assert mock_run.call_count == 1
+
+
+@patch("hoarderpod.renditions.subprocess.run", side_effect=FileNotFoundError)
+def test_serve_audio_falls_back_to_original(mock_run, client):
+    assert client.get("/audio/job1.opus-16k.opus").data == b"ID3 original audio"
+
+
+def test_feed_links_to_rendition(client):
+    from datetime import datetime
+
+    from hoarderpod.episodes import Episode
+
+    episode = Episode(
+        id="ep1",
+        title="Title",
+        url="https://example.com",
+        created_at=datetime(2025, 1, 1),
+        crawled_at=datetime(2025, 1, 1),
+        mp3="job1.mp3",
+    )
+    with patch("hoarderpod.api.episode_ops") as mock_ops:
+        mock_ops.get_episodes_with_mp3.return_value = [episode]
+        original = client.get("/feed").data.decode()
+        opus = client.get("/feed?rendition=opus-16k").data.decode()
+        unknown = client.get("/feed?rendition=flac")
+
+    assert 'audio/job1.mp3" length="0" type="audio/mpeg"' in original
+    assert 'audio/job1.opus-16k.opus" length="0" type="audio/ogg"' in opus
+    assert unknown.status_code == 404
@@ -0,0 +1,183 @@
+import threading
+import time
+from datetime import datetime, timezone
+from unittest.mock import Mock, patch
+
+from hoarderpod import run
+from hoarderpod.config import Config
+from hoarderpod.locks import FileLock
+from hoarderpod.run import tts_submission_slots
+
+
+def test_tts_submission_slots():
+    # Tops the queue up to the target
+    assert tts_submission_slots([], 5) == 5
+    assert tts_submission_slots(["job1", "job2"], 5) == 3
+
+    # Never negative when the backend is already over the target
+    assert tts_submission_slots(["job1", "job2", "job3"], 2) == 0
+
+
+@patch.object(run, "hoarder_service")
+@patch.object(run, "episode_ops")
+@patch.object(run, "tts_service")
+def test_main_poll_loop_tops_up_tts_queue(mock_tts, mock_ops, mock_hoarder, monkeypatch):
+    """Only as many waiting episodes as there are free slots are fetched and submitted."""
+    monkeypatch.setattr(Config, "TTS_RECONCILE_MODE", "full")
+    monkeypatch.setattr(Config, "TTS_MAX_IN_FLIGHT", 4)
+    mock_hoarder.get_bookmarks.return_value = []
+    mock_ops.get_latest_episode_date.return_value = None
+    mock_ops.get_job_ids.return_value = set()
+    mock_ops.null_episodes_that_tts_doesnt_know_about.return_value = []
+    mock_tts.check_health.return_value = True
+    mock_tts.get_jobs.return_value = ([], ["job1"])
+    waiting = [Mock(id="ep1"), Mock(id="ep2"), Mock(id="ep3")]
+    mock_ops.get_episodes_to_tts.return_value = waiting
+
+    with patch.object(run, "submit_tts_request_for_episodes") as mock_submit:
+        run.main_poll_loop()
+
+    mock_ops.get_episodes_to_tts.assert_called_once_with(limit=3)
+    mock_submit.assert_called_once_with(waiting)
+
+
+@patch.object(run, "hoarder_service")
+@patch.object(run, "episode_ops")
+@patch.object(run, "tts_service")
+def test_main_poll_loop_skips_submission_when_queue_full(mock_tts, mock_ops, mock_hoarder, monkeypatch):
+    monkeypatch.setattr(Config, "TTS_RECONCILE_MODE", "full")
+    monkeypatch.setattr(Config, "TTS_MAX_IN_FLIGHT", 2)
+    mock_hoarder.get_bookmarks.return_value = []
+    mock_ops.get_latest_episode_date.return_value = None
+    mock_ops.get_job_ids.return_value = set()
+    mock_ops.null_episodes_that_tts_doesnt_know_about.return_value = []
+    mock_tts.check_health.return_value = True
+    mock_tts.get_jobs.return_value = ([], ["job1", "job2"])
+
+    run.main_poll_loop()
+
+    mock_ops.get_episodes_to_tts.assert_not_called()
+
+
+@patch.object(run, "hoarder_service")
+@patch.object(run, "episode_ops")
+@patch.object(run, "tts_service")
+def test_main_poll_loop_light_sync_skips_known_bookmarks(mock_tts, mock_ops, mock_hoarder, monkeypatch):
+    monkeypatch.setattr(Config, "HOARDER_SYNC_MODE", "light")
+    mock_ops.get_latest_episode_date.return_value = None
+    mock_ops.get_episode_ids.return_value = {"known"}
+    mock_hoarder.get_new_bookmarks.return_value = []
+    mock_tts.check_health.return_value = False
+
+    run.main_poll_loop(max_episodes=5)
+
+    mock_hoarder.get_new_bookmarks.assert_called_once()
+    assert mock_hoarder.get_new_bookmarks.call_args.args[0] == {"known"}
+    mock_hoarder.get_bookmarks.assert_not_called()
+    mock_ops.get_episode_ids.assert_called_once()
+
+
+@patch.object(run, "episode_ops")
+@patch.object(run, "tts_service")
+def test_targeted_reconcile_only_asks_about_outstanding_jobs(mock_tts, mock_ops, monkeypatch):
+    monkeypatch.setattr(Config, "TTS_RECONCILE_MODE", "targeted")
+    mock_ops.get_outstanding_job_ids.return_value = ["done", "running", "lost"]
+    mock_ops.is_tts_job_pending.return_value = True
+    mock_ops.null_tts_jobs.return_value = [("ep3", "lost")]
+    mock_tts.get_job_statuses.return_value = {"done": "completed", "running": "processing", "lost": None}
+    mock_tts.pop_completed_at.return_value = datetime(2026, 3, 1, 12, 0)
+    mock_tts.download_mp3.return_value = "/audio/done.mp3"
+
+    assert run.tts_pending_and_completed_update() == ["running"]
+
+    mock_tts.get_jobs.assert_not_called()
+    mock_tts.get_job_statuses.assert_called_once_with(["done", "running", "lost"])
+    mock_tts.delete_job.assert_called_once_with("done")
+    mock_ops.mark_tts_completed.assert_called_once_with("done", "done.mp3", datetime(2026, 3, 1, 12, 0))
+    mock_ops.null_tts_jobs.assert_called_once_with(["lost"])
+
+
+@patch.object(run, "episode_ops")
+@patch.object(run, "tts_service")
+def test_cleanup_unknown_tts_jobs(mock_tts, mock_ops):
+    mock_tts.get_jobs.return_value = (["ours", "stray"], ["running"])
+    mock_ops.get_job_ids.return_value = {"ours"}
+
+    run.cleanup_unknown_tts_jobs()
+
+    mock_tts.delete_job.assert_called_once_with("stray")
+
+
+@patch.object(run, "episode_ops")
+@patch.object(run, "tts_service")
+def test_complete_tts_job(mock_tts, mock_ops):
+    mock_ops.is_tts_job_pending.return_value = True
+    mock_tts.get_job_status.return_value = "completed"
+    mock_tts.pop_completed_at.return_value = None
+    mock_tts.download_mp3.return_value = "/audio/job1.mp3"
+
+    before = datetime.now(timezone.utc).replace(tzinfo=None)
+    assert run.complete_tts_job("job1") is True
+
+    mock_tts.download_mp3.assert_called_once_with("job1")
+    mock_tts.delete_job.assert_called_once_with("job1")
+    # The callback arrives as the job finishes, so its arrival is the completion time
+    job_id, mp3, completed_at = mock_ops.mark_tts_completed.call_args.args
+    assert (job_id, mp3) == ("job1", "job1.mp3")
+    assert before <= completed_at <= datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@patch.object(run, "episode_ops")
+@patch.object(run, "tts_service")
+def test_complete_tts_job_waits_for_a_download_in_another_process(mock_tts, mock_ops):
+    other_process = FileLock(run.tts_download_lock.path)
+    other_process.acquire()
+    downloaded_elsewhere = threading.Event()
+    mock_ops.is_tts_job_pending.side_effect = lambda job_id: not downloaded_elsewhere.is_set()
+    mock_tts.get_job_status.return_value = "completed"
+
+    callback = threading.Thread(target=run.complete_tts_job, args=("job1",))
+    callback.start()
+    time.sleep(0.2)
+    assert callback.is_alive()
+
+    downloaded_elsewhere.set()
+    other_process.release()
+    callback.join(5)
+    mock_tts.download_mp3.assert_not_called()
+    mock_tts.delete_job.assert_not_called()
+
+
+def test_tts_callback_only_accepts_a_bearer_token(monkeypatch):
+    from hoarderpod import api
+
+    monkeypatch.setattr(Config, "TTS_CALLBACK_TOKEN", "secret")
+    with patch("hoarderpod.api.init_db"):
+        client = api.create_app(start_scheduler=False).test_client()
+
+    with patch.object(api, "episode_ops") as mock_ops, patch.object(api, "complete_tts_job", return_value=True):
+        mock_ops.is_tts_job_pending.return_value = True
+        assert client.post("/tts/callback/job1?token=secret").status_code == 401
+        assert client.post("/tts/callback/job1", headers={"Authorization": "Bearer wrong"}).status_code == 401
+        assert client.post("/tts/callback/job1", headers={"Authorization": "Bearer secret"}).status_code == 200
+
+
+@patch.object(run, "episode_ops")
+@patch.object(run, "tts_service")
+def test_complete_tts_job_not_finished(mock_tts, mock_ops):
+    mock_ops.is_tts_job_pending.return_value = True
+    mock_tts.get_job_status.return_value = "processing"
+
+    assert run.complete_tts_job("job1") is False
+    mock_tts.download_mp3.assert_not_called()
+
+
+@patch.object(run, "episode_ops")
+@patch.object(run, "tts_service")
+def test_download_completed_tts_jobs_skips_already_downloaded(mock_tts, mock_ops):
+    """A job completed through the callback is not downloaded again by the poll."""
+    mock_ops.is_tts_job_pending.return_value = False
+
+    run.download_completed_tts_jobs(["job1"])
+
+    mock_tts.download_mp3.assert_not_called()
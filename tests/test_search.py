@@ -0,0 +1,103 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine, insert
+
+from hoarderpod.config import Config
+from hoarderpod.episodes import Base, Episode, EpisodeOps, highlight_snippet, init_db, to_fts_query
+
+
+def ids(results) -> list[str]:
+    return [episode.id for episode, _ in results[1]]
+
+
+def test_to_fts_query():
+    assert to_fts_query("solar power") == '"solar" "power"*'
+    # FTS5 syntax is searched for, not interpreted
+    assert to_fts_query('title:"solar OR -power') == '"title" "solar" "OR" "power"*'
+    assert to_fts_query("  ?! ") is None
+
+
+def test_highlight_snippet_escapes_html():
+    assert highlight_snippet("<b>\x02solar\x03</b>") == "&lt;b&gt;<mark>solar</mark>&lt;/b&gt;"
+
+
+def test_search_ranks_titles_first(ops, add_episode):
+    add_episode("text-match", title="Gardening", text="Mentions solar panels once.")
+    add_episode("title-match", title="Solar panels explained", text="All about energy.")
+    add_episode("author-match", title="Weather", authors=["Sol Arbuckle"])
+    add_episode("no-match", title="Cooking", text="Nothing relevant.")
+
+    total, results = ops.search_episodes("solar")
+
+    assert total == 2
+    assert [episode.id for episode, _ in results] == ["title-match", "text-match"]
+    assert "<mark>Solar</mark>" in results[0][1]
+    # The last word matches as a prefix
+    assert ids(ops.search_episodes("arbuck")) == ["author-match"]
+
+
+def test_search_index_follows_updates_and_deletes(ops, add_episode):
+    add_episode("ep1", title="Solar panels")
+    add_episode("ep2", title="Wind turbines")
+
+    ops.delete_episode("ep1")
+    assert ops.search_episodes("solar") == (0, [])
+
+    # Changing the tts columns leaves the index alone, changing the text updates it
+    ops.mark_tts_submitted("ep2", "job1")
+    assert ids(ops.search_episodes("wind")) == ["ep2"]
+
+
+def test_search_pagination(ops, add_episode):
+    for i in range(5):
+        add_episode(f"ep{i}", title=f"Solar article {i}")
+
+    assert ops.search_episodes("solar", page=1, per_page=2)[0] == 5
+    pages = [ids(ops.search_episodes("solar", page=page, per_page=2)) for page in (1, 2, 3)]
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert sorted(sum(pages, [])) == [f"ep{i}" for i in range(5)]
+
+
+def test_existing_episodes_are_backfilled(tmp_path):
+    path = tmp_path / "existing.db"
+    old_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(old_engine)
+    with old_engine.begin() as connection:
+        created_at = datetime(2024, 1, 1)
+        connection.execute(
+            insert(Episode), [{"id": "old", "title": "Solar history", "created_at": created_at, "crawled_at": created_at}]
+        )
+    old_engine.dispose()
+
+    init_db(f"sqlite:///{path}")
+
+    assert ids(EpisodeOps().search_episodes("solar")) == ["old"]
+
+
+def test_search_api(add_episode):
+    from hoarderpod.api import create_app
+
+    add_episode("ep1", title="Solar <panels>", text="Sunlight")
+    client = create_app(start_scheduler=False).test_client()
+
+    response = client.get("/episodes/search?q=solar&per_page=500")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["total"] == 1 and body["per_page"] == 100
+    assert body["results"][0]["id"] == "ep1"
+    assert body["results"][0]["snippet"] == "<mark>Solar</mark> &lt;panels&gt;"
+
+    page = client.get("/?q=solar").data.decode()
+    assert "1 episode matching" in page
+    assert "<mark>Solar</mark> &lt;panels&gt;" in page
+
+
+def test_very_common_words_list_newest_first(ops, add_episode, monkeypatch):
+    monkeypatch.setattr(Config, "SEARCH_RANK_MAX_MATCHES", 2)
+    for i in range(3):
+        add_episode(f"ep{i}", title="Solar" if i == 0 else "Other", text="solar " * (i + 1))
+
+    total, results = ops.search_episodes("solar")
+
+    assert total == 3
+    assert [episode.id for episode, _ in results] == ["ep2", "ep1", "ep0"]
@@ -0,0 +1,207 @@
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+import requests
+
+from hoarderpod.config import Config
+from hoarderpod.jobs import JobRunner, JobStatus
+from hoarderpod.locks import FileLock, Leader, SharedLock
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert condition(), "timed out"
+
+
+def test_file_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "locks" / "jobs.lock")
+    first, second = FileLock(path), FileLock(path)
+
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+    assert open(path).read() == str(os.getpid())
+    second.release()
+
+
+def test_leader_is_taken_over_when_released(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    started = []
+
+    first = Leader(path, lambda: started.append("first") or "first", retry_seconds=0.05).run()
+    second = Leader(path, lambda: started.append("second") or "second", retry_seconds=0.05).run()
+    time.sleep(0.2)
+    assert started == ["first"]
+    assert (first.is_leader, second.is_leader, first.started) == (True, False, "first")
+
+    first.stop()
+    wait_until(lambda: second.is_leader)
+    assert started == ["first", "second"]
+    second.stop()
+
+
+def test_job_waits_for_a_job_in_another_process(tmp_path):
+    path = str(tmp_path / "jobs.lock")
+    other_process = FileLock(path)
+    other_process.acquire()
+    calls = []
+
+    job = JobRunner(lock_path=path).submit("poll", lambda: calls.append(1))
+    wait_until(lambda: job.progress is not None)
+    assert job.progress == "Waiting for a job in another process to finish"
+    assert calls == []
+
+    other_process.release()
+    wait_until(lambda: job.finished_at is not None)
+    assert (calls, job.status) == ([1], JobStatus.SUCCEEDED)
+    assert FileLock(path).acquire()
+
+
+@pytest.fixture
+def two_workers(tmp_path):
+    """Serve the app from two worker processes, yielding its url and a {pid: runs_scheduler} dict of the workers."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = {
+        **os.environ,
+        "PYTHONPATH": REPO_ROOT,
+        "DATABASE_URI": f"sqlite:///{tmp_path / 'episodes.db'}",
+        "LOCK_PATH": str(tmp_path / "locks"),
+        "HOARDER_ROOT_URL": "http://127.0.0.1:9",
+        "TTS_ROOT_URL": "http://127.0.0.1:9",
+    }
+    command = [sys.executable, "-m", "hoarderpod.serve", "--workers", "2", "--host", "127.0.0.1", "--port", str(port)]
+    server = subprocess.Popen(command, cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    workers = {}
+    try:
+        deadline = time.monotonic() + 30
+        while len(workers) < 2 and time.monotonic() < deadline:
+            try:
+                health = requests.get(f"{url}/health", timeout=5).json()
+                workers[health["pid"]] = health["runs_scheduler"]
+            except requests.RequestException:
+                time.sleep(0.1)
+        assert len(workers) == 2, "both workers should answer"
+        yield url, workers
+    finally:
+        server.terminate()
+        server.wait(timeout=15)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="several web workers need fork")
+def test_serve_runs_the_scheduler_in_one_worker(two_workers):
+    _, workers = two_workers
+
+    assert sorted(workers.values()) == [False, True]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="several web workers need fork")
+def test_any_worker_reports_on_a_job(two_workers):
+    url, _ = two_workers
+
+    submitted = requests.get(f"{url}/episodes/force_update", timeout=5)
+    assert submitted.status_code == 202
+    location = submitted.headers["Location"]
+
+    # Each request is a new connection, so the polls are spread over both workers
+    statuses = [requests.get(f"{url}{location}", timeout=5) for _ in range(20)]
+    assert [response.status_code for response in statuses] == [200] * 20
+    assert {response.json()["job_id"] for response in statuses} == {submitted.json()["job_id"]}
+
+
+
+class SlowTTS:
+    """A TTS service that takes its time, logging each call to a file every process appends to."""
+
+    def __init__(self, log_path, audio_dir):
+        self.log_path = log_path
+        self.audio_dir = audio_dir
+
+    def log(self, line):
+        with open(self.log_path, "a") as f:
+            f.write(f"{line}\n")
+
+    def submit_tts(self, text):
+        time.sleep(0.2)
+        job_id = f"job-{os.getpid()}"
+        self.log(f"submit {job_id}")
+        return job_id
+
+    def download_mp3(self, job_id):
+        time.sleep(0.2)
+        self.log(f"download {job_id}")
+        path = os.path.join(self.audio_dir, f"{job_id}.mp3")
+        with open(path, "wb") as f:
+            f.write(b"audio")
+        return path
+
+    def delete_job(self, job_id):
+        self.log(f"delete {job_id}")
+
+    def pop_completed_at(self, job_id):
+        return None
+
+
+def tts_step(step, database_uri, log_path, audio_dir, barrier):
+    """Submit the waiting episodes or download the outstanding jobs, in a process of its own."""
+    from hoarderpod import episodes, run
+
+    episodes.init_db(database_uri)
+    run.tts_service = SlowTTS(log_path, audio_dir)
+    run.queue_renditions = lambda filename: None
+    waiting = run.episode_ops.get_episodes_to_tts()
+    job_ids = run.episode_ops.get_outstanding_job_ids()
+    # Both processes have seen the same work before either starts on it
+    barrier.wait(30)
+    if step == "submit":
+        run.submit_tts_request_for_episodes(waiting)
+    else:
+        run.download_completed_tts_jobs(job_ids)
+
+
+def in_two_processes(*args):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(2)
+    processes = [context.Process(target=tts_step, args=(*args, barrier)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+    assert [process.exitcode for process in processes] == [0, 0]
+
+
+def test_shared_lock_excludes_threads_and_processes(tmp_path):
+    lock = SharedLock(str(tmp_path / "shared.lock"))
+    with lock:
+        assert not FileLock(lock.path).acquire()
+        assert not lock._thread_lock.acquire(blocking=False)
+    assert FileLock(lock.path).acquire()
+
+
+def test_two_processes_submit_and_download_each_job_once(ops, add_episode, audio_dir, tmp_path):
+    log_path = tmp_path / "tts.log"
+    options = (Config.DATABASE_URI, str(log_path), str(audio_dir))
+    add_episode("ep1")
+
+    # Like a web worker and the pipeline worker that both found ep1 waiting
+    in_two_processes("submit", *options)
+    [submitted] = log_path.read_text().splitlines()
+    job_id = submitted.split()[1]
+    assert ops.get_outstanding_job_ids() == [job_id]
+
+    log_path.unlink()
+    in_two_processes("download", *options)
+    assert log_path.read_text().splitlines() == [f"download {job_id}", f"delete {job_id}"]
+    assert [episode.mp3 for episode in ops.get_episodes_with_mp3()] == [f"{job_id}.mp3"]
@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+# Importing the web app and creating it must stay well clear of the parsing stack, measured in a fresh interpreter
+STARTUP_BUDGET_SECONDS = 2.0
+LAZY_MODULES = ["newspaper", "markdownify", "ftfy", "feedgen", "apscheduler"]
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_in_fresh_interpreter(code: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(code)],
+        cwd=REPO_ROOT,
+        env={**os.environ, "PYTHONPATH": REPO_ROOT},
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+def test_web_startup_is_lazy_and_within_budget():
+    output = run_in_fresh_interpreter(
+        """
+        import sys
+        import time
+
+        start = time.perf_counter()
+        from hoarderpod.api import create_app
+
+        create_app(start_scheduler=False)
+        elapsed = time.perf_counter() - start
+        print(elapsed, ",".join(sorted({name.split(".")[0] for name in sys.modules})))
+        """
+    )
+    elapsed, modules = output.splitlines()[-1].split(" ")
+    loaded = set(modules.split(","))
+
+    assert [module for module in LAZY_MODULES if module in loaded] == []
+    assert float(elapsed) < STARTUP_BUDGET_SECONDS
+
+
+def test_import_has_no_side_effects(tmp_path):
+    audio_path = tmp_path / "audio"
+    database_path = tmp_path / "episodes.db"
+    run_in_fresh_interpreter(
+        f"""
+        import os
+        os.environ["MP3_STORAGE_PATH"] = {str(audio_path)!r}
+        os.environ["DATABASE_URI"] = "sqlite:///{database_path}"
+
+        import hoarderpod.api
+        import hoarderpod.pipeline
+        import hoarderpod.run
+        """
+    )
+
+    assert not audio_path.exists()
+    assert not database_path.exists()
+
+
+def test_create_app_serves_episodes_page():
+    from hoarderpod.api import create_app
+
+    app = create_app(start_scheduler=False)
+    client = app.test_client()
+
+    assert "hoarderpod_scheduler" not in app.extensions
+    assert b"<html" in client.get("/").data
+    assert client.get("/episodes/").status_code == 200
+    assert client.get("/metrics").status_code == 200
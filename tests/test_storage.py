@@ -0,0 +1,156 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from hoarderpod.config import Config
+from hoarderpod.episodes import AudioFile, EpisodeOps, Session
+from hoarderpod.storage import AudioStorage, original_mp3
+
+
+@pytest.fixture
+def storage(ops, audio_dir, monkeypatch):
+    monkeypatch.setattr(Config, "FEED_MAX_EPISODES", 1)
+    monkeypatch.setattr(Config, "AUDIO_ORPHAN_GRACE_MINUTES", 60)
+    return AudioStorage()
+
+
+@pytest.fixture
+def add_audio_episode(storage, add_episode):
+    def add(episode_id: str, days_ago: int, size: int = 100, mp3: bool = True) -> str:
+        filename = f"job-{episode_id}.mp3"
+        created_at = datetime(2025, 1, 31) - timedelta(days=days_ago)
+        add_episode(episode_id, created_at=created_at, tts_job_id=f"job-{episode_id}", mp3=filename if mp3 else None)
+        write_file(storage, filename, size)
+        return filename
+
+    return add
+
+
+def write_file(storage, filename: str, size: int, age_minutes: int = 0) -> None:
+    path = os.path.join(storage.storage_path, filename)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    mtime = time.time() - age_minutes * 60
+    os.utime(path, (mtime, mtime))
+
+
+def test_original_mp3():
+    assert original_mp3("job1.mp3") == "job1.mp3"
+    assert original_mp3("job1.opus-16k.opus") == "job1.mp3"
+    assert original_mp3("job1.opus-16k.opus.12.34.tmp") == "job1.mp3"
+
+
+def test_sync_index(storage, add_audio_episode):
+    add_audio_episode("ep1", days_ago=1, size=100)
+    write_file(storage, "job-ep1.opus-16k.opus", 20)
+
+    storage.sync_index()
+
+    with Session() as session:
+        rows = {row.filename: row for row in session.query(AudioFile)}
+    assert set(rows) == {"job-ep1.mp3", "job-ep1.opus-16k.opus"}
+    assert rows["job-ep1.opus-16k.opus"].mp3 == "job-ep1.mp3"
+    assert rows["job-ep1.opus-16k.opus"].episode_id == "ep1"
+    assert rows["job-ep1.mp3"].size_bytes == 100
+
+    os.remove(os.path.join(storage.storage_path, "job-ep1.opus-16k.opus"))
+    storage.sync_index()
+    with Session() as session:
+        assert [row.filename for row in session.query(AudioFile)] == ["job-ep1.mp3"]
+
+
+def test_collect_orphans(storage, add_audio_episode):
+    add_audio_episode("ep1", days_ago=1)
+    write_file(storage, "old-orphan.mp3", 10, age_minutes=120)
+    write_file(storage, "old-orphan.opus-16k.opus", 10, age_minutes=120)
+    write_file(storage, "job-ep1.opus-16k.opus.1.2.tmp", 10, age_minutes=120)
+    # Too new, its episode may not have been updated yet
+    write_file(storage, "new-download.mp3", 10)
+
+    removed = storage.collect_orphans()
+
+    assert sorted(removed) == ["job-ep1.opus-16k.opus.1.2.tmp", "old-orphan.mp3", "old-orphan.opus-16k.opus"]
+    assert sorted(os.listdir(storage.storage_path)) == ["job-ep1.mp3", "new-download.mp3"]
+
+
+def test_enforce_budget_evicts_least_recently_played_outside_feed(storage, add_audio_episode):
+    add_audio_episode("newest", days_ago=1)
+    add_audio_episode("middle", days_ago=2)
+    add_audio_episode("oldest", days_ago=3)
+    write_file(storage, "job-middle.opus-16k.opus", 20)
+    storage.sync_index()
+    # The oldest episode was played recently, so the middle one goes first
+    storage.record_access("job-oldest.mp3")
+
+    evicted = storage.enforce_budget(budget_bytes=250)
+
+    assert evicted == ["middle"]
+    assert sorted(os.listdir(storage.storage_path)) == ["job-newest.mp3", "job-oldest.mp3"]
+
+    # The newest episode is in the feed and is never evicted
+    assert storage.enforce_budget(budget_bytes=50) == ["oldest"]
+    assert os.listdir(storage.storage_path) == ["job-newest.mp3"]
+
+
+def test_enforce_budget_disabled(storage, add_audio_episode, monkeypatch):
+    monkeypatch.setattr(Config, "AUDIO_STORAGE_BUDGET_MB", 0)
+    add_audio_episode("ep1", days_ago=1)
+    add_audio_episode("ep2", days_ago=2)
+    storage.sync_index()
+
+    assert storage.enforce_budget() == []
+    assert len(os.listdir(storage.storage_path)) == 2
+
+
+def test_requeue_evicted(storage, add_audio_episode):
+    add_audio_episode("newest", days_ago=1)
+    add_audio_episode("old", days_ago=2)
+    storage.sync_index()
+    storage.enforce_budget(budget_bytes=100)
+
+    assert storage.requeue_evicted("job-old.mp3") is True
+    assert [episode.id for episode in EpisodeOps().get_episodes_to_tts()] == ["old"]
+    # Still on its way back
+    assert storage.requeue_evicted("job-old.mp3") is True
+    # Never evicted
+    assert storage.requeue_evicted("job-newest.mp3") is False
+    assert storage.requeue_evicted("unknown.mp3") is False
+
+    # Once it has new audio the evicted row is no longer needed
+    EpisodeOps().mark_tts_submitted("old", "job-old-2")
+    EpisodeOps().mark_tts_completed("job-old-2", "job-old-2.mp3")
+    storage.collect_orphans()
+    assert storage.requeue_evicted("job-old.mp3") is False
+
+
+def test_delete_audio(storage, add_audio_episode):
+    add_audio_episode("ep1", days_ago=1)
+    write_file(storage, "job-ep1.opus-16k.opus", 20)
+    add_audio_episode("ep2", days_ago=2)
+    storage.sync_index()
+
+    storage.delete_audio("job-ep1.mp3")
+
+    assert os.listdir(storage.storage_path) == ["job-ep2.mp3"]
+    with Session() as session:
+        assert [row.filename for row in session.query(AudioFile)] == ["job-ep2.mp3"]
+
+
+def test_serve_evicted_audio_requeues_tts(storage, add_audio_episode, monkeypatch):
+    from hoarderpod.api import create_app
+
+    monkeypatch.setattr(Config, "API_POLLING_ENABLED", False)
+    client = create_app(start_scheduler=False).test_client()
+    add_audio_episode("newest", days_ago=1)
+    add_audio_episode("old", days_ago=2)
+    storage.sync_index()
+    storage.enforce_budget(budget_bytes=100)
+
+    assert client.get("/audio/job-newest.mp3").status_code == 200
+    response = client.get("/audio/job-old.mp3")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(Config.POLL_INTERVAL_MINUTES * 60)
+    assert client.get("/audio/missing.mp3").status_code == 404
+    assert [episode.id for episode in EpisodeOps().get_episodes_to_tts()] == ["old"]
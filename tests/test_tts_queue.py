@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from hoarderpod import episodes, run
+from hoarderpod.config import Config
+from hoarderpod.episodes import TTSJob
+from hoarderpod.tts_queue import QueuedEpisode, order_queue, predict_ready_times, update_seconds_per_char
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+def queue():
+    return [
+        QueuedEpisode("essay", NOW - timedelta(hours=3), 100_000),
+        QueuedEpisode("short", NOW - timedelta(hours=1), 2_000),
+        QueuedEpisode("medium", NOW - timedelta(hours=2), 10_000),
+    ]
+
+
+def ids(ordered) -> list[str]:
+    return [episode.id for episode in ordered]
+
+
+def test_order_queue_policies():
+    assert ids(order_queue(queue(), "fifo", 0.01, NOW)) == ["essay", "medium", "short"]
+    assert ids(order_queue(queue(), "newest", 0.01, NOW)) == ["short", "medium", "essay"]
+    assert ids(order_queue(queue(), "sjf", 0.01, NOW)) == ["short", "medium", "essay"]
+    with pytest.raises(ValueError):
+        order_queue(queue(), "random", 0.01, NOW)
+
+
+def test_weighted_policy_ages_long_jobs_forward():
+    # Without aging it's shortest first
+    assert ids(order_queue(queue(), "weighted", 0.01, NOW, aging=0)) == ["short", "medium", "essay"]
+    # The essay is 1000s of work, after 10 hours at 0.1 it has earned 3600s and goes ahead of a new short article
+    aged = [QueuedEpisode("essay", NOW - timedelta(hours=10), 100_000), QueuedEpisode("short", NOW, 2_000)]
+    assert ids(order_queue(aged, "weighted", 0.01, NOW, aging=0.1)) == ["essay", "short"]
+
+
+def test_update_seconds_per_char():
+    assert update_seconds_per_char(None, 100, 10_000) == 0.01
+    assert update_seconds_per_char(0.01, 200, 10_000) == pytest.approx(0.012)
+    # Unusable samples leave the rate alone
+    assert update_seconds_per_char(0.01, 0, 10_000) == 0.01
+    assert update_seconds_per_char(None, 100, 0) is None
+
+
+def test_predict_ready_times():
+    in_flight = [("running", NOW - timedelta(seconds=30), 6_000), ("queued", NOW - timedelta(seconds=10), 1_000)]
+    waiting = [QueuedEpisode("next", NOW, 2_000)]
+
+    ready_at = predict_ready_times(in_flight, waiting, 0.01, NOW)
+
+    assert ready_at["running"] == NOW + timedelta(seconds=30)
+    assert ready_at["queued"] == NOW + timedelta(seconds=40)
+    assert ready_at["next"] == NOW + timedelta(seconds=60)
+
+
+def test_predict_ready_times_overdue_jobs_are_due_now():
+    in_flight = [("late", NOW - timedelta(hours=1), 100)]
+    ready_at = predict_ready_times(in_flight, [QueuedEpisode("next", NOW, 500)], 0.01, NOW)
+
+    assert ready_at == {"late": NOW, "next": NOW + timedelta(seconds=5)}
+
+
+@pytest.fixture
+def ops(ops, monkeypatch):
+    monkeypatch.setattr(Config, "TTS_SECONDS_PER_CHAR", 0.01)
+    return ops
+
+
+def test_get_episodes_to_tts_follows_policy(ops, add_episode, monkeypatch):
+    add_episode("essay", "x" * 50_000, hours_ago=3)
+    add_episode("short", "x" * 1_000, hours_ago=1)
+    add_episode("medium", "x" * 5_000, hours_ago=2)
+
+    assert [e.id for e in ops.get_episodes_to_tts(limit=2)] == ["essay", "medium"]
+    assert [e.id for e in ops.get_episodes_to_tts(limit=2, policy="sjf")] == ["short", "medium"]
+
+    monkeypatch.setattr(Config, "TTS_QUEUE_POLICY", "newest")
+    assert [e.id for e in ops.get_episodes_to_tts()] == ["short", "medium", "essay"]
+
+
+def test_completed_jobs_teach_the_estimator(ops, add_episode):
+    add_episode("ep1", "x" * 1_000, hours_ago=1)
+    add_episode("ep2", "x" * 1_000, hours_ago=1)
+    start = datetime.now(timezone.utc)
+
+    with patch.object(episodes, "datetime") as mock_datetime:
+        mock_datetime.now.return_value = start
+        ops.mark_tts_submitted("ep1", "job1")
+        ops.mark_tts_submitted("ep2", "job2")
+    start = start.replace(tzinfo=None)
+    ops.mark_tts_completed("job1", "job1.mp3", start + timedelta(seconds=20))
+    # job2 waited behind job1, so only the last 30 seconds count
+    ops.mark_tts_completed("job2", "job2.mp3", start + timedelta(seconds=50))
+
+    assert ops.get_seconds_per_char() == pytest.approx(0.02 + 0.2 * (0.03 - 0.02))
+    with episodes.ReadSession() as session:
+        assert session.get(TTSJob, "job2").completed_at is not None
+
+
+def test_a_late_poll_learns_from_when_the_service_finished(ops, add_episode, monkeypatch):
+    add_episode("reported", "x" * 1_000, hours_ago=1)
+    add_episode("unreported", "x" * 1_000, hours_ago=1)
+    start = datetime.now(timezone.utc)
+    with patch.object(episodes, "datetime") as mock_datetime:
+        mock_datetime.now.return_value = start
+        ops.mark_tts_submitted("reported", "job1")
+        ops.mark_tts_submitted("unreported", "job2")
+    start = start.replace(tzinfo=None)
+
+    # The service finished job1 20 seconds in, but the poll only downloads it 10 minutes later
+    tts = MagicMock()
+    tts.pop_completed_at.side_effect = {"job1": start + timedelta(seconds=20)}.get
+    tts.download_mp3.side_effect = lambda job_id: f"/audio/{job_id}.mp3"
+    monkeypatch.setattr(run, "tts_service", tts)
+    monkeypatch.setattr(run, "episode_ops", ops)
+    with patch.object(run, "queue_renditions"):
+        run.download_completed_tts_jobs(["job1"])
+        assert ops.get_seconds_per_char() == pytest.approx(0.02)
+
+        # Without a reported finish time there's nothing to learn from, the episode still gets its audio
+        run.download_completed_tts_jobs(["job2"])
+    assert ops.get_seconds_per_char() == pytest.approx(0.02)
+    assert {e.id for e in ops.get_episodes_with_mp3()} == {"reported", "unreported"}
+    completed = [e for _, e, _, _ in ops.get_events(start - timedelta(hours=2), start + timedelta(hours=1))]
+    assert completed.count("completed") == 1
+
+
+def test_get_tts_estimates_covers_in_flight_and_waiting(ops, add_episode):
+    add_episode("in-flight", "x" * 3_000, hours_ago=2)
+    add_episode("waiting", "x" * 1_000, hours_ago=1)
+    ops.mark_tts_submitted("in-flight", "job1")
+
+    estimates = ops.get_tts_estimates()
+
+    assert estimates["in-flight"][0] == pytest.approx(30)
+    assert estimates["waiting"][0] == pytest.approx(10)
+    assert estimates["waiting"][1] - estimates["in-flight"][1] == timedelta(seconds=10)
+
+
+def test_tts_waiting_endpoint_includes_predictions(ops, add_episode):
+    from hoarderpod.api import create_app
+
+    add_episode("waiting", "x" * 1_000, hours_ago=1)
+    with patch("hoarderpod.api.init_db"):
+        client = create_app(start_scheduler=False).test_client()
+
+    waiting = client.get("/episodes/tts_waiting").get_json()
+
+    assert [episode["id"] for episode in waiting] == ["waiting"]
+    assert waiting[0]["estimated_seconds"] == pytest.approx(10)
+    assert waiting[0]["predicted_ready_at"]
+    assert b"ready ~" in client.get("/").data
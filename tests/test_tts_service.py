@@ -1,10 +1,11 @@
 import os
+from datetime import datetime
 
 import pytest
 import requests
 
 from hoarderpod.config import Config
-from hoarderpod.tts_service import TTSService
+from hoarderpod.tts_service import TTSService, job_completed_at
 
 
 @pytest.fixture
@@ -59,6 +60,67 @@ def test_get_jobs(requests_mock, tts_service):
     assert completed == ["job1", "job3"]
     assert ongoing == ["job2"]
 
+def test_completion_times_are_kept_until_downloaded(requests_mock, tts_service):
+    requests_mock.get(tts_service.jobs_path, json={"jobs": [
+        {"job_id": "job1", "status": "completed", "completed_at": "2026-03-01T12:00:20+01:00"},
+        {"job_id": "job2", "status": "completed"},
+        {"job_id": "job3", "status": "processing", "finished_at": 1772366420},
+    ]})
+
+    tts_service.get_jobs()
+
+    assert tts_service.pop_completed_at("job1") == datetime(2026, 3, 1, 11, 0, 20)
+    assert tts_service.pop_completed_at("job1") is None
+    assert tts_service.pop_completed_at("job2") is None
+    assert tts_service.pop_completed_at("job3") is None
+
+def test_job_completed_at():
+    assert job_completed_at({"finished_at": 1772366420}) == datetime(2026, 3, 1, 12, 0, 20)
+    assert job_completed_at({"completed_at": "2026-03-01T12:00:20Z"}) == datetime(2026, 3, 1, 12, 0, 20)
+    assert job_completed_at({"completed_at": "yesterday"}) is None
+    assert job_completed_at({}) is None
+
+def test_get_job_status(requests_mock, tts_service):
+    requests_mock.get(f"{tts_service.jobs_path}/job1", json={"job_id": "job1", "status": "COMPLETED"})
+    assert tts_service.get_job_status("job1") == "completed"
+
+def test_get_job_status_unknown_job(requests_mock, tts_service):
+    requests_mock.get(f"{tts_service.jobs_path}/job1", status_code=404)
+    assert tts_service.get_job_status("job1") is None
+
+def test_get_job_statuses_batches(requests_mock, tts_service, monkeypatch):
+    monkeypatch.setattr(Config, 'TTS_STATUS_BATCH_SIZE', 2)
+    requests_mock.get(tts_service.jobs_path, [
+        {"json": {"jobs": [{"job_id": "job1", "status": "COMPLETED"}, {"job_id": "job2", "status": "processing"}]}},
+        {"json": {"jobs": []}},
+    ])
+
+    statuses = tts_service.get_job_statuses(["job1", "job2", "job3"])
+
+    assert statuses == {"job1": "completed", "job2": "processing", "job3": None}
+    assert [r.qs["ids"] for r in requests_mock.request_history] == [["job1,job2"], ["job3"]]
+    assert tts_service.batch_status_supported
+
+def test_get_job_statuses_falls_back_when_filter_rejected(requests_mock, tts_service):
+    requests_mock.get(tts_service.jobs_path, status_code=400)
+    requests_mock.get(f"{tts_service.jobs_path}/job1", json={"job_id": "job1", "status": "completed"})
+    requests_mock.get(f"{tts_service.jobs_path}/job2", status_code=404)
+
+    assert tts_service.get_job_statuses(["job1", "job2"]) == {"job1": "completed", "job2": None}
+    assert not tts_service.batch_status_supported
+
+def test_get_job_statuses_falls_back_when_filter_ignored(requests_mock, tts_service):
+    requests_mock.get(tts_service.jobs_path, json={
+        "jobs": [{"job_id": "job1", "status": "completed"}, {"job_id": "other", "status": "completed"}]
+    })
+    requests_mock.get(f"{tts_service.jobs_path}/job1", json={"job_id": "job1", "status": "completed"})
+
+    # The unfiltered list still answers the first lookup, later ones go job by job
+    assert tts_service.get_job_statuses(["job1"]) == {"job1": "completed"}
+    assert not tts_service.batch_status_supported
+    assert tts_service.get_job_statuses(["job1"]) == {"job1": "completed"}
+    assert requests_mock.last_request.path.endswith("/job1")
+
 def test_download_mp3(requests_mock, tts_service, tmp_path):
     job_id = "test-job-123"
     test_content = b"fake mp3 content"